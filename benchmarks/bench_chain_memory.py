@@ -0,0 +1,86 @@
+"""Memory held by a parsed option chain, raw TDA dicts against compact contracts.
+
+Each strategy keeps one expiration of the chain per side. "raw" keeps those
+strike maps as the API returned them, which is what OptionFactory held before;
+"compact" keeps the StrikeIndex of OptionContract records ChainCache builds now.
+Peak includes decoding the response, retained is what is still alive afterwards.
+
+    python benchmarks/bench_chain_memory.py --scales 1 10
+"""
+
+import argparse
+import datetime
+import gc
+import json
+import os
+import sys
+import tracemalloc
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from chain_fixtures import make_chain, contract_count  # noqa: E402
+from dto.strike_index import StrikeIndex  # noqa: E402
+
+EXPIRATION = datetime.date(2022, 3, 17)
+UNDERLYING = 4100.0
+
+
+def _first_expiration(exp_map: dict) -> dict:
+    return next(iter(exp_map.values()))
+
+
+def keep_raw(payload: str) -> tuple:
+    chain = json.loads(payload)
+    return (
+        _first_expiration(chain["putExpDateMap"]),
+        _first_expiration(chain["callExpDateMap"]),
+    )
+
+
+def keep_compact(payload: str) -> tuple:
+    chain = json.loads(payload)
+    return (
+        StrikeIndex.from_option_map(_first_expiration(chain["putExpDateMap"])),
+        StrikeIndex.from_option_map(_first_expiration(chain["callExpDateMap"])),
+    )
+
+
+def measure(parse, payload: str) -> dict:
+    gc.collect()
+    tracemalloc.start()
+    kept = parse(payload)
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return {"peak_bytes": peak, "retained_bytes": retained}
+
+
+def run(scales: list) -> dict:
+    results = []
+    for scale in scales:
+        chain = make_chain(EXPIRATION, UNDERLYING, scale)
+        payload = json.dumps(chain, separators=(",", ":"))
+        results.append(
+            {
+                "chain_scale": scale,
+                "contracts": contract_count(chain),
+                "chain_bytes": len(payload),
+                "raw": measure(keep_raw, payload),
+                "compact": measure(keep_compact, payload),
+            }
+        )
+    return {"results": results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10])
+    args = parser.parse_args()
+    print(json.dumps(run(args.scales), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Option chain decoding, json.loads against the streaming chain parser.
+
+Every case decodes a synthetic chain with twelve weekly expirations and keeps
+one of them. "json_loads" decodes everything and picks the expiration out, as
+Broker.option_chain did before; "streaming" builds only that expiration and
+"streaming_window" also only the strikes within 100 points of the underlying.
+Time is the median of --runs, peak memory is measured on a separate run.
+
+    python benchmarks/bench_chain_parser.py --scales 1 10 --runs 5
+"""
+
+import argparse
+import datetime
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from chain_fixtures import make_chain, contract_count  # noqa: E402
+from tda_api.chain_parser import narrow, parse_option_chain  # noqa: E402
+
+FIRST_EXPIRATION = datetime.date(2022, 3, 17)
+# A weekly in the middle of the chain, so the parser skips on both sides of it
+EXPIRATION = FIRST_EXPIRATION + datetime.timedelta(days=35)
+UNDERLYING = 4100.0
+WINDOW = (UNDERLYING - 100, UNDERLYING + 100)
+
+
+def cases() -> dict:
+    return {
+        "json_loads": lambda payload: narrow(
+            json.loads(payload), EXPIRATION, EXPIRATION
+        ),
+        "streaming": lambda payload: parse_option_chain(
+            payload, EXPIRATION, EXPIRATION
+        ),
+        "streaming_window": lambda payload: parse_option_chain(
+            payload, EXPIRATION, EXPIRATION, WINDOW
+        ),
+    }
+
+
+def _seconds(parse, payload: bytes, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        parse(payload)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def _peak_bytes(parse, payload: bytes) -> int:
+    tracemalloc.start()
+    parse(payload)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def run(scales: list, runs: int) -> dict:
+    results = []
+    for scale in scales:
+        chain = make_chain(FIRST_EXPIRATION, UNDERLYING, scale)
+        payload = json.dumps(chain, separators=(",", ":")).encode("utf-8")
+        result = {
+            "chain_scale": scale,
+            "contracts": contract_count(chain),
+            "chain_bytes": len(payload),
+        }
+        expected = cases()["json_loads"](payload)
+        for name, parse in cases().items():
+            if name == "streaming" and parse(payload) != expected:
+                raise AssertionError("Streaming parse differs from json.loads")
+            result[name] = {
+                "seconds": _seconds(parse, payload, runs),
+                "peak_bytes": _peak_bytes(parse, payload),
+            }
+        results.append(result)
+    return {"runs": runs, "results": results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(run(args.scales, args.runs), indent=2))
+
+
+if __name__ == "__main__":
+    main()
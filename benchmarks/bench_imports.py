@@ -0,0 +1,78 @@
+"""Import-time report for the Lambda entry point.
+
+Each module is imported in a fresh interpreter with `-X importtime`, the way a
+cold Lambda container would load it. The report lists the total import time,
+the slowest modules and which heavy dependencies were pulled in, as JSON.
+
+    python benchmarks/bench_imports.py --modules app --top 15
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+HEAVY_MODULES = ("pandas", "yfinance", "tda", "watchtower", "boto3", "numpy")
+
+
+def import_profile(module: str, top: int) -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        path for path in (SRC, env.get("PYTHONPATH")) if path
+    )
+    loaded = ", ".join(repr(name) for name in HEAVY_MODULES)
+    process = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            "import sys, json, {}; print(json.dumps([name for name in ({}) "
+            "if name in sys.modules]))".format(module, loaded),
+        ],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    rows = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        # Nested imports are indented under the module that triggered them
+        top_level = name[1:2] != " "
+        rows.append((name.strip(), int(self_us), int(cumulative_us), top_level))
+    top_level = [row for row in rows if row[3]]
+    slowest = sorted(rows, key=lambda row: row[2], reverse=True)[:top]
+    return {
+        "module": module,
+        "total_seconds": sum(row[2] for row in top_level) / 1e6,
+        "heavy_modules_loaded": json.loads(process.stdout.strip().splitlines()[-1]),
+        "slowest": [
+            {"module": name, "self_seconds": own / 1e6, "cumulative_seconds": cum / 1e6}
+            for name, own, cum, _ in slowest
+        ],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modules", nargs="+", default=["app"])
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+    report = json.dumps(
+        [import_profile(module, args.top) for module in args.modules], indent=2
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
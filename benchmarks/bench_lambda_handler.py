@@ -0,0 +1,209 @@
+"""End-to-end latency benchmark for app.lambda_handler.
+
+The handler runs against a replayed TDA session and Yahoo history, so no
+network or credentials are needed. Results are written as JSON, one entry per
+chain size, with the handler total and the time spent in each stage. With
+--planned, app.plan_handler first stores a plan for the session, so the
+handler only fetches the chain, as it would at the open after a planning run.
+
+    python benchmarks/bench_lambda_handler.py --scales 1 2 5 10 --runs 5 \
+        --output bench_output.json
+"""
+
+import argparse
+import datetime
+import functools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+from pytz import timezone
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from chain_fixtures import make_chain, contract_count  # noqa: E402
+
+# A Wednesday morning, so the handler trades the Thursday expiration
+RECORDED_AT = timezone("US/Eastern").localize(datetime.datetime(2022, 3, 16, 9, 45))
+UNDERLYING = 4100.0
+
+
+class StageTimer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._current = defaultdict(float)
+        self.runs = []
+
+    def wrap(self, owner, name: str, stage: str) -> None:
+        original = getattr(owner, name)
+
+        @functools.wraps(original)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._current[stage] += time.perf_counter() - start
+
+        setattr(owner, name, timed)
+
+    def finish_run(self, total: float) -> None:
+        with self._lock:
+            run = dict(self._current)
+            run["handler"] = total
+            self.runs.append(run)
+            self._current = defaultdict(float)
+
+
+def _summarize(samples: list) -> dict:
+    return {
+        "mean": statistics.fmean(samples),
+        "p50": statistics.median(samples),
+        "max": max(samples),
+    }
+
+
+def cold_import_seconds() -> float:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        path for path in (SRC, env.get("PYTHONPATH")) if path
+    )
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import time; s = time.perf_counter(); import app; "
+            "print(time.perf_counter() - s)",
+        ],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def write_cassette(path: str, scale: int) -> dict:
+    from tda_api.replay import Cassette
+
+    cassette = Cassette(path, recorded_at=RECORDED_AT)
+    cassette.record("quotes:$VIX.X", {"$VIX.X": {"lastPrice": 22.0}})
+    chain = make_chain(datetime.date(2022, 3, 17), UNDERLYING, scale)
+    cassette.record("option_chain:$SPX.X:ALL", chain)
+    cassette.record("place_option_spread_order", {"code": "ok", "order_body": ""})
+    cassette.record("place_iron_condor_order", {"code": "ok", "order_body": ""})
+    close = np.linspace(UNDERLYING - 100, UNDERLYING, 30)
+    cassette.record(
+        "history:SPX",
+        {
+            "dates": [str(day) for day in np.arange(30).astype("datetime64[D]")],
+            "open": list(close - 5),
+            "high": list(close + 20),
+            "low": list(close - 20),
+            "close": list(close),
+        },
+    )
+    cassette.save()
+    return {
+        "chain_scale": scale,
+        "contracts": contract_count(chain),
+        "chain_bytes": len(json.dumps(chain, separators=(",", ":"))),
+    }
+
+
+def instrument() -> StageTimer:
+    from dto.history_store import HistoryStore
+    from factories.chain_cache import ChainCache
+    from factories.option_factory import OptionFactory
+    from tda_api.replay import Cassette, ReplayBroker
+
+    timer = StageTimer()
+    # Loading the cassette stands in for nothing in production, so it is
+    # reported separately from the stages it feeds
+    timer.wrap(Cassette, "load", "replay_setup")
+    timer.wrap(HistoryStore, "_fetch", "history_fetch")
+    timer.wrap(ReplayBroker, "quotes", "vix_quote")
+    timer.wrap(ChainCache, "_fetch", "chain_fetch_parse")
+    timer.wrap(OptionFactory, "_get_legs_for_vertical_spread", "strike_selection")
+    timer.wrap(ReplayBroker, "place_option_spread_order", "order_build_submit")
+    timer.wrap(ReplayBroker, "place_iron_condor_order", "order_build_submit")
+    return timer
+
+
+def run(scales: list, runs: int, latency: float, planned: bool = False) -> dict:
+    import app
+    from utils import clock
+
+    results = []
+    directory = tempfile.mkdtemp(prefix="bench_lambda_handler_")
+    timer = instrument()
+    for scale in scales:
+        path = os.path.join(directory, "scale_{}.json.gz".format(scale))
+        result = write_cassette(path, scale)
+        os.environ.update(
+            TDA_CASSETTE=path,
+            TDA_CASSETTE_MODE="replay",
+            TDA_CASSETTE_LATENCY=str(latency),
+        )
+        if planned:
+            app.plan_handler({"trade_date": RECORDED_AT.date().isoformat()})
+            clock.unfreeze()
+            # What planning spent is not part of any handler run
+            timer.finish_run(0.0)
+        timer.runs = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            app.lambda_handler()
+            timer.finish_run(time.perf_counter() - start)
+            clock.unfreeze()
+        stages = sorted({stage for sample in timer.runs for stage in sample})
+        result["runs"] = runs
+        result["seconds"] = {
+            stage: _summarize([sample.get(stage, 0.0) for sample in timer.runs])
+            for stage in stages
+        }
+        results.append(result)
+    return {
+        "python": platform.python_version(),
+        "latency_per_call": latency,
+        "planned": planned,
+        "cold_import_seconds": cold_import_seconds(),
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 2, 5, 10])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--planned", action="store_true")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+    # Plans from other runs must not change what is measured
+    os.environ["TRADE_PLAN_DIR"] = tempfile.mkdtemp(prefix="bench_trade_plans_")
+    # Spans are still built and serialized, they just stay out of the report
+    os.environ.setdefault("METRICS_SINK", os.devnull)
+    report = json.dumps(
+        run(args.scales, args.runs, args.latency, args.planned), indent=2
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import datetime
+import json
+import os
+
+import numpy as np
+
+# Expirations and strikes per side in a typical morning $SPX.X chain
+BASE_EXPIRATIONS = 12
+BASE_STRIKES = 120
+STRIKE_INTERVAL = 5.0
+
+_TEMPLATE_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "tests", "unit", "common", "test_call_map.json"
+)
+
+
+def _template() -> dict:
+    with open(_TEMPLATE_PATH, "r") as f:
+        return next(iter(json.load(f).values()))[0]
+
+
+def make_chain(expiration: datetime.date, underlying: float, scale: int = 1) -> dict:
+    # The requested expiration is always listed first, followed by weeklies
+    template = _template()
+    strikes_per_side = BASE_STRIKES * scale
+    expirations = [
+        expiration + datetime.timedelta(days=7 * i) for i in range(BASE_EXPIRATIONS)
+    ]
+    first_strike = (
+        round(underlying / STRIKE_INTERVAL) * STRIKE_INTERVAL
+        - (strikes_per_side // 2) * STRIKE_INTERVAL
+    )
+    strikes = first_strike + STRIKE_INTERVAL * np.arange(strikes_per_side)
+    chain = {"symbol": "$SPX.X", "status": "SUCCESS", "underlyingPrice": underlying}
+    for side, put_call, sign in (
+        ("callExpDateMap", "CALL", 1),
+        ("putExpDateMap", "PUT", -1),
+    ):
+        exp_map = {}
+        for days, expiry in enumerate(expirations):
+            strike_map = {}
+            for strike in strikes:
+                intrinsic = max(sign * (underlying - strike), 0.0)
+                mid = round(
+                    intrinsic + 25.0 * np.exp(-abs(strike - underlying) / 60.0), 2
+                )
+                contract = dict(template)
+                contract.update(
+                    putCall=put_call,
+                    symbol="SPXW_{}{}{}".format(
+                        expiry.strftime("%m%d%y"), put_call[0], int(strike)
+                    ),
+                    bid=max(mid - 0.1, 0.0),
+                    ask=mid + 0.1,
+                    mark=mid,
+                    strikePrice=float(strike),
+                    daysToExpiration=days * 7,
+                )
+                strike_map[str(float(strike))] = [contract]
+            exp_map["{}:{}".format(expiry.isoformat(), days * 7 + 1)] = strike_map
+        chain[side] = exp_map
+    return chain
+
+
+def contract_count(chain: dict) -> int:
+    return sum(
+        len(strikes)
+        for side in ("callExpDateMap", "putExpDateMap")
+        for strikes in chain[side].values()
+    )
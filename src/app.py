@@ -1,12 +1,38 @@
+import datetime
+import json
+
+from dto.plan_store import default_plan_store
+from monitor import PositionMonitor
+from tda_api import replay, transport
+from tda_api.broker import AccountBroker
 from trader import Trader
-from strategies.dte1_ic import Dte1IC
-from utils.common_utils import OrderType
-import watchtower
+from utils import clock, log_utils, metrics, warm_cache
 import logging
 
-logging.basicConfig(level=logging.INFO, handlers=[watchtower.CloudWatchLogHandler()])
+log_utils.configure()
 logger = logging.getLogger(__name__)
 
+# Traded when the event does not carry its own "strategies" list
+DEFAULT_STRATEGIES = [{"strategy": "Dte1IC", "ticker": "SPX", "buying_power": 1000}]
+
+
+# Strategy configs come from a "strategies" key on the event itself or on the
+# JSON body of an API Gateway request
+def strategy_configs(event: dict) -> list:
+    if not event:
+        return DEFAULT_STRATEGIES
+    if "strategies" in event:
+        return event["strategies"]
+    body = event.get("body")
+    if isinstance(body, str):
+        try:
+            body = json.loads(body)
+        except ValueError:
+            body = None
+    if isinstance(body, dict) and "strategies" in body:
+        return body["strategies"]
+    return DEFAULT_STRATEGIES
+
 
 def lambda_handler(event=None, context=None):
     """Sample pure Lambda function
@@ -29,12 +55,107 @@ def lambda_handler(event=None, context=None):
 
         Return doc: https://docs.aws.amazon.com/apigateway/latest/developerguide/set-up-lambda-proxy-integrations.html
     """
-    trader = Trader()
-    trader.set_strategies(
-        Dte1IC(ticker="SPX", order_type=OrderType.CREDIT, buying_power=1000)
+    container = warm_cache.start_invocation()
+    session, cassette = replay.session_from_environment()
+    trader = Trader(session=session, plan_store=default_plan_store())
+    trader.set_configs(*strategy_configs(event))
+    response = trader.trade(concurrent=True)
+    for strategy, result in zip(trader.strategies, response):
+        fields = dict(log_utils.strategy_fields(strategy), stage="trade")
+        if isinstance(result, Exception):
+            logging.error(
+                "Strategy failed: {}".format(result),
+                exc_info=result,
+                extra=fields,
+            )
+        else:
+            logging.info("Strategy finished", extra=dict(fields, result=result))
+    logging.info(
+        "Broker session",
+        extra=dict(
+            trader.session.stats(),
+            **log_utils.stats(),
+            **transport.default_transport().stats(),
+            planned=trader.planned,
+            stage="session",
+        ),
+    )
+    caches = warm_cache.stats()
+    logging.info("Warm caches", extra=dict(container, caches=caches, stage="cache"))
+    trader.session.close()
+    if cassette:
+        cassette.save()
+    metrics.emit()
+    log_utils.flush()
+    return {
+        "statusCode": 200,
+        "body": json.dumps(
+            {
+                "strategies": [
+                    "error" if isinstance(result, Exception) else "ok"
+                    for result in response
+                ],
+                "container": container["container"],
+                "invocations": container["invocations"],
+                "caches": caches,
+            }
+        ),
+    }
+
+
+# Scheduled after the close. Decides tomorrow's trades, or those of the event's
+# "trade_date", for the same strategy configs lambda_handler takes and stores
+# them where lambda_handler reads them, leaving only the chain to fetch then.
+def plan_handler(event=None, context=None):
+    event = event or {}
+    trade_date = (
+        datetime.date.fromisoformat(event["trade_date"])
+        if event.get("trade_date")
+        else clock.next_session(clock.today())
+    )
+    session, cassette = replay.session_from_environment()
+    trader = Trader(session=session)
+    trader.set_configs(*strategy_configs(event))
+    plans = trader.make_plans(trade_date)
+    path = default_plan_store().save(trade_date, plans)
+    for plan in plans:
+        logging.info(
+            "Trade planned",
+            extra=dict(plan.to_dict(), stage="plan"),
+        )
+    session.close()
+    if cassette:
+        cassette.save()
+    metrics.emit()
+    log_utils.flush()
+    return {"trade_date": trade_date.isoformat(), "plans": len(plans), "path": path}
+
+
+# Scheduled every few minutes while the market is open. Checks the open spreads
+# of the event's account (the configured one by default) for up to "cycles"
+# cycles, "interval" seconds apart, within "request_budget" broker requests.
+def monitor_handler(event=None, context=None):
+    event = event or {}
+    session, cassette = replay.session_from_environment()
+    broker = session.broker
+    if event.get("account_id"):
+        broker = AccountBroker(broker, event["account_id"])
+    monitor = PositionMonitor(
+        broker,
+        request_budget=int(event.get("request_budget", PositionMonitor.REQUEST_BUDGET)),
+    )
+    report = monitor.run(
+        cycles=int(event.get("cycles", 1)),
+        interval=float(event.get("interval", 0)),
+        deadline=event.get("deadline"),
     )
-    response = trader.trade()
-    logging.info(str(response))
+    logging.info("Monitor finished", extra=dict(report, stage="monitor"))
+    session.close()
+    if cassette:
+        cassette.save()
+    metrics.emit()
+    log_utils.flush()
+    return report
 
 
 if __name__ == "__main__":
@@ -0,0 +1,52 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from utils import black_scholes
+from utils.common_utils import OptionType
+
+
+class ChainSource(ABC):
+    # Distance between listed strikes
+    strike_interval = 5.0
+
+    def snap(self, strikes: np.ndarray) -> np.ndarray:
+        return np.round(strikes / self.strike_interval) * self.strike_interval
+
+    # Mid price of every strike, with years_to_expiry in calendar years as
+    # black_scholes measures it
+    @abstractmethod
+    def mid_prices(
+        self,
+        option_type: OptionType,
+        underlying: np.ndarray,
+        strikes: np.ndarray,
+        vix: np.ndarray,
+        years_to_expiry: np.ndarray,
+    ) -> np.ndarray:
+        pass
+
+
+class BlackScholesChainSource(ChainSource):
+    def __init__(
+        self,
+        strike_interval: float = 5.0,
+        rate: float = 0.0,
+        vol_multiplier: float = 1.0,
+    ):
+        self.strike_interval = strike_interval
+        self.rate = rate
+        self.vol_multiplier = vol_multiplier
+
+    def mid_prices(
+        self,
+        option_type: OptionType,
+        underlying: np.ndarray,
+        strikes: np.ndarray,
+        vix: np.ndarray,
+        years_to_expiry: np.ndarray,
+    ) -> np.ndarray:
+        sigma = black_scholes.sigma_from_vix(vix, self.vol_multiplier)
+        return black_scholes.price(
+            option_type, underlying, strikes, years_to_expiry, sigma, self.rate
+        )
@@ -0,0 +1,207 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from backtest.chain_source import ChainSource, BlackScholesChainSource
+from strategies import dte1_rules
+from utils import black_scholes
+from utils.common_utils import OptionType
+
+_ROUNDING_PRECISION = 0.05
+_CONTRACT_MULTIPLIER = 100
+
+
+@dataclass
+class SpreadOutcomes:
+    short_strike: np.ndarray
+    long_strike: np.ndarray
+    credit: np.ndarray
+    traded: np.ndarray
+    pnl: np.ndarray
+
+
+@dataclass
+class BacktestResult:
+    dates: np.ndarray
+    signal: np.ndarray
+    calls: SpreadOutcomes
+    puts: SpreadOutcomes
+
+    @property
+    def pnl(self) -> np.ndarray:
+        return self.calls.pnl + self.puts.pnl
+
+    def summary(self) -> dict:
+        traded = self.calls.traded | self.puts.traded
+        pnl = self.pnl[traded]
+        equity = np.cumsum(self.pnl)
+        drawdown = np.maximum.accumulate(np.append(0.0, equity))[1:] - equity
+        return {
+            "sessions": len(self.dates),
+            "trades": int(self.calls.traded.sum() + self.puts.traded.sum()),
+            "trading_days": int(traded.sum()),
+            "win_rate": float((pnl > 0).mean()) if len(pnl) else 0.0,
+            "total_pnl": float(equity[-1]) if len(equity) else 0.0,
+            "max_drawdown": float(drawdown.max()) if len(drawdown) else 0.0,
+        }
+
+
+class Dte1Backtest:
+    ATR_TIME_FRAME_DAYS = 14
+
+    def __init__(
+        self,
+        chain_source: ChainSource = None,
+        buying_power: int = 500,
+        quantity: int = 1,
+        iron_condor: bool = False,
+        holding_sessions: int = 1,
+    ):
+        self.chain_source = chain_source if chain_source else BlackScholesChainSource()
+        self.buying_power = buying_power
+        self.quantity = quantity
+        self.iron_condor = iron_condor
+        self.holding_sessions = holding_sessions
+
+    # All inputs are aligned daily arrays ordered oldest first. A decision on
+    # session t uses candles through t and settles at the close of t + holding.
+    def run(self, dates, open, high, low, close, vix) -> BacktestResult:
+        open, high, low, close, vix = (
+            np.round(np.asarray(column, dtype=np.float64), 2)
+            for column in (open, high, low, close, vix)
+        )
+        green_streak = self._streaks(open < close)
+        red_streak = self._streaks(close < open)
+        signal = np.full(len(close), OptionType.NO_OP.value, dtype=object)
+        signal[red_streak > 0] = OptionType.PUT.value
+        signal[green_streak > 0] = OptionType.CALL.value
+
+        atr = self._rolling_mean(np.round(high - low, 2), self.ATR_TIME_FRAME_DAYS)
+        settlement = np.full(len(close), np.nan)
+        if len(close) > self.holding_sessions:
+            settlement[: -self.holding_sessions] = close[self.holding_sessions :]
+        tradeable = ~np.isnan(atr) & ~np.isnan(settlement)
+        years_to_expiry = self._years_to_settlement(dates)
+
+        active_call = signal == OptionType.CALL.value
+        active_put = signal == OptionType.PUT.value
+        if self.iron_condor:
+            active_call = active_call | active_put
+            active_put = active_call.copy()
+        calls = self._simulate_side(
+            OptionType.CALL,
+            green_streak,
+            active_call & tradeable,
+            close,
+            atr,
+            vix,
+            settlement,
+            years_to_expiry,
+        )
+        puts = self._simulate_side(
+            OptionType.PUT,
+            red_streak,
+            active_put & tradeable,
+            close,
+            atr,
+            vix,
+            settlement,
+            years_to_expiry,
+        )
+        return BacktestResult(
+            dates=np.asarray(dates), signal=signal, calls=calls, puts=puts
+        )
+
+    def _simulate_side(
+        self,
+        option_type: OptionType,
+        streak: np.ndarray,
+        active: np.ndarray,
+        close: np.ndarray,
+        atr: np.ndarray,
+        vix: np.ndarray,
+        settlement: np.ndarray,
+        years_to_expiry: np.ndarray,
+    ) -> SpreadOutcomes:
+        direction = 1.0 if option_type == OptionType.CALL else -1.0
+        multiplier = np.where(
+            vix > dte1_rules.VIX_THRESHOLD,
+            self._lookup(
+                dte1_rules.DAYS_IN_ROW_TO_DELTA_WHEN_VIX_GREATER_THAN_20[option_type],
+                streak,
+            ),
+            self._lookup(
+                dte1_rules.DAYS_IN_ROW_TO_DELTA_WHEN_VIX_LESS_THAN_20[option_type],
+                streak,
+            ),
+        )
+        short_strike = self.chain_source.snap(
+            close + direction * np.nan_to_num(atr) * multiplier
+        )
+        interval = self.chain_source.strike_interval
+        width = np.floor(self.buying_power / 100 / interval) * interval
+        long_strike = short_strike + direction * width
+
+        short_mid = self.chain_source.mid_prices(
+            option_type, close, short_strike, vix, years_to_expiry
+        )
+        long_mid = self.chain_source.mid_prices(
+            option_type, close, long_strike, vix, years_to_expiry
+        )
+        credit = np.round(
+            np.trunc((short_mid - long_mid) / _ROUNDING_PRECISION) * _ROUNDING_PRECISION
+            + _ROUNDING_PRECISION,
+            2,
+        )
+        traded = active & (credit >= dte1_rules.MIN_CREDIT)
+        intrinsic = np.clip(
+            direction * (np.nan_to_num(settlement) - short_strike), 0.0, width
+        )
+        pnl = np.where(
+            traded, (credit - intrinsic) * _CONTRACT_MULTIPLIER * self.quantity, 0.0
+        )
+        return SpreadOutcomes(
+            short_strike=short_strike,
+            long_strike=long_strike,
+            credit=credit,
+            traded=traded,
+            pnl=pnl,
+        )
+
+    # Calendar time from each session's close to the close it settles at, so
+    # a weekend is priced as the live strategy prices it. The last sessions,
+    # which never settle, count holding_sessions days.
+    def _years_to_settlement(self, dates) -> np.ndarray:
+        dates = np.asarray(dates, dtype="datetime64[D]")
+        days = np.full(len(dates), float(self.holding_sessions))
+        if len(dates) > self.holding_sessions:
+            days[: -self.holding_sessions] = (
+                dates[self.holding_sessions :] - dates[: -self.holding_sessions]
+            ) / np.timedelta64(1, "D")
+        return black_scholes.years_from_days(days)
+
+    @staticmethod
+    def _streaks(mask: np.ndarray) -> np.ndarray:
+        # Length of the run of True values ending at each session
+        index = np.arange(len(mask))
+        last_false = np.maximum.accumulate(np.where(mask, -1, index))
+        return index - last_false
+
+    @staticmethod
+    def _rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+        means = np.full(len(values), np.nan)
+        if len(values) >= window:
+            sums = np.cumsum(np.append(0.0, values))
+            means[window - 1 :] = (sums[window:] - sums[:-window]) / window
+        return means
+
+    @staticmethod
+    def _lookup(table: dict, counts: np.ndarray) -> np.ndarray:
+        largest = max(table.keys())
+        values = np.full(largest + 1, table[-1])
+        for count, value in table.items():
+            if count >= 0:
+                values[count] = value
+        return np.where(
+            counts <= largest, values[np.minimum(counts, largest)], table[-1]
+        )
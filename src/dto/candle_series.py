@@ -0,0 +1,91 @@
+import numpy as np
+
+from dto.candle import Candle
+
+
+class CandleSeries:
+    # Rows are ordered newest first, so index 0 is the most recent session
+    _PRICE_PRECISION = 2
+
+    def __init__(self, open, high, low, close):
+        self.open = np.asarray(open, dtype=np.float64)
+        self.high = np.asarray(high, dtype=np.float64)
+        self.low = np.asarray(low, dtype=np.float64)
+        self.close = np.asarray(close, dtype=np.float64)
+
+    @classmethod
+    def from_oldest_first(cls, open, high, low, close, rows: int = None):
+        def prepare(column) -> np.ndarray:
+            column = np.round(
+                np.asarray(column, dtype=np.float64)[::-1], cls._PRICE_PRECISION
+            )
+            return column[:rows] if rows else column
+
+        return cls(prepare(open), prepare(high), prepare(low), prepare(close))
+
+    def __len__(self) -> int:
+        return len(self.close)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return CandleSeries(
+                self.open[item], self.high[item], self.low[item], self.close[item]
+            )
+        return Candle(
+            open=float(self.open[item]),
+            close=float(self.close[item]),
+            high=float(self.high[item]),
+            low=float(self.low[item]),
+        )
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def nbytes(self) -> int:
+        return self.open.nbytes + self.high.nbytes + self.low.nbytes + self.close.nbytes
+
+    @property
+    def daily_ranges(self) -> np.ndarray:
+        return np.round(self.high - self.low, self._PRICE_PRECISION)
+
+    @property
+    def true_ranges(self) -> np.ndarray:
+        # The oldest row has no previous close, so its true range is its daily range
+        previous_close = np.append(self.close[1:], np.nan)
+        ranges = np.fmax(
+            self.high - self.low,
+            np.fmax(
+                np.abs(self.high - previous_close), np.abs(self.low - previous_close)
+            ),
+        )
+        return ranges
+
+    def atr(self, period: int = None) -> float:
+        ranges = self.daily_ranges[:period]
+        if len(ranges) == 0:
+            return 0.0
+        return float(ranges.sum() / len(ranges))
+
+    def wilder_atr(self, period: int) -> float:
+        ranges = self.true_ranges[::-1]
+        if len(ranges) < period:
+            return float(ranges.mean()) if len(ranges) else 0.0
+        seed = ranges[:period].mean()
+        rest = ranges[period:]
+        decay = 1.0 - 1.0 / period
+        weights = (1.0 / period) * decay ** np.arange(len(rest) - 1, -1, -1)
+        return float(seed * decay ** len(rest) + np.dot(weights, rest))
+
+    def red_streak(self) -> int:
+        return self._leading_true(self.close < self.open)
+
+    def green_streak(self) -> int:
+        return self._leading_true(self.open < self.close)
+
+    @staticmethod
+    def _leading_true(mask: np.ndarray) -> int:
+        if mask.all():
+            return len(mask)
+        return int(np.argmin(mask))
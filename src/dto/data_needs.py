@@ -0,0 +1,17 @@
+from dataclasses import dataclass, field
+
+
+@dataclass
+class DataNeeds:
+    # Sessions of price history per ticker
+    history: dict = field(default_factory=dict)
+    # TDA symbols to quote
+    quotes: set = field(default_factory=set)
+    # (ticker, expiration date as YYYY-MM-DD) pairs
+    chains: set = field(default_factory=set)
+
+    def update(self, other: "DataNeeds") -> None:
+        for ticker, sessions in other.history.items():
+            self.history[ticker] = max(sessions, self.history.get(ticker, 0))
+        self.quotes.update(other.quotes)
+        self.chains.update(other.chains)
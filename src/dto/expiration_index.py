@@ -0,0 +1,66 @@
+import datetime
+from bisect import bisect_left, insort
+
+from dto.strike_index import StrikeIndex
+
+
+class ExpirationIndex:
+    # One side of a ticker's option chain across every expiration fetched so
+    # far, each kept as a StrikeIndex. Listed dates are sorted for bisect, and
+    # the date windows already fetched are tracked, so an expiration missing
+    # inside one is known not to be listed rather than not yet fetched.
+    def __init__(self):
+        self.dates = []
+        self._strikes = {}
+        # Sorted, non-overlapping (from_date, to_date) windows
+        self._windows = []
+        # As reported with the latest chain added
+        self.underlying_price = None
+
+    # Adds an exp date map from a chain fetched for from_date through to_date.
+    # Keys look like "2022-03-17:1"; a date already indexed keeps its strikes
+    # unless `replace` is set, as when a wider range of strikes was fetched.
+    def add(
+        self,
+        exp_map: dict,
+        from_date: datetime.date,
+        to_date: datetime.date,
+        underlying_price: float = None,
+        replace: bool = False,
+    ) -> None:
+        if underlying_price:
+            self.underlying_price = underlying_price
+        for key, option_map in exp_map.items():
+            day = datetime.date.fromisoformat(key[:10])
+            if day not in self._strikes:
+                insort(self.dates, day)
+            elif not replace:
+                continue
+            self._strikes[day] = StrikeIndex.from_option_map(option_map)
+        self._cover(from_date, to_date)
+
+    def covers(self, from_date: datetime.date, to_date: datetime.date = None) -> bool:
+        to_date = to_date if to_date else from_date
+        i = bisect_left(self._windows, (from_date, datetime.date.max)) - 1
+        return i >= 0 and self._windows[i][1] >= to_date
+
+    def get(self, day: datetime.date) -> StrikeIndex:
+        return self._strikes.get(day)
+
+    # The first listed expiration on or after `day`, or None when none is
+    # known, either because the fetched windows end before one or because
+    # they do not reach back to `day`
+    def on_or_after(self, day: datetime.date) -> datetime.date:
+        i = bisect_left(self.dates, day)
+        if i < len(self.dates) and self.covers(day, self.dates[i]):
+            return self.dates[i]
+        return None
+
+    def _cover(self, from_date: datetime.date, to_date: datetime.date) -> None:
+        merged = []
+        for start, end in sorted(self._windows + [(from_date, to_date)]):
+            if merged and start <= merged[-1][1] + datetime.timedelta(days=1):
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        self._windows = merged
@@ -0,0 +1,112 @@
+import datetime
+import json
+import logging
+import os
+import urllib.parse
+
+import numpy as np
+
+from utils import clock
+from utils.common_utils import transform_ticker, TradingPlatforms
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ("open", "high", "low", "close")
+_CHART_URL = "https://query1.finance.yahoo.com/v8/finance/chart/{}?{}"
+_CHART_TIMEOUT_SECONDS = 10
+
+
+def _end_of_today() -> datetime.date:
+    return clock.today() + datetime.timedelta(days=1)
+
+
+# Every fetcher returns daily candles from `start` through today as aligned
+# arrays ordered oldest first, keyed by "dates" and COLUMNS
+
+
+def fetch_yahoo_history(ticker: str, start: datetime.date) -> dict:
+    import yfinance as yf
+
+    data = yf.Ticker(transform_ticker(ticker, TradingPlatforms.YAHOO)).history(
+        start=start.isoformat(), end=_end_of_today().isoformat()
+    )
+    index = data.index
+    if getattr(index, "tz", None) is not None:
+        index = index.tz_localize(None)
+    history = {"dates": index.values.astype("datetime64[D]")}
+    for column in COLUMNS:
+        history[column] = data[column.capitalize()].to_numpy(dtype=np.float64)
+    return history
+
+
+# Reads Yahoo's chart endpoint directly, which avoids importing pandas and
+# yfinance for a few dozen rows
+def fetch_yahoo_chart(ticker: str, start: datetime.date) -> dict:
+    def epoch(day: datetime.date) -> int:
+        return int(
+            datetime.datetime.combine(
+                day, datetime.time(), datetime.timezone.utc
+            ).timestamp()
+        )
+
+    import urllib.request
+
+    query = urllib.parse.urlencode(
+        {
+            "period1": epoch(start),
+            "period2": epoch(_end_of_today()),
+            "interval": "1d",
+            "events": "history",
+        }
+    )
+    request = urllib.request.Request(
+        _CHART_URL.format(
+            urllib.parse.quote(transform_ticker(ticker, TradingPlatforms.YAHOO)),
+            query,
+        ),
+        headers={"User-Agent": "Mozilla/5.0"},
+    )
+    with urllib.request.urlopen(request, timeout=_CHART_TIMEOUT_SECONDS) as response:
+        result = json.load(response)["chart"]["result"][0]
+    timestamps = np.asarray(result.get("timestamp") or [], dtype=np.int64)
+    quote = result["indicators"]["quote"][0] if timestamps.size else {}
+    # Daily bars are stamped at the exchange open, so shifting by the exchange
+    # offset lands every timestamp on its trading date
+    offset = int(result.get("meta", {}).get("gmtoffset", 0))
+    history = {
+        "dates": (timestamps + offset).astype("datetime64[s]").astype("datetime64[D]")
+    }
+    for column in COLUMNS:
+        # Missing values arrive as null and become NaN
+        history[column] = np.asarray(quote.get(column, []), dtype=np.float64)
+    complete = ~np.isnan(np.vstack([history[column] for column in COLUMNS])).any(0)
+    return {key: values[complete] for key, values in history.items()}
+
+
+class FallbackFetcher:
+    def __init__(self, *fetchers):
+        self.fetchers = fetchers
+
+    def __call__(self, ticker: str, start: datetime.date) -> dict:
+        for fetcher in self.fetchers[:-1]:
+            try:
+                return fetcher(ticker, start)
+            except Exception as e:
+                logging.warning(
+                    "{} failed for {}, falling back: {}".format(
+                        fetcher.__name__, ticker, e
+                    )
+                )
+        return self.fetchers[-1](ticker, start)
+
+
+FETCHERS = {"chart": fetch_yahoo_chart, "yfinance": fetch_yahoo_history}
+
+
+# PRICE_HISTORY_FETCHER picks the source, the lean chart reader by default with
+# yfinance behind it
+def default_fetcher():
+    name = os.environ.get("PRICE_HISTORY_FETCHER", "chart")
+    if name == "chart":
+        return FallbackFetcher(fetch_yahoo_chart, fetch_yahoo_history)
+    return FETCHERS[name]
@@ -0,0 +1,117 @@
+import datetime
+import logging
+import os
+import tempfile
+import time
+from typing import Callable
+
+import numpy as np
+
+from dto.candle_series import CandleSeries
+from dto.history_fetchers import COLUMNS as _COLUMNS, default_fetcher
+from utils import clock
+from utils.warm_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryStore:
+    DEFAULT_DIRECTORY = os.environ.get("PRICE_HISTORY_DIR", "/tmp/price_history")
+    # Seconds a stored history is served without asking Yahoo for newer sessions
+    DEFAULT_MAX_AGE = float(os.environ.get("PRICE_HISTORY_MAX_AGE_SECONDS", 900))
+    # Upper bound on rows kept per ticker, roughly twenty years of sessions
+    MAX_ROWS = 5040
+
+    def __init__(
+        self,
+        directory: str = DEFAULT_DIRECTORY,
+        max_age: float = DEFAULT_MAX_AGE,
+        fetcher: Callable[[str, datetime.date], dict] = None,
+        memory: TTLCache = None,
+    ):
+        self.directory = directory
+        self.max_age = max_age
+        self.fetcher = fetcher if fetcher else default_fetcher()
+        # Candles already built in this container, skipping the file entirely
+        self.memory = memory
+        self.fetches = 0
+        self.rows_fetched = 0
+
+    def candles(self, ticker: str, sessions: int) -> CandleSeries:
+        if self.memory is not None:
+            return self.memory.get_or_create(
+                (ticker, sessions), lambda: self._candles(ticker, sessions)
+            )
+        return self._candles(ticker, sessions)
+
+    def _candles(self, ticker: str, sessions: int) -> CandleSeries:
+        history = self._load(ticker)
+        if history is None or len(history["dates"]) < sessions:
+            history = self._fetch(ticker, self._cold_start(sessions))
+            self._save(ticker, history)
+        elif time.time() - float(history["fetched_at"]) > self.max_age:
+            # The last stored session may have been captured intraday, so it is
+            # fetched again along with everything after it
+            last_date = history["dates"][-1].astype(datetime.date)
+            history = self._merge(history, self._fetch(ticker, last_date))
+            self._save(ticker, history)
+        if len(history["dates"]) == 0:
+            msg = 'Unable to look up price history for ticker "{}".'.format(ticker)
+            logging.error(msg)
+            raise ValueError(msg)
+        return CandleSeries.from_oldest_first(
+            *(history[column] for column in _COLUMNS), rows=sessions
+        )
+
+    def _path(self, ticker: str) -> str:
+        return os.path.join(self.directory, "{}.npz".format(ticker))
+
+    def _load(self, ticker: str) -> dict:
+        try:
+            with np.load(self._path(ticker)) as stored:
+                return {key: stored[key] for key in stored.files}
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(
+                "Discarding unreadable price history for {}: {}".format(ticker, e)
+            )
+            return None
+
+    def _save(self, ticker: str, history: dict) -> None:
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".npz")
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **history)
+            os.replace(tmp_path, self._path(ticker))
+        except OSError as e:
+            logging.warning(
+                "Unable to persist price history for {}: {}".format(ticker, e)
+            )
+
+    def _fetch(self, ticker: str, start: datetime.date) -> dict:
+        history = dict(self.fetcher(ticker, start))
+        history["fetched_at"] = np.float64(time.time())
+        self.fetches += 1
+        self.rows_fetched += len(history["dates"])
+        return history
+
+    @classmethod
+    def _merge(cls, stored: dict, fetched: dict) -> dict:
+        if len(fetched["dates"]) == 0:
+            stored["fetched_at"] = fetched["fetched_at"]
+            return stored
+        keep = stored["dates"] < fetched["dates"][0]
+        merged = {"fetched_at": fetched["fetched_at"]}
+        for key in ("dates",) + _COLUMNS:
+            merged[key] = np.concatenate((stored[key][keep], fetched[key]))[
+                -cls.MAX_ROWS :
+            ]
+        return merged
+
+    @staticmethod
+    def _cold_start(sessions: int) -> datetime.date:
+        # Five sessions a week plus slack for market holidays
+        days = sessions * 7 // 5 + 10
+        return clock.today() - datetime.timedelta(days=days)
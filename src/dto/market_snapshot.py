@@ -0,0 +1,45 @@
+import logging
+import threading
+from types import MappingProxyType
+
+from tda_api.broker import Broker
+
+
+class MarketSnapshot:
+    VIX_SYMBOL = "$VIX.X"
+
+    def __init__(self, broker: Broker, symbols: tuple = (VIX_SYMBOL,)):
+        self._broker = broker
+        self._required = set(symbols)
+        self._quotes = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+
+    def require(self, *symbols: str) -> None:
+        with self._lock:
+            self._required.update(symbols)
+
+    def quote(self, symbol: str) -> dict:
+        with self._lock:
+            self._required.add(symbol)
+            missing = sorted(self._required.difference(self._quotes))
+            if missing:
+                response = self._broker.quotes(missing)
+                self.requests += 1
+                for ticker in missing:
+                    if ticker not in response:
+                        msg = "TDA's quote api returned nothing for {}".format(ticker)
+                        logging.error(msg)
+                        raise RuntimeError(msg)
+                    self._quotes[ticker] = MappingProxyType(response[ticker])
+            return self._quotes[symbol]
+
+    def last_price(self, symbol: str) -> float:
+        return self.quote(symbol)["lastPrice"]
+
+    @property
+    def vix(self) -> float:
+        return self.last_price(self.VIX_SYMBOL)
+
+    def stats(self) -> dict:
+        return {"quote_requests": self.requests, "quoted_symbols": len(self._quotes)}
@@ -0,0 +1,82 @@
+class OptionContract:
+    # The few fields of a TDA chain entry the strategies read. A full entry
+    # carries around fifty keys; this keeps one small fixed-layout record.
+    __slots__ = (
+        "symbol",
+        "put_call",
+        "strike",
+        "bid",
+        "ask",
+        "mark",
+        "delta",
+        "gamma",
+        "theta",
+        "vega",
+        "volatility",
+        "days_to_expiration",
+    )
+
+    def __init__(
+        self,
+        symbol: str,
+        put_call: str,
+        strike: float,
+        bid: float,
+        ask: float,
+        mark: float = None,
+        delta: float = None,
+        gamma: float = None,
+        theta: float = None,
+        vega: float = None,
+        volatility: float = None,
+        days_to_expiration: int = None,
+    ):
+        self.symbol = symbol
+        self.put_call = put_call
+        self.strike = strike
+        self.bid = bid
+        self.ask = ask
+        self.mark = mark
+        self.delta = delta
+        self.gamma = gamma
+        self.theta = theta
+        self.vega = vega
+        self.volatility = volatility
+        self.days_to_expiration = days_to_expiration
+
+    @classmethod
+    def from_tda(cls, contract: dict, strike: float = None) -> "OptionContract":
+        get = contract.get
+        return cls(
+            symbol=get("symbol"),
+            put_call=get("putCall"),
+            strike=float(get("strikePrice", strike)),
+            bid=get("bid"),
+            ask=get("ask"),
+            mark=get("mark"),
+            delta=get("delta"),
+            gamma=get("gamma"),
+            theta=get("theta"),
+            vega=get("vega"),
+            volatility=get("volatility"),
+            days_to_expiration=get("daysToExpiration"),
+        )
+
+    @property
+    def mid(self) -> float:
+        return (self.bid + self.ask) / 2.0
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, OptionContract):
+            return NotImplemented
+        return all(
+            getattr(self, field) == getattr(other, field) for field in self.__slots__
+        )
+
+    def __repr__(self) -> str:
+        return "OptionContract({})".format(
+            ", ".join(
+                "{}={!r}".format(field, getattr(self, field))
+                for field in self.__slots__
+            )
+        )
@@ -1,6 +1,7 @@
 from dataclasses import dataclass
 
-from utils.common_utils import OrderType, Instruction
+from dto.option_contract import OptionContract
+from utils.common_utils import OrderType, Instruction, OptionType
 
 
 @dataclass
@@ -8,7 +9,7 @@ class OptionLeg:
     symbol: str
     instruction: Instruction
     quantity: int
-    metadata: dict
+    metadata: OptionContract
 
 
 @dataclass
@@ -19,3 +20,22 @@ class VerticalSpread:
     short_leg: OptionLeg
     long_leg: OptionLeg
     price: float
+
+
+@dataclass
+class OpenSpread:
+    underlying: str
+    option_type: OptionType
+    expiration_date: str
+    short_leg: OptionLeg
+    long_leg: OptionLeg
+    # Credit received per spread when it was opened
+    credit: float
+
+    @property
+    def quantity(self) -> int:
+        return self.short_leg.quantity
+
+    @property
+    def width(self) -> float:
+        return abs(self.long_leg.metadata.strike - self.short_leg.metadata.strike)
@@ -0,0 +1,125 @@
+import datetime
+import json
+import logging
+import os
+import tempfile
+
+from dto.trade_plan import TradePlan
+
+logger = logging.getLogger(__name__)
+
+
+class PlanStore:
+    # A local directory, for development, tests and replays. Lambda functions
+    # do not share a filesystem, so deployed plans go to S3PlanStore.
+    DEFAULT_DIRECTORY = os.environ.get("TRADE_PLAN_DIR", "/tmp/trade_plans")
+
+    def __init__(self, directory: str = DEFAULT_DIRECTORY):
+        self.directory = directory
+
+    def save(self, trade_date: datetime.date, plans: list) -> str:
+        return self._write(trade_date, json.dumps([plan.to_dict() for plan in plans]))
+
+    # Plans for the session keyed by TradePlan.key, empty when none were made.
+    # A plan that cannot be read is skipped, the strategy then decides live.
+    def load(self, trade_date: datetime.date) -> dict:
+        try:
+            body = self._read(trade_date)
+            if body is None:
+                return {}
+            stored = json.loads(body)
+        except (OSError, ValueError) as e:
+            logging.warning(
+                "Discarding unreadable trade plans for {}: {}".format(trade_date, e)
+            )
+            return {}
+        plans = {}
+        for entry in stored:
+            try:
+                plan = TradePlan.from_dict(entry)
+            except (KeyError, TypeError, ValueError) as e:
+                logging.warning("Discarding trade plan {}: {}".format(entry, e))
+                continue
+            if plan.trade_date == trade_date.isoformat():
+                plans[plan.key] = plan
+        return plans
+
+    # The stored JSON, None when nothing was saved for trade_date
+    def _read(self, trade_date: datetime.date) -> str:
+        try:
+            with open(self._path(trade_date)) as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write(self, trade_date: datetime.date, body: str) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".json")
+        with os.fdopen(fd, "w") as f:
+            f.write(body)
+        path = self._path(trade_date)
+        os.replace(tmp_path, path)
+        return path
+
+    def _path(self, trade_date: datetime.date) -> str:
+        return os.path.join(self.directory, "{}.json".format(trade_date.isoformat()))
+
+
+class S3PlanStore(PlanStore):
+    # One object per trade date under `prefix`, so the planning function and
+    # the trading function share plans without a mount or a VPC
+    DEFAULT_PREFIX = "trade_plans/"
+
+    def __init__(self, bucket: str, prefix: str = DEFAULT_PREFIX, client=None):
+        super().__init__(directory=None)
+        self.bucket = bucket
+        self.prefix = prefix
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            # boto3 ships with the Lambda runtime; only deployed runs load it
+            import boto3
+
+            self._client = boto3.client("s3")
+        return self._client
+
+    def _read(self, trade_date: datetime.date) -> str:
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        try:
+            response = self.client.get_object(
+                Bucket=self.bucket, Key=self._key(trade_date)
+            )
+            return response["Body"].read().decode("utf-8")
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None
+            raise OSError(str(e)) from e
+        except BotoCoreError as e:
+            raise OSError(str(e)) from e
+
+    def _write(self, trade_date: datetime.date, body: str) -> str:
+        key = self._key(trade_date)
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=key,
+            Body=body.encode("utf-8"),
+            ContentType="application/json",
+        )
+        return "s3://{}/{}".format(self.bucket, key)
+
+    def _key(self, trade_date: datetime.date) -> str:
+        return "{}{}.json".format(self.prefix, trade_date.isoformat())
+
+
+# S3 when TRADE_PLAN_BUCKET is set, as it is in the deployed functions,
+# otherwise the local directory
+def default_plan_store() -> PlanStore:
+    bucket = os.environ.get("TRADE_PLAN_BUCKET")
+    if bucket:
+        return S3PlanStore(
+            bucket, os.environ.get("TRADE_PLAN_PREFIX", S3PlanStore.DEFAULT_PREFIX)
+        )
+    return PlanStore()
@@ -1,43 +1,32 @@
 import logging
-import watchtower
-import yfinance as yf
-import numpy as np
 
-from dto.candle import Candle
-from utils.common_utils import transform_ticker, TradingPlatforms
+from dto.candle_series import CandleSeries
+from dto.history_store import HistoryStore
+from utils import metrics
 
-logging.basicConfig(level=logging.ERROR, handlers=[watchtower.CloudWatchLogHandler()])
 logger = logging.getLogger(__name__)
 
 
 class Stock:
     ATR_TIME_FRAME_DAYS = 14
 
-    def __init__(self, ticker):
+    def __init__(
+        self,
+        ticker,
+        lookback: int = ATR_TIME_FRAME_DAYS,
+        history_store: HistoryStore = None,
+    ):
         self.ticker: str = ticker
-        self.candles: list = self._get_candles()
+        self._lookback = max(lookback, self.ATR_TIME_FRAME_DAYS)
+        self._history_store = history_store if history_store else HistoryStore()
+        self.candles: CandleSeries = self._get_candles()
         self.atr: float = self._get_atr()
 
-    def _get_candles(self) -> list:
-        candles = np.empty(self.ATR_TIME_FRAME_DAYS, dtype=Candle)
-        data = yf.Ticker(transform_ticker(self.ticker, TradingPlatforms.YAHOO)).history(
-            period=str(Stock.ATR_TIME_FRAME_DAYS) + "d"
-        )
-        if len(data) == 0:
-            msg = 'yfinance library unable to look up ticker "{}".'.format(self.ticker)
-            logging.error(msg)
-            raise ValueError(msg)
-        for i in range(1, self.ATR_TIME_FRAME_DAYS + 1):
-            candles[i - 1] = Candle(
-                open=round(data.Open[-i], 2),
-                close=round(data.Close[-i], 2),
-                high=round(data.High[-i], 2),
-                low=round(data.Low[-i], 2),
-            )
+    def _get_candles(self) -> CandleSeries:
+        with metrics.span("stock.candles", ticker=self.ticker) as span:
+            candles = self._history_store.candles(self.ticker, self._lookback)
+            span.add_payload(candles.nbytes)
         return candles
 
     def _get_atr(self) -> float:
-        atr_sum = 0.0
-        for candle in self.candles:
-            atr_sum += candle.daily_range
-        return atr_sum / self.ATR_TIME_FRAME_DAYS
+        return self.candles.atr(self.ATR_TIME_FRAME_DAYS)
@@ -0,0 +1,46 @@
+import logging
+from dataclasses import dataclass, field
+
+from utils.common_utils import OrderType
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StrategyConfig:
+    strategy: str
+    ticker: str = "SPX"
+    order_type: OrderType = OrderType.CREDIT
+    buying_power: int = 500
+    # None places orders in the account from lib.config
+    account_id: str = None
+    # Seconds a concurrent Trader allows it, None takes the strategy's own
+    deadline: float = None
+    # Any other keyword arguments of the strategy, such as monday_quantity
+    options: dict = field(default_factory=dict)
+
+    # Builds a config from a plain mapping such as an event payload entry, where
+    # order_type is given by name ("CREDIT") or value ("NET_CREDIT")
+    @classmethod
+    def from_dict(cls, config: dict) -> "StrategyConfig":
+        config = dict(config)
+        if "strategy" not in config:
+            msg = "Strategy config is missing a strategy name: {}".format(config)
+            logging.error(msg)
+            raise ValueError(msg)
+        order_type = config.pop("order_type", OrderType.CREDIT)
+        if not isinstance(order_type, OrderType):
+            order_type = (
+                OrderType[order_type]
+                if order_type in OrderType.__members__
+                else OrderType(order_type)
+            )
+        return cls(
+            strategy=config.pop("strategy"),
+            ticker=config.pop("ticker", "SPX"),
+            order_type=order_type,
+            buying_power=config.pop("buying_power", 500),
+            account_id=config.pop("account_id", None),
+            deadline=config.pop("deadline", None),
+            options=config,
+        )
@@ -0,0 +1,62 @@
+from array import array
+from bisect import bisect_left, bisect_right
+
+from dto.option_contract import OptionContract
+
+
+class StrikeIndex:
+    # Tolerance when comparing float strikes against a target distance
+    _EPSILON = 1e-9
+
+    def __init__(self, contracts: list):
+        contracts = sorted(contracts, key=lambda contract: contract.strike)
+        self.strikes = array("d", (contract.strike for contract in contracts))
+        self.contracts = contracts
+
+    # Parses one expiration of a TDA chain response, a mapping of strike to a
+    # list holding that strike's contract
+    @classmethod
+    def from_option_map(cls, option_map: dict) -> "StrikeIndex":
+        return cls(
+            [
+                OptionContract.from_tda(contracts[0], float(strike))
+                for strike, contracts in option_map.items()
+            ]
+        )
+
+    def __len__(self) -> int:
+        return len(self.strikes)
+
+    def nearest(self, strike: float) -> int:
+        if not self.strikes:
+            return -1
+        i = bisect_left(self.strikes, strike)
+        if i == len(self.strikes):
+            return i - 1
+        if i > 0 and strike - self.strikes[i - 1] <= self.strikes[i] - strike:
+            return i - 1
+        return i
+
+    # Whether low through high lies within the strikes listed, so nearest() and
+    # offset() find them rather than stopping at the edge of the chain
+    def covers(self, low: float, high: float) -> bool:
+        return (
+            len(self.strikes) > 0
+            and self.strikes[0] - self._EPSILON <= low
+            and high <= self.strikes[-1] + self._EPSILON
+        )
+
+    # Farthest strike no more than `distance` away from `index`, moving up the
+    # chain when `direction` is positive and down it otherwise
+    def offset(self, index: int, distance: float, direction: int) -> int:
+        if direction > 0:
+            target = self.strikes[index] + distance + self._EPSILON
+            return max(index, bisect_right(self.strikes, target) - 1)
+        target = self.strikes[index] - distance - self._EPSILON
+        return min(index, bisect_left(self.strikes, target))
+
+    def strike(self, index: int) -> float:
+        return self.strikes[index]
+
+    def contract(self, index: int) -> OptionContract:
+        return self.contracts[index]
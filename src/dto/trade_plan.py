@@ -0,0 +1,91 @@
+from dataclasses import dataclass, field
+
+from utils.common_utils import OptionType
+
+
+# Everything in a config that changes what a plan trades, so configs that
+# only differ in account or quantities do not share or overwrite a plan
+def plan_key(
+    strategy: str,
+    ticker: str,
+    buying_power: int,
+    account_id: str = None,
+    quantities: dict = None,
+) -> str:
+    key = "{}:{}:{}:{}".format(strategy, ticker, buying_power, account_id or "default")
+    for name, quantity in sorted((quantities or {}).items()):
+        key += ":{}={}".format(name, quantity)
+    return key
+
+
+# The quantity options of a strategy config, e.g. "monday_quantity"
+def quantity_options(options: dict) -> dict:
+    return {
+        name: value for name, value in options.items() if name.endswith("_quantity")
+    }
+
+
+@dataclass
+class TradePlan:
+    strategy: str
+    ticker: str
+    # Session the plan is for and the expiration it trades, as YYYY-MM-DD
+    trade_date: str
+    expiration_date: str
+    option_type: OptionType
+    # Target short strike per side, keyed by OptionType value
+    short_strikes: dict
+    # Buying power per spread, which sets the distance between the strikes
+    buying_power: int
+    quantity: int
+    # What the plan was derived from (close, ATR, VIX, streaks), for the logs
+    inputs: dict = field(default_factory=dict)
+    # The config's account and quantity options, which are part of the key
+    account_id: str = None
+    quantities: dict = field(default_factory=dict)
+
+    @property
+    def key(self) -> str:
+        return plan_key(
+            self.strategy,
+            self.ticker,
+            self.buying_power,
+            self.account_id,
+            self.quantities,
+        )
+
+    def short_strike(self, option_type: OptionType) -> float:
+        return self.short_strikes[option_type.value]
+
+    def to_dict(self) -> dict:
+        return {
+            "strategy": self.strategy,
+            "ticker": self.ticker,
+            "trade_date": self.trade_date,
+            "expiration_date": self.expiration_date,
+            "option_type": self.option_type.value,
+            "short_strikes": self.short_strikes,
+            "buying_power": self.buying_power,
+            "quantity": self.quantity,
+            "inputs": self.inputs,
+            "account_id": self.account_id,
+            "quantities": self.quantities,
+        }
+
+    @classmethod
+    def from_dict(cls, plan: dict) -> "TradePlan":
+        return cls(
+            strategy=plan["strategy"],
+            ticker=plan["ticker"],
+            trade_date=plan["trade_date"],
+            expiration_date=plan["expiration_date"],
+            option_type=OptionType(plan["option_type"]),
+            short_strikes={
+                side: float(strike) for side, strike in plan["short_strikes"].items()
+            },
+            buying_power=plan["buying_power"],
+            quantity=plan["quantity"],
+            inputs=plan.get("inputs", {}),
+            account_id=plan.get("account_id"),
+            quantities=plan.get("quantities", {}),
+        )
@@ -0,0 +1,261 @@
+import datetime
+import logging
+import threading
+
+from dto.expiration_index import ExpirationIndex
+from dto.strike_index import StrikeIndex
+from tda_api.broker import Broker
+from utils.common_utils import transform_ticker, TradingPlatforms, OptionType
+from utils.warm_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class ChainCache:
+    # Strikes requested above and below the at-the-money strike
+    STRIKE_COUNT = 60
+    # Most strikes widen() asks for when a target lies outside those fetched
+    MAX_STRIKE_COUNT = 480
+    # How far past a target date nearest_expiration fetches when what is
+    # already loaded does not reach a listed expiration
+    LOOKAHEAD_DAYS = 7
+    # Widest date range prefetch asks for in one request
+    MAX_WINDOW_DAYS = 7
+    _EXP_DATE_MAPS = {
+        OptionType.PUT: "putExpDateMap",
+        OptionType.CALL: "callExpDateMap",
+    }
+
+    def __init__(
+        self,
+        broker: Broker,
+        strike_count: int = STRIKE_COUNT,
+        shared: TTLCache = None,
+    ):
+        self._broker = broker
+        self._strike_count = strike_count
+        # Indexes built by earlier invocations in this container, keyed by
+        # (ticker, side)
+        self._shared = shared
+        self._indexes = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # One expiration's strikes for each side, None for a side not requested or
+    # with nothing listed that day
+    def get(
+        self, ticker: str, expiration_date: str, option_type: OptionType = None
+    ) -> (StrikeIndex, StrikeIndex):
+        day = datetime.date.fromisoformat(expiration_date)
+        put_index, call_index = self.load(ticker, day, day, option_type)
+        return (
+            put_index.get(day) if put_index else None,
+            call_index.get(day) if call_index else None,
+        )
+
+    # Every expiration from from_date through to_date for each side, fetched
+    # in at most one request. Later lookups inside the range, for any
+    # expiration, are served from the same indexes.
+    def load(
+        self,
+        ticker: str,
+        from_date: datetime.date,
+        to_date: datetime.date,
+        option_type: OptionType = None,
+    ) -> (ExpirationIndex, ExpirationIndex):
+        with self._ticker_lock(ticker):
+            indexes = self._indexes_for(ticker, option_type)
+            missing = [
+                side
+                for side, index in indexes.items()
+                if not index.covers(from_date, to_date)
+            ]
+            with self._lock:
+                if missing:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+            if missing:
+                self._fetch(
+                    ticker,
+                    from_date,
+                    to_date,
+                    missing[0] if len(missing) == 1 else None,
+                    indexes,
+                )
+        return indexes.get(OptionType.PUT), indexes.get(OptionType.CALL)
+
+    # The first expiration on or after `day` listed on every requested side,
+    # as YYYY-MM-DD, or None when there is none within LOOKAHEAD_DAYS
+    def nearest_expiration(
+        self, ticker: str, day: datetime.date, option_type: OptionType = None
+    ) -> str:
+        with self._ticker_lock(ticker):
+            found = self._on_or_after(self._indexes_for(ticker, option_type), day)
+        if found is not None:
+            with self._lock:
+                self.hits += 1
+            return found.isoformat()
+        put_index, call_index = self.load(
+            ticker,
+            day,
+            day + datetime.timedelta(days=self.LOOKAHEAD_DAYS),
+            option_type,
+        )
+        found = self._on_or_after(
+            {
+                side: index
+                for side, index in (
+                    (OptionType.PUT, put_index),
+                    (OptionType.CALL, call_index),
+                )
+                if index is not None
+            },
+            day,
+        )
+        return found.isoformat() if found else None
+
+    # One side of one expiration with strikes reaching from low to high. When
+    # the cached strikes fall short, it is fetched again with twice as many
+    # strikes, up to MAX_STRIKE_COUNT, and the wider strikes replace the
+    # cached ones. The strikes returned may still fall short at the limit.
+    def widen(
+        self,
+        ticker: str,
+        expiration_date: str,
+        option_type: OptionType,
+        low: float,
+        high: float,
+    ) -> StrikeIndex:
+        day = datetime.date.fromisoformat(expiration_date)
+        with self._ticker_lock(ticker):
+            indexes = self._indexes_for(ticker, option_type)
+            strikes = indexes[option_type].get(day)
+            strike_count = max(self._strike_count, len(strikes) if strikes else 0)
+            while (
+                strikes is None or not strikes.covers(low, high)
+            ) and strike_count < self.MAX_STRIKE_COUNT:
+                strike_count = min(2 * strike_count, self.MAX_STRIKE_COUNT)
+                logging.info(
+                    "Fetching {} {} strikes around {} to reach {} through {}".format(
+                        strike_count, option_type.name, expiration_date, low, high
+                    ),
+                    extra={"ticker": ticker, "stage": "chain"},
+                )
+                with self._lock:
+                    self.misses += 1
+                self._fetch(
+                    ticker,
+                    day,
+                    day,
+                    option_type,
+                    indexes,
+                    strike_count=strike_count,
+                    replace=True,
+                )
+                strikes = indexes[option_type].get(day)
+        return strikes
+
+    # The underlying's price as of the latest chain fetched for it, None
+    # before any
+    def underlying_price(self, ticker: str) -> float:
+        with self._lock:
+            prices = [
+                self._indexes[(ticker, side)].underlying_price
+                for side in self._EXP_DATE_MAPS
+                if (ticker, side) in self._indexes
+            ]
+        prices = [price for price in prices if price]
+        return prices[0] if prices else None
+
+    def stats(self) -> dict:
+        return {"chain_hits": self.hits, "chain_misses": self.misses}
+
+    # Groups (ticker, YYYY-MM-DD) pairs into (ticker, from_date, to_date)
+    # ranges of at most MAX_WINDOW_DAYS, so nearby expirations share a fetch
+    @classmethod
+    def windows(cls, chains: set) -> list:
+        days = {}
+        for ticker, expiration_date in chains:
+            days.setdefault(ticker, []).append(
+                datetime.date.fromisoformat(expiration_date)
+            )
+        windows = []
+        for ticker in sorted(days):
+            for day in sorted(days[ticker]):
+                if (
+                    windows
+                    and windows[-1][0] == ticker
+                    and (day - windows[-1][1]).days <= cls.MAX_WINDOW_DAYS
+                ):
+                    windows[-1] = (ticker, windows[-1][1], day)
+                else:
+                    windows.append((ticker, day, day))
+        return windows
+
+    def _ticker_lock(self, ticker: str) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(ticker, threading.Lock())
+
+    def _indexes_for(self, ticker: str, option_type: OptionType) -> dict:
+        sides = (
+            [option_type]
+            if option_type in (OptionType.CALL, OptionType.PUT)
+            else [OptionType.PUT, OptionType.CALL]
+        )
+        indexes = {}
+        for side in sides:
+            key = (ticker, side)
+            if key not in self._indexes:
+                self._indexes[key] = (
+                    self._shared.get_or_create(key, ExpirationIndex)
+                    if self._shared is not None
+                    else ExpirationIndex()
+                )
+            indexes[side] = self._indexes[key]
+        return indexes
+
+    @staticmethod
+    def _on_or_after(indexes: dict, day: datetime.date) -> datetime.date:
+        found = [index.on_or_after(day) for index in indexes.values()]
+        if not found or None in found:
+            return None
+        return max(found)
+
+    # Only the requested range is kept, as compact contracts indexed by
+    # expiration and strike, so the raw response can be released as soon as
+    # it is parsed
+    def _fetch(
+        self,
+        ticker: str,
+        from_date: datetime.date,
+        to_date: datetime.date,
+        option_type: OptionType,
+        indexes: dict,
+        strike_count: int = None,
+        replace: bool = False,
+    ) -> None:
+        options = self._broker.option_chain(
+            transform_ticker(ticker, TradingPlatforms.TDA),
+            option_type=option_type,
+            from_date=from_date,
+            to_date=to_date,
+            strike_count=strike_count if strike_count else self._strike_count,
+        )
+        if options.get("status") == "FAILED":
+            msg = "Call to TDA's option chain api failed, with ticker: {}".format(
+                ticker
+            )
+            logging.error(msg)
+            raise RuntimeError(msg)
+        for side, index in indexes.items():
+            if option_type in (None, side):
+                index.add(
+                    options.get(self._EXP_DATE_MAPS[side], {}),
+                    from_date,
+                    to_date,
+                    options.get("underlyingPrice"),
+                    replace,
+                )
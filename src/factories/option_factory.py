@@ -1,24 +1,33 @@
 import datetime
 
+import numpy as np
+from pytz import timezone
+
 from dto.options import VerticalSpread, OptionLeg
+from dto.history_store import HistoryStore
 from dto.stock import Stock
+from dto.strike_index import StrikeIndex
+from factories.chain_cache import ChainCache
 from tda_api.broker import Broker
+from utils import black_scholes, clock, metrics
 from utils.common_utils import (
-    transform_ticker,
-    TradingPlatforms,
     OrderType,
     Instruction,
     OptionType,
 )
 import logging
-import watchtower
 
-logging.basicConfig(level=logging.ERROR, handlers=[watchtower.CloudWatchLogHandler()])
 logger = logging.getLogger(__name__)
 
 
 class OptionFactory:
     _ROUNDING_PRECISION = 0.05
+    # A quote wider than this fraction of its mid is not trusted as a price...
+    _MAX_QUOTE_SPREAD_RATIO = 0.5
+    # ...unless it is no wider than this, as cheap far strikes always are
+    _MIN_UNTRUSTED_SPREAD = 1.0
+    # Spread prices further than this fraction from the model's are logged
+    _MAX_MODEL_DEVIATION = 0.5
 
     def __init__(
         self,
@@ -26,23 +35,67 @@ class OptionFactory:
         quantity: int,
         order_type: OrderType,
         expiration_date: datetime,
+        broker: Broker = None,
+        chain_cache: ChainCache = None,
+        history_store: HistoryStore = None,
+        roll_forward: bool = False,
+        vix: float = None,
+        underlying_price: float = None,
     ):
-        self._broker = Broker()
+        self._broker = broker if broker else Broker()
+        self._chain_cache = chain_cache if chain_cache else ChainCache(self._broker)
         self.order_type = order_type
-        self.stock = Stock(ticker)
+        self.ticker = ticker
+        self._history_store = history_store
+        self._stock = None
         self.quantity = quantity
         self.expiration_date = expiration_date.strftime("%Y-%m-%d")
+        # When nothing is listed on expiration_date, as on a holiday, trade the
+        # next expiration that is instead of failing
+        self._roll_forward = roll_forward
+        # Inputs of the Black-Scholes values behind model_values(); the
+        # underlying defaults to the price reported with the chain
+        self.vix = vix
+        self.underlying_price = underlying_price
+        self._model_values = {}
         (self.put_map, self.call_map,) = self._get_put_and_call_maps()
+        self._strike_indexes = {
+            OptionType.PUT: self.put_map,
+            OptionType.CALL: self.call_map,
+        }
+
+    # Price history is only loaded when a strategy reads it, so a run trading
+    # from a precomputed plan never fetches it
+    @property
+    def stock(self) -> Stock:
+        if self._stock is None:
+            self._stock = Stock(self.ticker, history_store=self._history_store)
+        return self._stock
 
     def get_vertical_spread(
         self, short_leg_strike: float, buying_power: int, option_type: OptionType
     ) -> VerticalSpread:
-        (short_leg, long_leg,) = self._get_legs_for_vertical_spread(
-            short_leg_strike, buying_power, option_type
-        )
-        price = self._calculate_price_for_vertical_spread(
-            option_type, short_leg, long_leg
-        )
+        with metrics.span(
+            "option_factory.vertical_spread",
+            ticker=self.ticker,
+            option_type=option_type,
+        ) as span:
+            (short_leg, long_leg,) = self._get_legs_for_vertical_spread(
+                short_leg_strike, buying_power, option_type
+            )
+            price = self._calculate_price_for_vertical_spread(
+                option_type, short_leg, long_leg
+            )
+            # Legs whose quotes were not trusted, so the order's price rests on
+            # the model rather than the market
+            values = self.model_values(option_type)
+            span.annotate(
+                model_priced_legs=[
+                    leg.symbol
+                    for leg in (short_leg, long_leg)
+                    if self._priced_from_model(option_type, leg, values)
+                ]
+            )
         return VerticalSpread(
             order_type=self.order_type,
             quantity=self.quantity,
@@ -52,124 +105,226 @@ class OptionFactory:
             price=price,
         )
 
-    def _get_put_and_call_maps(self) -> (dict, dict):
-        options = self._broker.option_chain(
-            transform_ticker(self.stock.ticker, TradingPlatforms.TDA)
+    # Theoretical value, delta and implied volatility of every strike on one
+    # side of the expiration, from the underlying price and a VIX-derived
+    # volatility, computed for the whole side at once. "trusted" marks quotes
+    # tight enough to price from. None when the VIX or underlying is unknown.
+    def model_values(self, option_type: OptionType) -> dict:
+        if option_type in self._model_values:
+            return self._model_values[option_type]
+        underlying = self.underlying_price or self._chain_cache.underlying_price(
+            self.ticker
+        )
+        if not underlying or not self.vix:
+            return None
+        strike_index = self._strike_indexes[option_type]
+        strikes = np.frombuffer(strike_index.strikes, dtype=float)
+        bids = np.array(
+            [np.nan if c.bid is None else c.bid for c in strike_index.contracts],
+            dtype=float,
+        )
+        asks = np.array(
+            [np.nan if c.ask is None else c.ask for c in strike_index.contracts],
+            dtype=float,
         )
-        if options.get("status") == "FAILED":
-            msg = "Call to TDA's option chain api failed, with ticker: {}".format(
-                self.stock.ticker
+        mids = (bids + asks) / 2.0
+        years = black_scholes.years_to_expiration(
+            clock.now(timezone("US/Eastern")),
+            datetime.date.fromisoformat(self.expiration_date),
+        )
+        value, delta = black_scholes.evaluate(
+            option_type,
+            underlying,
+            strikes,
+            years,
+            black_scholes.sigma_from_vix(self.vix),
+        )
+        with np.errstate(invalid="ignore"):
+            trusted = (
+                (bids >= 0)
+                & (asks > 0)
+                & (asks >= bids)
+                & (
+                    asks - bids
+                    <= np.maximum(
+                        self._MIN_UNTRUSTED_SPREAD, self._MAX_QUOTE_SPREAD_RATIO * mids
+                    )
+                )
             )
-            logging.error(msg)
-            raise RuntimeError(msg)
-        put_exp_map = options["putExpDateMap"]
-        call_exp_map = options["callExpDateMap"]
-        put_option = None
-        call_option = None
-        for key in put_exp_map.keys():
-            if self.expiration_date == key[: len(self.expiration_date)]:
-                put_option = put_exp_map[key]
-                break
-        for key in call_exp_map.keys():
-            if self.expiration_date == key[: len(self.expiration_date)]:
-                call_option = call_exp_map[key]
-                break
+        values = {
+            "strikes": strikes,
+            "value": value,
+            "delta": delta,
+            "mid": mids,
+            "implied_vol": black_scholes.implied_vol(
+                option_type, mids, underlying, strikes, years
+            ),
+            "trusted": trusted,
+        }
+        self._model_values[option_type] = values
+        return values
+
+    def _get_put_and_call_maps(self) -> (StrikeIndex, StrikeIndex):
+        with metrics.span(
+            "option_factory.chain",
+            ticker=self.ticker,
+            expiration_date=self.expiration_date,
+        ):
+            put_option, call_option = self._chain_cache.get(
+                self.ticker, self.expiration_date
+            )
+            if (not put_option or not call_option) and self._roll_forward:
+                nearest = self._chain_cache.nearest_expiration(
+                    self.ticker, datetime.date.fromisoformat(self.expiration_date)
+                )
+                if nearest is not None:
+                    logging.info(
+                        "Rolling expiration {} forward to {}".format(
+                            self.expiration_date, nearest
+                        ),
+                        extra={"ticker": self.ticker, "stage": "chain"},
+                    )
+                    self.expiration_date = nearest
+                    put_option, call_option = self._chain_cache.get(
+                        self.ticker, self.expiration_date
+                    )
         if not put_option or not call_option:
             msg = "No options available with an expiration date of {}".format(
                 self.expiration_date
             )
-            logging.error(msg)
+            logging.error(msg, extra={"ticker": self.ticker, "stage": "chain"})
             raise RuntimeError(msg)
         return put_option, call_option
 
     def _get_legs_for_vertical_spread(
         self, rough_strike: float, width: int, option_type: OptionType
     ) -> (OptionLeg, OptionLeg):
-        def get_leg(strike: float, instruction: Instruction) -> OptionLeg:
-            metadata = {"metadata": ""}
-            if option_type == OptionType.CALL:
-                metadata = self.call_map[str(strike)][0]
-            elif option_type == OptionType.PUT:
-                metadata = self.put_map[str(strike)][0]
+        if option_type not in self._strike_indexes:
+            msg = "OptionType was invalid when calling OptionFactory.get_vertical_spread: {}".format(
+                option_type
+            )
+            logging.info(msg, extra={"ticker": self.ticker, "stage": "strikes"})
+            raise ValueError(msg)
+        direction = 1 if option_type == OptionType.CALL else -1
+        strike_index = self._strikes_reaching(
+            option_type, rough_strike, rough_strike + direction * width / 100
+        )
+
+        def get_leg(index: int, instruction: Instruction) -> OptionLeg:
+            contract = strike_index.contract(index)
             return OptionLeg(
-                symbol=metadata["symbol"],
+                symbol=contract.symbol,
                 instruction=instruction,
                 quantity=self.quantity,
-                metadata=metadata,
+                metadata=contract,
             )
 
-        def get_long_leg_strike(
-            strikes: list, strike_index: int, short_strike: float
-        ) -> float:
-            if option_type == OptionType.CALL:
-                strikes = strikes[strike_index:]
-            elif option_type == OptionType.PUT:
-                strikes = strikes[: strike_index + 1]
-                strikes.reverse()
-            else:
-                return -1
-            prev_strike = strikes[0]
-            for strike in strikes:
-                if abs(float(strike) - short_strike) >= width / 100:
-                    if abs(float(strike) - short_strike) > width / 100:
-                        return float(prev_strike)
-                    return float(strike)
-                prev_strike = strike
-
-        def get_strike_prices() -> list:
-            if option_type == OptionType.CALL:
-                return sorted(self.call_map.keys())
-            elif option_type == OptionType.PUT:
-                return sorted(self.put_map.keys())
-            logging.info(
-                "OptionType was invalid when calling OptionFactory.get_get_vertical_spread: {}".format(
-                    option_type
-                )
-            )
-            return []
-
-        def get_short_leg_strike_and_index(strikes: list) -> (float, int):
-            strike = -1
-            index = -1
-            min_diff = float("Inf")
-            for i, strike_price in enumerate(strikes):
-                diff = abs(float(strike_price) - rough_strike)
-                if diff < min_diff:
-                    index = i
-                    min_diff = diff
-                    strike = float(strike_price)
-            return strike, index
-
-        strike_prices = get_strike_prices()
-        short_leg_strike, short_strike_index = get_short_leg_strike_and_index(
-            strike_prices
-        )
-        long_leg_strike = get_long_leg_strike(
-            strikes=strike_prices,
-            strike_index=short_strike_index,
-            short_strike=short_leg_strike,
+        short_strike_index = strike_index.nearest(rough_strike)
+        long_strike_index = strike_index.offset(
+            short_strike_index, width / 100, direction
         )
-        if short_leg_strike == long_leg_strike:
+        if short_strike_index == long_strike_index:
             msg = "Vertical spread {} strike prices are the same for both long & short legs: {}".format(
-                option_type.name, short_leg_strike
+                option_type.name, strike_index.strike(short_strike_index)
             )
-            logging.error(msg)
-            print(msg)
+            logging.error(msg, extra={"ticker": self.ticker, "stage": "strikes"})
         return (
-            get_leg(short_leg_strike, Instruction.SELL_TO_OPEN),
-            get_leg(long_leg_strike, Instruction.BUY_TO_OPEN),
+            get_leg(short_strike_index, Instruction.SELL_TO_OPEN),
+            get_leg(long_strike_index, Instruction.BUY_TO_OPEN),
         )
 
+    # The side's strikes, fetched wider when they do not reach from low to high,
+    # so a spread is never built from the strikes at the edge of the chain
+    def _strikes_reaching(
+        self, option_type: OptionType, *strikes: float
+    ) -> StrikeIndex:
+        low, high = min(strikes), max(strikes)
+        strike_index = self._strike_indexes[option_type]
+        if strike_index.covers(low, high):
+            return strike_index
+        strike_index = self._chain_cache.widen(
+            self.ticker, self.expiration_date, option_type, low, high
+        )
+        if strike_index is None or not strike_index.covers(low, high):
+            msg = "Strikes {} through {} are outside the {} chain for {}".format(
+                low, high, option_type.name, self.expiration_date
+            )
+            logging.error(msg, extra={"ticker": self.ticker, "stage": "strikes"})
+            raise RuntimeError(msg)
+        self._strike_indexes[option_type] = strike_index
+        if option_type == OptionType.PUT:
+            self.put_map = strike_index
+        else:
+            self.call_map = strike_index
+        # Computed for the narrower strikes
+        self._model_values.pop(option_type, None)
+        return strike_index
+
     def _calculate_price_for_vertical_spread(
         self, option_type: OptionType, short_leg: OptionLeg, long_leg: OptionLeg
     ) -> float:
         if option_type == OptionType.NO_OP:
             return -1
-        long_leg_price = (long_leg.metadata["bid"] + long_leg.metadata["ask"]) / 2.0
-        short_leg_price = (short_leg.metadata["bid"] + short_leg.metadata["ask"]) / 2.0
+        values = self.model_values(option_type)
+        long_leg_price = self._leg_price(option_type, long_leg, values)
+        short_leg_price = self._leg_price(option_type, short_leg, values)
         price = (
             int((short_leg_price - long_leg_price) / self._ROUNDING_PRECISION)
             * self._ROUNDING_PRECISION
             + self._ROUNDING_PRECISION
         )
+        if values is not None:
+            self._check_against_model(option_type, short_leg, long_leg, price, values)
         return round(price, 2)
+
+    # The leg's mid, or its model value when its quote is missing or too wide
+    # to mean anything, as before the open
+    def _leg_price(
+        self, option_type: OptionType, leg: OptionLeg, values: dict
+    ) -> float:
+        if not self._priced_from_model(option_type, leg, values):
+            return leg.metadata.mid
+        i = self._strike_indexes[option_type].nearest(leg.metadata.strike)
+        logging.warning(
+            "Pricing {} at its model value {:.2f}, its quote is {}/{}".format(
+                leg.symbol, values["value"][i], leg.metadata.bid, leg.metadata.ask
+            ),
+            extra={"ticker": self.ticker, "stage": "pricing"},
+        )
+        return float(values["value"][i])
+
+    def _priced_from_model(
+        self, option_type: OptionType, leg: OptionLeg, values: dict
+    ) -> bool:
+        if values is None:
+            return False
+        i = self._strike_indexes[option_type].nearest(leg.metadata.strike)
+        return not values["trusted"][i]
+
+    def _check_against_model(
+        self,
+        option_type: OptionType,
+        short_leg: OptionLeg,
+        long_leg: OptionLeg,
+        price: float,
+        values: dict,
+    ) -> None:
+        strike_index = self._strike_indexes[option_type]
+        model_price = float(
+            values["value"][strike_index.nearest(short_leg.metadata.strike)]
+            - values["value"][strike_index.nearest(long_leg.metadata.strike)]
+        )
+        if abs(price - model_price) > self._MAX_MODEL_DEVIATION * max(
+            abs(model_price), self._ROUNDING_PRECISION
+        ):
+            logging.warning(
+                "Spread price {:.2f} is far from its model price {:.2f}".format(
+                    price, model_price
+                ),
+                extra={
+                    "ticker": self.ticker,
+                    "stage": "pricing",
+                    "short_leg": short_leg.symbol,
+                    "long_leg": long_leg.symbol,
+                },
+            )
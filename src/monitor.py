@@ -0,0 +1,335 @@
+import datetime
+import logging
+import math
+import re
+import time
+
+import numpy as np
+
+from dto.option_contract import OptionContract
+from dto.options import OpenSpread, OptionLeg
+from tda_api.broker import Broker
+from utils import clock
+from utils.common_utils import (
+    AssetType,
+    ExitReason,
+    Instruction,
+    OptionType,
+    OrderType,
+)
+
+logger = logging.getLogger(__name__)
+
+# TDA option symbols look like SPXW_031722P4050: root, MMDDYY, side, strike
+_OPTION_SYMBOL = re.compile(
+    r"^(?P<root>[^_]+)_(?P<date>\d{6})(?P<side>[CP])(?P<strike>\d+(?:\.\d+)?)$"
+)
+
+
+def parse_option_symbol(symbol: str) -> (str, OptionType, float):
+    match = _OPTION_SYMBOL.match(symbol)
+    if match is None:
+        msg = "Unrecognized option symbol: {}".format(symbol)
+        logging.error(msg)
+        raise ValueError(msg)
+    expiration = datetime.datetime.strptime(match.group("date"), "%m%d%y").date()
+    option_type = OptionType.CALL if match.group("side") == "C" else OptionType.PUT
+    return expiration.isoformat(), option_type, float(match.group("strike"))
+
+
+# Pairs each short option position with the long position that protects it,
+# the nearest strike below it for puts and above it for calls, in the same
+# underlying and expiration
+def pair_spreads(positions: list) -> list:
+    groups = {}
+    for position in positions:
+        instrument = position.get("instrument", {})
+        if instrument.get("assetType") != AssetType.OPTION.value:
+            continue
+        expiration, option_type, strike = parse_option_symbol(instrument["symbol"])
+        key = (instrument.get("underlyingSymbol"), expiration, option_type)
+        shorts, longs = groups.setdefault(key, ([], []))
+        entry = [
+            strike,
+            instrument["symbol"],
+            float(position.get("averagePrice", 0.0)),
+        ]
+        if position.get("shortQuantity", 0) > 0:
+            shorts.append(entry + [int(position["shortQuantity"])])
+        if position.get("longQuantity", 0) > 0:
+            longs.append(entry + [int(position["longQuantity"])])
+
+    spreads = []
+    for (underlying, expiration, option_type), (shorts, longs) in groups.items():
+        direction = 1 if option_type == OptionType.CALL else -1
+        for short in sorted(shorts, key=lambda entry: direction * entry[0]):
+            protective = sorted(
+                (entry for entry in longs if direction * (entry[0] - short[0]) > 0),
+                key=lambda entry: direction * entry[0],
+            )
+            for long in protective:
+                quantity = min(short[3], long[3])
+                if quantity == 0:
+                    continue
+                short[3] -= quantity
+                long[3] -= quantity
+                spreads.append(
+                    OpenSpread(
+                        underlying=underlying,
+                        option_type=option_type,
+                        expiration_date=expiration,
+                        short_leg=_leg(short, option_type, quantity),
+                        long_leg=_leg(long, option_type, quantity),
+                        credit=round(short[2] - long[2], 2),
+                    )
+                )
+                if short[3] == 0:
+                    break
+    return spreads
+
+
+def _leg(entry: list, option_type: OptionType, quantity: int) -> OptionLeg:
+    strike, symbol, _, _ = entry
+    return OptionLeg(
+        symbol=symbol,
+        instruction=None,
+        quantity=quantity,
+        metadata=OptionContract(symbol, option_type.value, strike, None, None),
+    )
+
+
+# One pass over every open spread. Arrays are aligned, one row per spread;
+# direction is 1 for call spreads and -1 for put spreads.
+def exit_reasons(
+    credit: np.ndarray,
+    cost_to_close: np.ndarray,
+    short_strike: np.ndarray,
+    underlying: np.ndarray,
+    direction: np.ndarray,
+    profit_target: float,
+    stop_loss: float,
+    strike_buffer: float,
+) -> np.ndarray:
+    threatened = direction * (underlying - short_strike) >= -strike_buffer
+    return np.select(
+        [
+            threatened,
+            cost_to_close >= credit * stop_loss,
+            cost_to_close <= credit * (1.0 - profit_target),
+        ],
+        [
+            ExitReason.SHORT_STRIKE_THREATENED.value,
+            ExitReason.STOP_LOSS.value,
+            ExitReason.PROFIT_TARGET.value,
+        ],
+        default=ExitReason.HOLD.value,
+    )
+
+
+class PositionMonitor:
+    # Fraction of the entry credit kept before the spread is closed
+    PROFIT_TARGET = 0.5
+    # Cost to close, as a multiple of the entry credit, that cuts the loss
+    STOP_LOSS = 2.0
+    # Points from the short strike at which the underlying counts as threatening it
+    STRIKE_BUFFER = 0.0
+    # Broker requests one run may make: positions, open orders, quotes and
+    # closing orders
+    REQUEST_BUDGET = 20
+    _ROUNDING_PRECISION = 0.05
+
+    def __init__(
+        self,
+        broker: Broker,
+        request_budget: int = REQUEST_BUDGET,
+        profit_target: float = PROFIT_TARGET,
+        stop_loss: float = STOP_LOSS,
+        strike_buffer: float = STRIKE_BUFFER,
+    ):
+        self._broker = broker
+        self.request_budget = request_budget
+        self.profit_target = profit_target
+        self.stop_loss = stop_loss
+        self.strike_buffer = strike_buffer
+        self.requests = 0
+
+    # Loads positions once, then checks them every `interval` seconds for up to
+    # `cycles` cycles, stopping early when nothing is left open, the request
+    # budget runs out or `deadline` seconds have passed
+    def run(self, cycles: int = 1, interval: float = 0.0, deadline: float = None):
+        start = time.monotonic()
+        report = {
+            "cycles": 0,
+            "closed": [],
+            "budget_exhausted": False,
+            "skipped_cycles": 0,
+            "unquoted": [],
+        }
+        if not self._spend():
+            report.update(budget_exhausted=True, requests=self.requests)
+            return report
+        spreads = pair_spreads(self._broker.positions())
+        report["open"] = len(spreads)
+        # A close left working by an earlier run is not sent again
+        if spreads:
+            if not self._spend():
+                report.update(budget_exhausted=True, requests=self.requests)
+                return report
+            closing = self.closing_symbols(self._broker.open_orders())
+            is_closing = [
+                spread.short_leg.symbol in closing or spread.long_leg.symbol in closing
+                for spread in spreads
+            ]
+            report["closing"] = sorted(
+                spread.short_leg.symbol
+                for spread, skip in zip(spreads, is_closing)
+                if skip
+            )
+            spreads = [spread for spread, skip in zip(spreads, is_closing) if not skip]
+        for cycle in range(cycles):
+            if not spreads:
+                break
+            if cycle:
+                time.sleep(max(0.0, start + cycle * interval - time.monotonic()))
+            if deadline is not None and time.monotonic() - start > deadline:
+                break
+            # Quotes outside regular hours are too wide to decide on
+            if not clock.market_is_open():
+                report["skipped_cycles"] += 1
+                continue
+            if not self._spend():
+                report["budget_exhausted"] = True
+                break
+            report["cycles"] += 1
+            decisions = self.evaluate(
+                spreads, self._broker.quotes(self._symbols(spreads))
+            )
+            still_open = []
+            for spread, (reason, price) in zip(spreads, decisions):
+                symbol = spread.short_leg.symbol
+                if (
+                    reason == ExitReason.UNQUOTED.value
+                    and symbol not in report["unquoted"]
+                ):
+                    report["unquoted"].append(symbol)
+                if reason in (ExitReason.HOLD.value, ExitReason.UNQUOTED.value):
+                    still_open.append(spread)
+                elif not self._spend():
+                    report["budget_exhausted"] = True
+                    still_open.append(spread)
+                else:
+                    report["closed"].append(self.close(spread, reason, price))
+            spreads = still_open
+            if report["budget_exhausted"]:
+                break
+        report["requests"] = self.requests
+        return report
+
+    # Option symbols with a closing instruction in any of `orders`
+    @staticmethod
+    def closing_symbols(orders: list) -> set:
+        closing = {Instruction.BUY_TO_CLOSE.value, Instruction.SELL_TO_CLOSE.value}
+        return {
+            leg["instrument"]["symbol"]
+            for order in orders
+            for leg in order.get("orderLegCollection", [])
+            if leg.get("instruction") in closing
+        }
+
+    def evaluate(self, spreads: list, quotes: dict) -> list:
+        def field(symbols: list, name: str) -> np.ndarray:
+            return np.array(
+                [quotes.get(symbol, {}).get(name, np.nan) for symbol in symbols],
+                dtype=np.float64,
+            )
+
+        shorts = [spread.short_leg.symbol for spread in spreads]
+        longs = [spread.long_leg.symbol for spread in spreads]
+        # Closing buys the short leg at the ask and sells the long leg at the bid
+        cost_to_close = np.maximum(
+            field(shorts, "askPrice") - field(longs, "bidPrice"), 0.0
+        )
+        reasons = exit_reasons(
+            credit=np.array([spread.credit for spread in spreads], dtype=np.float64),
+            cost_to_close=cost_to_close,
+            short_strike=np.array(
+                [spread.short_leg.metadata.strike for spread in spreads],
+                dtype=np.float64,
+            ),
+            underlying=field([spread.underlying for spread in spreads], "lastPrice"),
+            direction=np.array(
+                [
+                    1 if spread.option_type == OptionType.CALL else -1
+                    for spread in spreads
+                ]
+            ),
+            profit_target=self.profit_target,
+            stop_loss=self.stop_loss,
+            strike_buffer=self.strike_buffer,
+        )
+        # A spread whose legs are not both quoted on each side, as before the
+        # open, is held rather than closed on a meaningless price
+        quoted = self._quoted(field, shorts) & self._quoted(field, longs)
+        reasons[~quoted | np.isnan(cost_to_close)] = ExitReason.UNQUOTED.value
+        return list(zip(reasons.tolist(), cost_to_close.tolist()))
+
+    @staticmethod
+    def _quoted(field, symbols: list) -> np.ndarray:
+        bid = field(symbols, "bidPrice")
+        ask = field(symbols, "askPrice")
+        with np.errstate(invalid="ignore"):
+            return (bid >= 0) & (ask > 0) & (ask >= bid)
+
+    def close(self, spread: OpenSpread, reason: str, cost_to_close: float) -> dict:
+        price = max(
+            math.ceil(round(cost_to_close / self._ROUNDING_PRECISION, 6))
+            * self._ROUNDING_PRECISION,
+            self._ROUNDING_PRECISION,
+        )
+        response = self._broker.place_option_spread_order(
+            order_type=OrderType.DEBIT,
+            price=round(price, 2),
+            asset_type=AssetType.OPTION,
+            long_leg=OptionLeg(
+                symbol=spread.long_leg.symbol,
+                instruction=Instruction.SELL_TO_CLOSE,
+                quantity=spread.quantity,
+                metadata=spread.long_leg.metadata,
+            ),
+            short_leg=OptionLeg(
+                symbol=spread.short_leg.symbol,
+                instruction=Instruction.BUY_TO_CLOSE,
+                quantity=spread.quantity,
+                metadata=spread.short_leg.metadata,
+            ),
+        )
+        logging.info(
+            "Closing spread",
+            extra={
+                "ticker": spread.underlying,
+                "stage": "monitor",
+                "symbol": spread.short_leg.symbol,
+                "reason": reason,
+            },
+        )
+        return {
+            "symbol": spread.short_leg.symbol,
+            "reason": reason,
+            "price": round(price, 2),
+            "response": response,
+        }
+
+    def _spend(self) -> bool:
+        if self.requests >= self.request_budget:
+            return False
+        self.requests += 1
+        return True
+
+    @staticmethod
+    def _symbols(spreads: list) -> list:
+        symbols = set()
+        for spread in spreads:
+            symbols.update(
+                (spread.underlying, spread.short_leg.symbol, spread.long_leg.symbol)
+            )
+        return sorted(symbols)
@@ -2,23 +2,31 @@ import datetime
 
 from pytz import timezone
 
+from dto.data_needs import DataNeeds
+from dto.history_store import HistoryStore
+from dto.market_snapshot import MarketSnapshot
+from dto.options import VerticalSpread
+from dto.stock import Stock
+from dto.strategy_config import StrategyConfig
+from dto.trade_plan import TradePlan, quantity_options
+from factories.chain_cache import ChainCache
 from factories.option_factory import OptionFactory
+from strategies import dte1_rules
 from strategies.strategy import Strategy
 from tda_api.broker import Broker
+from tda_api.order_worker import OrderWorker
+from utils import clock
 from utils.common_utils import OrderType, OptionType, AssetType
 
 
 class Dte1(Strategy):
     DTE = 1
-    # -1 represents default value
-    DAYS_IN_ROW_TO_DELTA_WHEN_VIX_GREATER_THAN_20 = {
-        OptionType.CALL: {-1: 1.0, 0: 2.0, 1: 1.8, 2: 1.4, 3: 1.3, 4: 1.3,},
-        OptionType.PUT: {-1: 1.0, 0: 2.0, 1: 1.8, 2: 1.5, 3: 1.2, 4: 0.8,},
-    }
-    DAYS_IN_ROW_TO_DELTA_WHEN_VIX_LESS_THAN_20 = {
-        OptionType.CALL: {-1: 1.0, 0: 1.8, 1: 1.5, 2: 1.2, 3: 1.2, 4: 1.0,},
-        OptionType.PUT: {-1: 1.0, 0: 1.8, 1: 1.4, 2: 1.0, 3: 0.6, 4: 0.6,},
-    }
+    DAYS_IN_ROW_TO_DELTA_WHEN_VIX_GREATER_THAN_20 = (
+        dte1_rules.DAYS_IN_ROW_TO_DELTA_WHEN_VIX_GREATER_THAN_20
+    )
+    DAYS_IN_ROW_TO_DELTA_WHEN_VIX_LESS_THAN_20 = (
+        dte1_rules.DAYS_IN_ROW_TO_DELTA_WHEN_VIX_LESS_THAN_20
+    )
 
     def __init__(
         self,
@@ -28,125 +36,296 @@ class Dte1(Strategy):
         monday_quantity: int = 1,
         wednesday_quantity: int = 1,
         friday_quantity: int = 1,
+        broker: Broker = None,
+        chain_cache: ChainCache = None,
+        snapshot: MarketSnapshot = None,
+        history_store: HistoryStore = None,
+        order_working: dict = None,
+        plan: TradePlan = None,
+        roll_forward: bool = False,
     ):
+        self._trade_plan = plan
         self._monday_quantity = monday_quantity
         self._wednesday_quantity = wednesday_quantity
         self._friday_quantity = friday_quantity
-        self._broker = Broker()
+        self._broker = broker if broker else Broker()
+        # OrderWorker settings; when given, orders are followed until they fill
+        # and repriced toward natural instead of being placed and left
+        self._order_worker = (
+            OrderWorker(self._broker, **order_working)
+            if order_working is not None
+            else None
+        )
         self._buying_power = buying_power
+        self._snapshot = snapshot if snapshot else MarketSnapshot(self._broker)
+        if plan is None:
+            self._snapshot.require(MarketSnapshot.VIX_SYMBOL)
+        # A plan made after the previous close fixes everything but the chain,
+        # so only the chain is fetched before the order goes out
         self.option_factory = OptionFactory(
-            ticker, self._quantity, order_type, self._expiration_date
+            ticker,
+            plan.quantity if plan else self._quantity,
+            order_type,
+            (
+                datetime.date.fromisoformat(plan.expiration_date)
+                if plan
+                else self._expiration_date
+            ),
+            self._broker,
+            chain_cache,
+            history_store,
+            roll_forward,
+            vix=plan.inputs.get("vix") if plan else self._vix,
         )
-        self._option_type = self._get_option_type()
+        self._option_type = plan.option_type if plan else self._get_option_type()
         self._vs = self.option_factory.get_vertical_spread(
-            self._short_leg_strike_price, buying_power, self._option_type
+            self._target_short_strike(self._option_type),
+            buying_power,
+            self._option_type,
+        )
+
+    @classmethod
+    def data_needs(cls, ticker: str) -> DataNeeds:
+        return DataNeeds(
+            history={ticker: Stock.ATR_TIME_FRAME_DAYS},
+            # Strikes are set from the last close, and the model prices from
+            # the underlying price reported with the chain
+            quotes={MarketSnapshot.VIX_SYMBOL},
+            chains={(ticker, cls._expiration_date_today().strftime("%Y-%m-%d"))},
         )
 
+    # Everything but the chain, decided from the close before trade_date
+    @classmethod
+    def plan(
+        cls,
+        config: StrategyConfig,
+        trade_date: datetime.date,
+        snapshot: MarketSnapshot,
+        history_store: HistoryStore,
+    ) -> TradePlan:
+        stock = Stock(config.ticker, history_store=history_store)
+        vix = snapshot.vix
+        green_days = stock.candles.green_streak()
+        red_days = stock.candles.red_streak()
+        close = stock.candles[0].close
+        option_type = cls._option_type_from(green_days, red_days)
+        return TradePlan(
+            strategy=config.strategy,
+            ticker=config.ticker,
+            trade_date=trade_date.isoformat(),
+            expiration_date=cls._expiration_date_on(trade_date).isoformat(),
+            option_type=option_type,
+            short_strikes={
+                side.value: cls._short_strike_from(
+                    side,
+                    close,
+                    stock.atr,
+                    cls._atr_multiplier_from(side, vix, green_days, red_days),
+                )
+                for side in cls._planned_sides(option_type)
+            },
+            buying_power=config.buying_power,
+            quantity=cls._quantity_on(
+                trade_date,
+                config.options.get("monday_quantity", 1),
+                config.options.get("wednesday_quantity", 1),
+                config.options.get("friday_quantity", 1),
+            ),
+            account_id=config.account_id,
+            quantities=quantity_options(config.options),
+            inputs={
+                "close": close,
+                "atr": stock.atr,
+                "vix": vix,
+                "green_days": green_days,
+                "red_days": red_days,
+            },
+        )
+
+    @classmethod
+    def planned_data_needs(cls, plan: TradePlan) -> DataNeeds:
+        return DataNeeds(chains={(plan.ticker, plan.expiration_date)})
+
+    # Sides whose short strike a plan records
+    @classmethod
+    def _planned_sides(cls, option_type: OptionType) -> list:
+        return [option_type]
+
     def execute(self) -> dict:
-        if self._vs.price < 0.10:
+        if self._vs.price < dte1_rules.MIN_CREDIT:
             self._option_type = OptionType.NO_OP
         if self._option_type != OptionType.NO_OP:
-            return self._broker.place_option_spread_order(
-                order_type=self._vs.order_type,
-                price=self._vs.price,
-                asset_type=self.asset_type,
-                long_leg=self._vs.long_leg,
-                short_leg=self._vs.short_leg,
-            )
+            return self._place_vertical(self._vs)
         return {"code": "bad", "order_body": "Null"}
 
+    def _place_vertical(self, vs: VerticalSpread) -> dict:
+        self._ensure_not_cancelled()
+        if self._order_worker is not None:
+            return self._order_worker.work(
+                vs.order_type,
+                vs.price,
+                [vs.short_leg, vs.long_leg],
+                lambda price: Broker.option_spread_order_body(
+                    vs.order_type, price, self.asset_type, vs.long_leg, vs.short_leg
+                ),
+                self.cancelled,
+            )
+        return self._broker.place_option_spread_order(
+            order_type=vs.order_type,
+            price=vs.price,
+            asset_type=self.asset_type,
+            long_leg=vs.long_leg,
+            short_leg=vs.short_leg,
+        )
+
     @property
     def asset_type(self) -> AssetType:
         return AssetType.OPTION
 
     @property
     def _quantity(self) -> int:
-        if self._is_friday():
-            return self._monday_quantity
-        elif self._is_tuesday():
-            return self._wednesday_quantity
-        elif self._is_thursday():
-            return self._friday_quantity
+        return self._quantity_on(
+            clock.today(),
+            self._monday_quantity,
+            self._wednesday_quantity,
+            self._friday_quantity,
+        )
+
+    # Orders placed the session before an expiration day take that day's size
+    @staticmethod
+    def _quantity_on(
+        day: datetime.date,
+        monday_quantity: int,
+        wednesday_quantity: int,
+        friday_quantity: int,
+    ) -> int:
+        weekday = day.weekday()
+        if weekday == 4:
+            return monday_quantity
+        elif weekday == 1:
+            return wednesday_quantity
+        elif weekday == 3:
+            return friday_quantity
         return 1
 
     @property
     def _atr_multiplier(self) -> float:
+        return self._atr_multiplier_for(self._option_type)
+
+    def _atr_multiplier_for(self, option_type: OptionType) -> float:
+        return self._atr_multiplier_from(
+            option_type,
+            self._vix,
+            self._consecutive_green_days,
+            self._consecutive_red_days,
+        )
+
+    @classmethod
+    def _atr_multiplier_from(
+        cls, option_type: OptionType, vix: float, green_days: int, red_days: int
+    ) -> float:
         def get_multiplier(option_map: dict, cnt: int) -> float:
             if cnt not in option_map.keys():
                 return option_map[-1]
             return option_map[cnt]
 
         def get_call_map() -> dict:
-            if self._vix > 20:
-                return self.DAYS_IN_ROW_TO_DELTA_WHEN_VIX_GREATER_THAN_20[OptionType.CALL]
-            return self.DAYS_IN_ROW_TO_DELTA_WHEN_VIX_LESS_THAN_20[OptionType.CALL]
+            if vix > dte1_rules.VIX_THRESHOLD:
+                return cls.DAYS_IN_ROW_TO_DELTA_WHEN_VIX_GREATER_THAN_20[
+                    OptionType.CALL
+                ]
+            return cls.DAYS_IN_ROW_TO_DELTA_WHEN_VIX_LESS_THAN_20[OptionType.CALL]
 
         def get_put_map() -> dict:
-            if self._vix > 20:
-                return self.DAYS_IN_ROW_TO_DELTA_WHEN_VIX_GREATER_THAN_20[OptionType.PUT]
-            return self.DAYS_IN_ROW_TO_DELTA_WHEN_VIX_LESS_THAN_20[OptionType.PUT]
+            if vix > dte1_rules.VIX_THRESHOLD:
+                return cls.DAYS_IN_ROW_TO_DELTA_WHEN_VIX_GREATER_THAN_20[OptionType.PUT]
+            return cls.DAYS_IN_ROW_TO_DELTA_WHEN_VIX_LESS_THAN_20[OptionType.PUT]
 
-        if self._option_type == OptionType.CALL:
-            return get_multiplier(
-                get_call_map(), self._consecutive_green_days
-            )
-        elif self._option_type == OptionType.PUT:
-            return get_multiplier(
-                get_put_map(), self._consecutive_red_days
-            )
+        if option_type == OptionType.CALL:
+            return get_multiplier(get_call_map(), green_days)
+        elif option_type == OptionType.PUT:
+            return get_multiplier(get_put_map(), red_days)
         return -1
 
     @property
     def _dte(self) -> int:
-        if self._is_friday():
-            return self.DTE + 2
-        return self.DTE
+        return self._dte_today()
 
     @property
     def _expiration_date(self) -> datetime:
-        day = datetime.datetime.now(timezone("US/Eastern")) + datetime.timedelta(
-            hours=24 * self._dte
+        return self._expiration_date_today()
+
+    @classmethod
+    def _dte_today(cls) -> int:
+        return cls._dte_on(clock.today())
+
+    @classmethod
+    def _dte_on(cls, day: datetime.date) -> int:
+        if day.weekday() == 4:
+            return cls.DTE + 2
+        return cls.DTE
+
+    @classmethod
+    def _expiration_date_today(cls) -> datetime:
+        day = clock.now(timezone("US/Eastern")) + datetime.timedelta(
+            hours=24 * cls._dte_today()
         )
         return day
 
+    @classmethod
+    def _expiration_date_on(cls, day: datetime.date) -> datetime.date:
+        return day + datetime.timedelta(days=cls._dte_on(day))
+
     @property
     def _vix(self) -> float:
-        vix_symbol = "$VIX.X"
-        return self._broker.quote(vix_symbol)[vix_symbol]['lastPrice']
+        return self._snapshot.vix
 
     @property
     def _consecutive_red_days(self) -> int:
-        cnt = 0
-        while (
-            self.option_factory.stock.candles[cnt].close
-            < self.option_factory.stock.candles[cnt].open
-        ):
-            cnt += 1
-        return cnt
+        return self.option_factory.stock.candles.red_streak()
 
     @property
     def _consecutive_green_days(self) -> int:
-        cnt = 0
-        while (
-            self.option_factory.stock.candles[cnt].open
-            < self.option_factory.stock.candles[cnt].close
-        ):
-            cnt += 1
-        return cnt
+        return self.option_factory.stock.candles.green_streak()
 
     @property
     def _short_leg_strike_price(self) -> float:
-        close_price = self.option_factory.stock.candles[0].close
-        delta = self.option_factory.stock.atr * self._atr_multiplier
-        if self._option_type == OptionType.CALL:
+        return self._short_leg_strike_price_for(self._option_type)
+
+    def _short_leg_strike_price_for(self, option_type: OptionType) -> float:
+        return self._short_strike_from(
+            option_type,
+            self.option_factory.stock.candles[0].close,
+            self.option_factory.stock.atr,
+            self._atr_multiplier_for(option_type),
+        )
+
+    # The planned strike when trading from a plan, otherwise decided now
+    def _target_short_strike(self, option_type: OptionType) -> float:
+        if self._trade_plan is not None:
+            return self._trade_plan.short_strike(option_type)
+        return self._short_leg_strike_price_for(option_type)
+
+    @staticmethod
+    def _short_strike_from(
+        option_type: OptionType, close_price: float, atr: float, multiplier: float
+    ) -> float:
+        delta = atr * multiplier
+        if option_type == OptionType.CALL:
             close_price += delta
-        elif self._option_type == OptionType.PUT:
+        elif option_type == OptionType.PUT:
             close_price -= delta
         return close_price
 
     def _get_option_type(self) -> OptionType:
-        if self._consecutive_green_days > 0:
+        return self._option_type_from(
+            self._consecutive_green_days, self._consecutive_red_days
+        )
+
+    @staticmethod
+    def _option_type_from(green_days: int, red_days: int) -> OptionType:
+        if green_days > 0:
             return OptionType.CALL
-        elif self._consecutive_red_days > 0:
+        elif red_days > 0:
             return OptionType.PUT
         return OptionType.NO_OP
@@ -1,4 +1,16 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from strategies import dte1_rules
 from strategies.dte1 import Dte1
+from strategies.strategy import StrategyCancelled
+from dto.history_store import HistoryStore
+from dto.market_snapshot import MarketSnapshot
+from dto.options import VerticalSpread
+from dto.trade_plan import TradePlan
+from factories.chain_cache import ChainCache
+from tda_api.broker import Broker
 from utils.common_utils import OrderType, OptionType
 
 
@@ -11,6 +23,14 @@ class Dte1IC(Dte1):
         monday_quantity: int = 1,
         wednesday_quantity: int = 1,
         friday_quantity: int = 1,
+        broker: Broker = None,
+        chain_cache: ChainCache = None,
+        snapshot: MarketSnapshot = None,
+        history_store: HistoryStore = None,
+        single_order: bool = True,
+        order_working: dict = None,
+        plan: TradePlan = None,
+        roll_forward: bool = False,
     ):
         super().__init__(
             ticker,
@@ -19,14 +39,139 @@ class Dte1IC(Dte1):
             monday_quantity,
             wednesday_quantity,
             friday_quantity,
+            broker,
+            chain_cache,
+            snapshot,
+            history_store,
+            order_working,
+            plan,
+            roll_forward,
         )
+        self.single_order = single_order
+        # Both halves are priced here, so nothing is left to compute between
+        # submitting the first and the second
+        other_option_type = self._other_side(self._option_type)
+        self._plan = {
+            "order 1": (
+                other_option_type,
+                self.option_factory.get_vertical_spread(
+                    self._target_short_strike(other_option_type),
+                    buying_power,
+                    other_option_type,
+                ),
+            ),
+            "order 2": (self._option_type, self._vs),
+        }
+
+    @classmethod
+    def _planned_sides(cls, option_type: OptionType) -> list:
+        return [option_type, cls._other_side(option_type)]
+
+    @staticmethod
+    def _other_side(option_type: OptionType) -> OptionType:
+        return OptionType.CALL if option_type == OptionType.PUT else OptionType.PUT
 
+    # The response carries the time each leg was handed to the broker, so the
+    # legging gap between the two verticals can be measured
     def execute(self) -> dict:
-        response = super().execute()
-        self._option_type = (
-            OptionType.CALL if self._option_type == OptionType.PUT else OptionType.PUT
-        )
-        self._vs = self.option_factory.get_vertical_spread(
-            self._short_leg_strike_price, self._buying_power, self._option_type,
+        tradeable = {
+            name: vs
+            for name, (option_type, vs) in self._plan.items()
+            if option_type != OptionType.NO_OP and vs.price >= dte1_rules.MIN_CREDIT
+        }
+        if self.single_order and len(tradeable) == len(self._plan):
+            spreads = {option_type: vs for option_type, vs in self._plan.values()}
+            submitted_at = time.time()
+            response = self._place_iron_condor(
+                round(sum(vs.price for vs in spreads.values()), 2),
+                spreads[OptionType.CALL],
+                spreads[OptionType.PUT],
+            )
+            return self._report(
+                {"iron condor": response},
+                [(vs, submitted_at) for vs in spreads.values()],
+            )
+
+        def submit(vs: VerticalSpread) -> (dict, float):
+            submitted_at = time.time()
+            return self._place_vertical(vs), submitted_at
+
+        responses = {name: {"code": "bad", "order_body": "Null"} for name in self._plan}
+        submitted = []
+        if tradeable:
+            with ThreadPoolExecutor(max_workers=len(tradeable)) as executor:
+                futures = {
+                    name: executor.submit(submit, vs) for name, vs in tradeable.items()
+                }
+            # One side failing must not lose the other's response, as that
+            # order may already be working
+            cancellations = []
+            for name, future in futures.items():
+                try:
+                    responses[name], submitted_at = future.result()
+                except StrategyCancelled as e:
+                    cancellations.append(e)
+                    responses[name] = self._error_response(e)
+                except Exception as e:
+                    msg = "{} of the iron condor failed: {}".format(name, e)
+                    logging.error(msg, extra={"ticker": self.option_factory.ticker})
+                    responses[name] = self._error_response(e)
+                else:
+                    submitted.append((tradeable[name], submitted_at))
+            # Nothing went out, so the Trader reports the deadline as it does
+            # for any other strategy
+            if len(cancellations) == len(futures):
+                raise cancellations[0]
+        return self._report(responses, submitted)
+
+    def _place_iron_condor(
+        self, price: float, call_spread: VerticalSpread, put_spread: VerticalSpread
+    ) -> dict:
+        order_type = self._vs.order_type
+        self._ensure_not_cancelled()
+        if self._order_worker is not None:
+            return self._order_worker.work(
+                order_type,
+                price,
+                [
+                    call_spread.short_leg,
+                    call_spread.long_leg,
+                    put_spread.short_leg,
+                    put_spread.long_leg,
+                ],
+                lambda limit: Broker.iron_condor_order_body(
+                    order_type, limit, self.asset_type, call_spread, put_spread
+                ),
+                self.cancelled,
+            )
+        return self._broker.place_iron_condor_order(
+            order_type=order_type,
+            price=price,
+            asset_type=self.asset_type,
+            call_spread=call_spread,
+            put_spread=put_spread,
         )
-        return {"order 1": super().execute(), "order 2": response}
+
+    @staticmethod
+    def _error_response(error: Exception) -> dict:
+        return {
+            "code": "error",
+            "order_body": "Null",
+            "error": "{}: {}".format(type(error).__name__, error),
+        }
+
+    @staticmethod
+    def _report(responses: dict, submitted: list) -> dict:
+        legs = [
+            {
+                "symbol": leg.symbol,
+                "instruction": leg.instruction.value,
+                "submitted_at": submitted_at,
+            }
+            for vs, submitted_at in submitted
+            for leg in (vs.short_leg, vs.long_leg)
+        ]
+        times = [leg["submitted_at"] for leg in legs]
+        responses["legs"] = legs
+        responses["legging_gap_seconds"] = max(times) - min(times) if times else 0.0
+        return responses
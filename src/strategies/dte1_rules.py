@@ -0,0 +1,14 @@
+from utils.common_utils import OptionType
+
+# -1 represents default value
+DAYS_IN_ROW_TO_DELTA_WHEN_VIX_GREATER_THAN_20 = {
+    OptionType.CALL: {-1: 1.0, 0: 2.0, 1: 1.8, 2: 1.4, 3: 1.3, 4: 1.3,},
+    OptionType.PUT: {-1: 1.0, 0: 2.0, 1: 1.8, 2: 1.5, 3: 1.2, 4: 0.8,},
+}
+DAYS_IN_ROW_TO_DELTA_WHEN_VIX_LESS_THAN_20 = {
+    OptionType.CALL: {-1: 1.0, 0: 1.8, 1: 1.5, 2: 1.2, 3: 1.2, 4: 1.0,},
+    OptionType.PUT: {-1: 1.0, 0: 1.8, 1: 1.4, 2: 1.0, 3: 0.6, 4: 0.6,},
+}
+VIX_THRESHOLD = 20
+# Spreads priced below this credit are not worth placing
+MIN_CREDIT = 0.10
@@ -0,0 +1,19 @@
+import logging
+
+from strategies.dte1 import Dte1
+from strategies.dte1_ic import Dte1IC
+
+logger = logging.getLogger(__name__)
+
+# Strategy names accepted in strategy configs
+STRATEGIES = {"Dte1": Dte1, "Dte1IC": Dte1IC}
+
+
+def strategy_class(name: str) -> type:
+    if name not in STRATEGIES:
+        msg = 'Unknown strategy "{}", expected one of {}'.format(
+            name, sorted(STRATEGIES)
+        )
+        logging.error(msg)
+        raise ValueError(msg)
+    return STRATEGIES[name]
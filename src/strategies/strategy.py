@@ -1,9 +1,31 @@
+import datetime
+import logging
+import threading
 from abc import ABC, abstractmethod
+from dto.data_needs import DataNeeds
+from dto.history_store import HistoryStore
+from dto.market_snapshot import MarketSnapshot
+from dto.strategy_config import StrategyConfig
+from dto.trade_plan import TradePlan
+from utils import clock
 from utils.common_utils import AssetType
-import datetime
+
+logger = logging.getLogger(__name__)
+
+
+# Raised instead of placing an order once a strategy is past its deadline
+class StrategyCancelled(TimeoutError):
+    pass
 
 
 class Strategy(ABC):
+    # Seconds a concurrent Trader allows this strategy before giving up on it,
+    # None falls back to the Trader's default
+    deadline = None
+    # Set by a concurrent Trader when the strategy runs past its deadline. A
+    # running thread cannot be stopped, so every order placement checks it.
+    cancelled: threading.Event = None
+
     @abstractmethod
     def execute(self) -> dict:
         pass
@@ -12,22 +34,53 @@ class Strategy(ABC):
     def asset_type(self) -> AssetType:
         pass
 
+    # Market data the strategy reads for a ticker, so a Trader running many
+    # strategies can fetch each piece once before any of them start
+    @classmethod
+    def data_needs(cls, ticker: str) -> DataNeeds:
+        return DataNeeds()
+
+    # A plan for trade_date built from what is known after the previous close,
+    # or None for strategies that decide everything while trading
+    @classmethod
+    def plan(
+        cls,
+        config: StrategyConfig,
+        trade_date: datetime.date,
+        snapshot: MarketSnapshot,
+        history_store: HistoryStore,
+    ) -> TradePlan:
+        return None
+
+    # What a strategy trading from `plan` still reads live
+    @classmethod
+    def planned_data_needs(cls, plan: TradePlan) -> DataNeeds:
+        return cls.data_needs(plan.ticker)
+
+    def _ensure_not_cancelled(self) -> None:
+        if self.cancelled is not None and self.cancelled.is_set():
+            msg = "{} is past its deadline, no order placed".format(
+                type(self).__name__
+            )
+            logging.error(msg)
+            raise StrategyCancelled(msg)
+
     @staticmethod
     def _is_monday() -> bool:
-        return datetime.date.today().weekday() == 0
+        return clock.today().weekday() == 0
 
     @staticmethod
     def _is_tuesday() -> bool:
-        return datetime.date.today().weekday() == 1
+        return clock.today().weekday() == 1
 
     @staticmethod
     def _is_wednesday() -> bool:
-        return datetime.date.today().weekday() == 2
+        return clock.today().weekday() == 2
 
     @staticmethod
     def _is_thursday() -> bool:
-        return datetime.date.today().weekday() == 3
+        return clock.today().weekday() == 3
 
     @staticmethod
     def _is_friday() -> bool:
-        return datetime.date.today().weekday() == 4
+        return clock.today().weekday() == 4
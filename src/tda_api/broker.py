@@ -1,33 +1,126 @@
-import os
-import tempfile
-import shutil
-from tda import auth
-from lib import config
-from utils.common_utils import OrderType, AssetType
-from dto.options import OptionLeg
+import datetime
+import json
+import logging
+from tda_api import chain_parser, token_manager, transport
+from utils import metrics
+from utils.common_utils import OrderType, AssetType, OptionType
+from dto.options import OptionLeg, VerticalSpread
+
+# Order statuses under which an order may still fill
+OPEN_ORDER_STATUSES = {
+    "AWAITING_PARENT_ORDER",
+    "AWAITING_CONDITION",
+    "AWAITING_MANUAL_REVIEW",
+    "ACCEPTED",
+    "AWAITING_UR_OUT",
+    "PENDING_ACTIVATION",
+    "QUEUED",
+    "WORKING",
+    "PENDING_REPLACE",
+}
 
 
 class Broker:
     def __init__(self):
-        token_path = os.path.join(
-            os.path.dirname(__file__), "../lib", "auth_token.json"
-        )
-        self._tmp_dir = tempfile.mkdtemp(prefix="/tmp/")
-        shutil.copy2(token_path, self._tmp_dir)
-        self.client = auth.client_from_token_file(
-            os.path.join(self._tmp_dir, "auth_token.json"), config.api_key
-        )
+        # tda and the credentials are imported where they are used, so code
+        # paths that never talk to TDA (replays, backtests) skip loading them
+        from lib import config
+
+        # Every client shares the process-wide token, which is loaded and
+        # refreshed once however many brokers are built
+        self.client = token_manager.default_manager().client(config.api_key)
+        # Likewise one request budget, so brokers cannot together exceed TDA's
+        # rate limit
+        self.transport = transport.default_transport()
+        self._network_streams = set()
+        self.client.session.event_hooks["response"].append(self._track_connection)
+
+    @property
+    def connections_opened(self) -> int:
+        return len(self._network_streams)
 
-    def __del__(self):
-        shutil.rmtree(self._tmp_dir)
+    def close(self) -> None:
+        self.client.session.close()
+
+    def _track_connection(self, response) -> None:
+        stream = response.extensions.get("network_stream")
+        if stream is not None:
+            self._network_streams.add(id(stream))
 
     def quote(self, ticker: str) -> dict:
-        response = self.client.get_quote(ticker)
-        return response.json()
+        with metrics.span("broker.quote", ticker=ticker) as span:
+            response = self.transport.read("quote", span, self.client.get_quote, ticker)
+            span.add_payload(len(response.content))
+            return response.json()
+
+    def quotes(self, tickers: list) -> dict:
+        with metrics.span("broker.quotes", tickers=tickers) as span:
+            response = self.transport.read(
+                "quotes", span, self.client.get_quotes, tickers
+            )
+            span.add_payload(len(response.content))
+            return response.json()
+
+    def positions(self, account_id: str = None) -> list:
+        from tda.client import Client
+
+        with metrics.span("broker.positions") as span:
+            response = self.transport.read(
+                "positions",
+                span,
+                self.client.get_account,
+                self._account_id(account_id),
+                fields=[Client.Account.Fields.POSITIONS],
+            )
+            span.add_payload(len(response.content))
+            return response.json()["securitiesAccount"].get("positions", [])
 
-    def option_chain(self, ticker: str) -> dict:
-        response = self.client.get_option_chain(ticker)
-        return response.json()
+    # The account's recent orders that may still fill
+    def open_orders(self, account_id: str = None) -> list:
+        with metrics.span("broker.open_orders") as span:
+            response = self.transport.read(
+                "open_orders",
+                span,
+                self.client.get_orders_by_path,
+                self._account_id(account_id),
+            )
+            span.add_payload(len(response.content))
+            return [
+                order
+                for order in response.json()
+                if order.get("status") in OPEN_ORDER_STATUSES
+            ]
+
+    def option_chain(
+        self,
+        ticker: str,
+        option_type: OptionType = None,
+        from_date: datetime.date = None,
+        to_date: datetime.date = None,
+        strike_count: int = None,
+    ) -> dict:
+        from tda.client import Client
+
+        contract_type = None
+        if option_type == OptionType.CALL:
+            contract_type = Client.Options.ContractType.CALL
+        elif option_type == OptionType.PUT:
+            contract_type = Client.Options.ContractType.PUT
+        with metrics.span("broker.option_chain", ticker=ticker) as span:
+            response = self.transport.read(
+                "option_chain",
+                span,
+                self.client.get_option_chain,
+                ticker,
+                contract_type=contract_type,
+                from_date=from_date,
+                to_date=to_date,
+                strike_count=strike_count,
+            )
+            span.add_payload(len(response.content))
+            return chain_parser.parse_option_chain(
+                response.content, from_date, to_date
+            )
 
     def place_option_spread_order(
         self,
@@ -36,8 +129,158 @@ class Broker:
         asset_type: AssetType,
         long_leg: OptionLeg,
         short_leg: OptionLeg,
+        account_id: str = None,
+    ) -> dict:
+        order_body = self.option_spread_order_body(
+            order_type, price, asset_type, long_leg, short_leg
+        )
+        with metrics.span(
+            "broker.place_option_spread_order", symbol=short_leg.symbol
+        ) as span:
+            span.add_payload(len(json.dumps(order_body)))
+            self.transport.order(
+                "place_order",
+                span,
+                self.client.place_order,
+                self._account_id(account_id),
+                order_body,
+            )
+        return {"code": "ok", "order_body": str(order_body)}
+
+    # Both verticals go out as one four-leg order, so neither half can fill
+    # without the other
+    def place_iron_condor_order(
+        self,
+        order_type: OrderType,
+        price: float,
+        asset_type: AssetType,
+        call_spread: VerticalSpread,
+        put_spread: VerticalSpread,
+        account_id: str = None,
     ) -> dict:
-        order_body = {
+        order_body = self.iron_condor_order_body(
+            order_type, price, asset_type, call_spread, put_spread
+        )
+        with metrics.span(
+            "broker.place_iron_condor_order", symbol=call_spread.short_leg.symbol
+        ) as span:
+            span.add_payload(len(json.dumps(order_body)))
+            self.transport.order(
+                "place_order",
+                span,
+                self.client.place_order,
+                self._account_id(account_id),
+                order_body,
+            )
+        return {"code": "ok", "order_body": str(order_body)}
+
+    # The methods below back OrderWorker, which needs the id of what it placed
+    # so it can follow the order and reprice it
+    def submit_order(self, order_body: dict, account_id: str = None) -> str:
+        account_id = self._account_id(account_id)
+        with metrics.span("broker.submit_order") as span:
+            span.add_payload(len(json.dumps(order_body)))
+            response = self.transport.order(
+                "place_order", span, self.client.place_order, account_id, order_body
+            )
+            return self._order_id(response, account_id)
+
+    def order_status(self, order_id: str, account_id: str = None) -> dict:
+        with metrics.span("broker.order_status", order_id=order_id) as span:
+            response = self.transport.read(
+                "order_status",
+                span,
+                self.client.get_order,
+                order_id,
+                self._account_id(account_id),
+            )
+            span.add_payload(len(response.content))
+            return response.json()
+
+    # TDA cancels the replaced order and answers with the id of the new one
+    def replace_order(
+        self, order_id: str, order_body: dict, account_id: str = None
+    ) -> str:
+        account_id = self._account_id(account_id)
+        with metrics.span("broker.replace_order", order_id=order_id) as span:
+            span.add_payload(len(json.dumps(order_body)))
+            response = self.transport.order(
+                "replace_order",
+                span,
+                self.client.replace_order,
+                account_id,
+                order_id,
+                order_body,
+            )
+            return self._order_id(response, account_id)
+
+    def cancel_order(self, order_id: str, account_id: str = None) -> None:
+        with metrics.span("broker.cancel_order", order_id=order_id) as span:
+            self.transport.order(
+                "cancel_order",
+                span,
+                self.client.cancel_order,
+                order_id,
+                self._account_id(account_id),
+            )
+
+    def _order_id(self, response, account_id: str) -> str:
+        from tda.utils import Utils
+
+        order_id = Utils(self.client, account_id).extract_order_id(response)
+        if order_id is None:
+            msg = "TDA did not return an order id: {}".format(response.headers)
+            logging.error(msg)
+            raise RuntimeError(msg)
+        return str(order_id)
+
+    @staticmethod
+    def _account_id(account_id: str) -> str:
+        if account_id is not None:
+            return account_id
+        from lib import config
+
+        return config.account_id
+
+    @staticmethod
+    def option_spread_order_body(
+        order_type: OrderType,
+        price: float,
+        asset_type: AssetType,
+        long_leg: OptionLeg,
+        short_leg: OptionLeg,
+    ) -> dict:
+        return Broker._multi_leg_order_body(
+            order_type, price, asset_type, [long_leg, short_leg]
+        )
+
+    @staticmethod
+    def iron_condor_order_body(
+        order_type: OrderType,
+        price: float,
+        asset_type: AssetType,
+        call_spread: VerticalSpread,
+        put_spread: VerticalSpread,
+    ) -> dict:
+        order_body = Broker._multi_leg_order_body(
+            order_type,
+            price,
+            asset_type,
+            [
+                call_spread.long_leg,
+                call_spread.short_leg,
+                put_spread.long_leg,
+                put_spread.short_leg,
+            ],
+        )
+        order_body["complexOrderStrategyType"] = "IRON_CONDOR"
+        return order_body
+
+    @staticmethod
+    def _multi_leg_order_body(
+        order_type: OrderType, price: float, asset_type: AssetType, legs: list
+    ) -> dict:
+        return {
             "orderType": order_type.value,
             "session": "NORMAL",
             "price": str(price) + "0",
@@ -45,22 +288,54 @@ class Broker:
             "orderStrategyType": "SINGLE",
             "orderLegCollection": [
                 {
-                    "instruction": long_leg.instruction.value,
-                    "quantity": long_leg.quantity,
+                    "instruction": leg.instruction.value,
+                    "quantity": leg.quantity,
                     "instrument": {
-                        "symbol": long_leg.symbol,
+                        "symbol": leg.symbol,
                         "assetType": asset_type.value,
                     },
-                },
-                {
-                    "instruction": short_leg.instruction.value,
-                    "quantity": short_leg.quantity,
-                    "instrument": {
-                        "symbol": short_leg.symbol,
-                        "assetType": asset_type.value,
-                    },
-                },
+                }
+                for leg in legs
             ],
         }
-        self.client.place_order(config.account_id, order_body)
-        return {"code": "ok", "order_body": str(order_body)}
+
+
+class AccountBroker:
+    # Places orders in one account while sharing the wrapped broker's client,
+    # connections and market data with every other account
+    def __init__(self, broker: Broker, account_id: str):
+        self._broker = broker
+        self.account_id = account_id
+
+    def __getattr__(self, name: str):
+        return getattr(self._broker, name)
+
+    def positions(self) -> list:
+        return self._broker.positions(account_id=self.account_id)
+
+    def open_orders(self) -> list:
+        return self._broker.open_orders(account_id=self.account_id)
+
+    def place_option_spread_order(self, **kwargs) -> dict:
+        return self._broker.place_option_spread_order(
+            account_id=self.account_id, **kwargs
+        )
+
+    def place_iron_condor_order(self, **kwargs) -> dict:
+        return self._broker.place_iron_condor_order(
+            account_id=self.account_id, **kwargs
+        )
+
+    def submit_order(self, order_body: dict) -> str:
+        return self._broker.submit_order(order_body, account_id=self.account_id)
+
+    def order_status(self, order_id: str) -> dict:
+        return self._broker.order_status(order_id, account_id=self.account_id)
+
+    def replace_order(self, order_id: str, order_body: dict) -> str:
+        return self._broker.replace_order(
+            order_id, order_body, account_id=self.account_id
+        )
+
+    def cancel_order(self, order_id: str) -> None:
+        self._broker.cancel_order(order_id, account_id=self.account_id)
@@ -0,0 +1,138 @@
+import datetime
+import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+EXP_DATE_MAPS = ("putExpDateMap", "callExpDateMap")
+
+_decoder = json.JSONDecoder()
+# Expiration keys look like "2022-03-17:1" and strike keys like "4100.0". Neither
+# shape occurs as a key inside a contract, and contract values never contain a
+# quoted date or number followed by a colon, so a search for the next key skips
+# a whole subtree without decoding it.
+_EXPIRATION_KEY = re.compile(rb'"((\d{4}-\d{2}-\d{2}):\d+)"\s*:\s*')
+_KEY = re.compile(
+    rb'"(?:(?P<expiration>\d{4}-\d{2}-\d{2}):\d+|(?P<strike>-?\d+(?:\.\d+)?))"\s*:\s*'
+)
+
+
+# Decodes an option chain response but only builds the expirations dated from
+# `from_date` through `to_date`, and within them only the strikes inside
+# `strike_window` (low, high). The response is scanned as bytes and only the
+# slices holding what was asked for are turned into text and objects. The
+# result has the response's shape: its top-level fields plus both exp date
+# maps narrowed to what was asked for. A response that does not have the
+# expected layout is decoded in full and narrowed afterwards.
+def parse_option_chain(
+    payload,
+    from_date: datetime.date = None,
+    to_date: datetime.date = None,
+    strike_window: tuple = None,
+) -> dict:
+    data = payload.encode("utf-8") if isinstance(payload, str) else bytes(payload)
+    low = from_date.isoformat() if from_date else None
+    high = to_date.isoformat() if to_date else None
+    try:
+        return _parse(data, low, high, strike_window)
+    except (ValueError, KeyError) as e:
+        logging.warning("Decoding the whole option chain: {}".format(e))
+        return narrow(json.loads(data), from_date, to_date, strike_window)
+
+
+# The same narrowing applied to an already decoded chain
+def narrow(
+    chain: dict,
+    from_date: datetime.date = None,
+    to_date: datetime.date = None,
+    strike_window: tuple = None,
+) -> dict:
+    low = from_date.isoformat() if from_date else None
+    high = to_date.isoformat() if to_date else None
+    narrowed = dict(chain)
+    for name in EXP_DATE_MAPS:
+        if not isinstance(chain.get(name), dict):
+            continue
+        narrowed[name] = {
+            key: {
+                strike: contracts
+                for strike, contracts in strikes.items()
+                if _in_window(float(strike), strike_window)
+            }
+            for key, strikes in chain[name].items()
+            if _in_range(key[:10], low, high)
+        }
+    return narrowed
+
+
+def _parse(data: bytes, low: str, high: str, strike_window: tuple) -> dict:
+    starts = sorted(
+        (position, name)
+        for name, position in (
+            (name, data.find('"{}"'.format(name).encode())) for name in EXP_DATE_MAPS
+        )
+        if position >= 0
+    )
+    if not starts:
+        # Failed responses carry no maps and are small, so decode them as is
+        return json.loads(data)
+    # Top-level scalars such as status come before the maps
+    chain = json.loads(data[: starts[0][0]].rstrip().rstrip(b",") + b"}")
+    ends = [position for position, _ in starts[1:]] + [len(data)]
+    for (start, name), end in zip(starts, ends):
+        opening = data.index(b"{", start + len(name) + 2, end)
+        chain[name] = _parse_exp_date_map(
+            data, opening + 1, end, low, high, strike_window
+        )
+    return chain
+
+
+def _parse_exp_date_map(
+    data: bytes, position: int, end: int, low: str, high: str, strike_window: tuple
+) -> dict:
+    exp_date_map = {}
+    match = _EXPIRATION_KEY.search(data, position, end)
+    while match is not None:
+        following = _EXPIRATION_KEY.search(data, match.end(), end)
+        expiration = match.group(2).decode()
+        if _in_range(expiration, low, high):
+            if data[match.end() : match.end() + 1] != b"{":
+                raise ValueError("Expiration {} is not an object".format(expiration))
+            stop = following.start() if following else end
+            if strike_window is None:
+                exp_date_map[match.group(1).decode()] = _decode(data, match.end(), stop)
+            else:
+                exp_date_map[match.group(1).decode()] = _parse_strikes(
+                    data, match.end() + 1, stop, strike_window
+                )
+        match = following
+    return exp_date_map
+
+
+def _parse_strikes(data: bytes, position: int, end: int, strike_window: tuple) -> dict:
+    strikes = {}
+    match = _KEY.search(data, position, end)
+    while match is not None and match.group("strike") is not None:
+        following = _KEY.search(data, match.end(), end)
+        strike = match.group("strike").decode()
+        if _in_window(float(strike), strike_window):
+            strikes[strike] = _decode(
+                data, match.end(), following.start() if following else end
+            )
+        match = following
+    return strikes
+
+
+# Decodes the JSON value that starts at `start`; `stop` only has to lie past
+# its end, so trailing separators and closing brackets are ignored
+def _decode(data: bytes, start: int, stop: int):
+    return _decoder.raw_decode(data[start:stop].decode("utf-8"))[0]
+
+
+def _in_range(expiration: str, low: str, high: str) -> bool:
+    return (low is None or low <= expiration) and (high is None or expiration <= high)
+
+
+def _in_window(strike: float, strike_window: tuple) -> bool:
+    return strike_window is None or strike_window[0] <= strike <= strike_window[1]
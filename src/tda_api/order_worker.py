@@ -0,0 +1,251 @@
+import logging
+import threading
+import time
+
+from tda_api.broker import Broker
+from utils import metrics
+from utils.common_utils import Instruction, OrderType
+
+logger = logging.getLogger(__name__)
+
+FILLED = "FILLED"
+TIMED_OUT = "TIMED_OUT"
+# Statuses after which the order can no longer fill
+FINAL_STATUSES = {FILLED, "REJECTED", "CANCELED", "EXPIRED"}
+_SELL_INSTRUCTIONS = {Instruction.SELL_TO_OPEN, Instruction.SELL_TO_CLOSE}
+
+
+class OrderWorker:
+    # Price increment of one concession, the same tick the limit price is
+    # rounded to when the spread is built
+    STEP = 0.05
+    # Most the limit price may move away from where it started, in dollars
+    MAX_CONCESSION = 0.20
+    # Seconds before an unfilled order is cancelled
+    TIMEOUT = 30.0
+    # Seconds an order rests at one price before it is stepped again
+    STEP_INTERVAL = 5.0
+    # Status polls start INITIAL_DELAY apart and back off by BACKOFF up to MAX_DELAY
+    INITIAL_DELAY = 0.25
+    BACKOFF = 2.0
+    MAX_DELAY = 2.0
+
+    def __init__(
+        self,
+        broker: Broker,
+        step: float = STEP,
+        max_concession: float = MAX_CONCESSION,
+        timeout: float = TIMEOUT,
+        step_interval: float = STEP_INTERVAL,
+        initial_delay: float = INITIAL_DELAY,
+        backoff: float = BACKOFF,
+        max_delay: float = MAX_DELAY,
+    ):
+        self._broker = broker
+        self.step = step
+        self.max_concession = max_concession
+        self.timeout = timeout
+        self.step_interval = step_interval
+        self.initial_delay = initial_delay
+        self.backoff = backoff
+        self.max_delay = max_delay
+
+    # Submits `legs` at `price` and follows the order until it fills, is
+    # rejected or runs out of time. While it rests unfilled the limit price is
+    # stepped toward the natural price, never further than max_concession from
+    # `price` and never past natural. The report records time to fill and
+    # slippage against the mid of the legs when the order was first sent.
+    # Setting `cancelled` stops the repricing and cancels the order.
+    def work(
+        self,
+        order_type: OrderType,
+        price: float,
+        legs: list,
+        order_body_for,
+        cancelled: threading.Event = None,
+    ) -> dict:
+        mid, natural = self.mid_and_natural(order_type, legs)
+        limit = self._concession_limit(order_type, price, natural)
+        current = price
+        steps = 0
+        with metrics.span("order_worker.work", symbol=legs[0].symbol) as span:
+            start = time.monotonic()
+            order_id = self._broker.submit_order(order_body_for(current))
+            last_step = start
+            delay = self.initial_delay
+            while True:
+                time.sleep(
+                    max(0.0, min(delay, start + self.timeout - time.monotonic()))
+                )
+                order = self._broker.order_status(order_id)
+                status = order.get("status")
+                now = time.monotonic()
+                if status in FINAL_STATUSES:
+                    break
+                if now - start >= self.timeout or (
+                    cancelled is not None and cancelled.is_set()
+                ):
+                    order = self._cancel(order_id, order)
+                    status = order["status"]
+                    break
+                following = self._next_price(order_type, current, limit)
+                if following is not None and now - last_step >= self.step_interval:
+                    try:
+                        order_id = self._broker.replace_order(
+                            order_id, order_body_for(following)
+                        )
+                    except Exception as e:
+                        # Most often the order filled after the last poll
+                        logging.warning(
+                            "Could not reprice order {}: {}".format(order_id, e)
+                        )
+                    else:
+                        current = following
+                        steps += 1
+                        last_step = now
+                        delay = self.initial_delay
+                        continue
+                delay = min(delay * self.backoff, self.max_delay)
+            report = self._report(order_type, order_id, status, order, mid, current)
+            report.update(
+                steps=steps,
+                time_to_fill_seconds=(
+                    round(now - start, 3) if status == FILLED else None
+                ),
+            )
+            span.annotate(
+                status=status,
+                steps=steps,
+                slippage=report["slippage"],
+                time_to_fill_seconds=report["time_to_fill_seconds"],
+            )
+        logging.info(
+            "Order worked",
+            extra=dict(report, stage="order", symbol=legs[0].symbol),
+        )
+        return report
+
+    # Net price of the legs at their mids and at natural (selling at the bid,
+    # buying at the ask), as a credit for credit orders and a debit otherwise.
+    # Natural is None when a leg has no bid or ask.
+    @staticmethod
+    def mid_and_natural(order_type: OrderType, legs: list) -> (float, float):
+        sign = 1 if order_type == OrderType.CREDIT else -1
+        mid = 0.0
+        natural = 0.0
+        for leg in legs:
+            contract = leg.metadata
+            if leg.instruction in _SELL_INSTRUCTIONS:
+                mid += contract.mid
+                natural = (
+                    None
+                    if natural is None or contract.bid is None
+                    else natural + contract.bid
+                )
+            else:
+                mid -= contract.mid
+                natural = (
+                    None
+                    if natural is None or contract.ask is None
+                    else natural - contract.ask
+                )
+        return (
+            round(sign * mid, 4),
+            round(sign * natural, 4) if natural is not None else None,
+        )
+
+    # Net price the order's executions filled at, as a credit for credit
+    # orders and a debit otherwise. A leg filled in several executions is
+    # averaged by quantity. None when the order carries no executions.
+    @staticmethod
+    def fill_price(order_type: OrderType, order: dict) -> float:
+        legs = {leg.get("legId"): leg for leg in order.get("orderLegCollection", [])}
+        # legId -> [quantity filled, quantity times price]
+        fills = {}
+        for activity in order.get("orderActivityCollection", []):
+            for execution in activity.get("executionLegs", []):
+                quantity = float(execution.get("quantity", 0))
+                totals = fills.setdefault(execution.get("legId"), [0.0, 0.0])
+                totals[0] += quantity
+                totals[1] += quantity * float(execution["price"])
+        if not fills or any(
+            leg_id not in legs or quantity == 0
+            for leg_id, (quantity, _) in fills.items()
+        ):
+            return None
+        # Legs of one spread unit; a ratio spread's legs count proportionally
+        units = float(
+            order.get("quantity") or min(leg["quantity"] for leg in legs.values())
+        )
+        net = 0.0
+        for leg_id, (quantity, notional) in fills.items():
+            leg = legs[leg_id]
+            direction = (
+                1 if Instruction(leg["instruction"]) in _SELL_INSTRUCTIONS else -1
+            )
+            net += direction * notional / quantity * leg["quantity"] / units
+        sign = 1 if order_type == OrderType.CREDIT else -1
+        return round(sign * net, 4)
+
+    # The furthest price the worker may concede to: lower for credits, higher
+    # for debits
+    def _concession_limit(
+        self, order_type: OrderType, price: float, natural: float
+    ) -> float:
+        if order_type == OrderType.CREDIT:
+            limit = price - self.max_concession
+            return max(limit, natural) if natural is not None else limit
+        limit = price + self.max_concession
+        return min(limit, natural) if natural is not None else limit
+
+    def _next_price(self, order_type: OrderType, current: float, limit: float):
+        if order_type == OrderType.CREDIT:
+            following = round(current - self.step, 2)
+            return following if following >= limit - 1e-9 and following > 0 else None
+        following = round(current + self.step, 2)
+        return following if following <= limit + 1e-9 else None
+
+    # The order as it stands after the cancel, with its status set to
+    # TIMED_OUT unless the cancel failed because it already reached another
+    def _cancel(self, order_id: str, order: dict) -> dict:
+        try:
+            self._broker.cancel_order(order_id)
+        except Exception as e:
+            logging.warning("Could not cancel order {}: {}".format(order_id, e))
+            # It may have filled in the meantime, with executions to report
+            order = self._broker.order_status(order_id)
+            return dict(order, status=order.get("status", TIMED_OUT))
+        return dict(order, status=TIMED_OUT)
+
+    @staticmethod
+    def _report(
+        order_type: OrderType,
+        order_id: str,
+        status: str,
+        order: dict,
+        mid: float,
+        price: float,
+    ) -> dict:
+        filled = status == FILLED
+        fill_price = None
+        if filled:
+            fill_price = OrderWorker.fill_price(order_type, order)
+        if filled and fill_price is None:
+            # Without executions only the limit it filled at is known
+            fill_price = float(order.get("price", price))
+        slippage = None
+        if filled:
+            # Positive when the fill was worse than the mid
+            slippage = (
+                mid - fill_price if order_type == OrderType.CREDIT else fill_price - mid
+            )
+            slippage = round(slippage, 4)
+        return {
+            "code": "ok" if filled else "bad",
+            "order_id": order_id,
+            "status": status,
+            "first_mid": mid,
+            "limit_price": price,
+            "fill_price": fill_price,
+            "slippage": slippage,
+        }
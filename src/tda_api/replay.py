@@ -0,0 +1,349 @@
+import datetime
+import gzip
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from dto.history_fetchers import default_fetcher
+from dto.history_store import HistoryStore
+from dto.options import OptionLeg, VerticalSpread
+from tda_api import chain_parser
+from tda_api.broker import Broker
+from tda_api.session import BrokerSession
+from utils import clock
+from utils.common_utils import OrderType, AssetType, OptionType
+
+logger = logging.getLogger(__name__)
+
+
+class CassetteMiss(LookupError):
+    pass
+
+
+class Cassette:
+    VERSION = 1
+
+    def __init__(self, path: str, recorded_at: datetime.datetime = None):
+        self.path = path
+        self.recorded_at = recorded_at if recorded_at else clock.now()
+        self._interactions = {}
+        self._cursors = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str) -> "Cassette":
+        with gzip.open(path, "rt") as f:
+            data = json.load(f)
+        if data.get("version") != cls.VERSION:
+            msg = "Unsupported cassette version {} in {}".format(
+                data.get("version"), path
+            )
+            logging.error(msg)
+            raise ValueError(msg)
+        cassette = cls(path, datetime.datetime.fromisoformat(data["recorded_at"]))
+        for key, responses in data["interactions"].items():
+            for response in responses:
+                cassette.record(key, response)
+        return cassette
+
+    def save(self) -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".json.gz")
+        with self._lock:
+            data = {
+                "version": self.VERSION,
+                "recorded_at": self.recorded_at.isoformat(),
+                "interactions": {
+                    key: [json.loads(response) for response in responses]
+                    for key, responses in self._interactions.items()
+                },
+            }
+        with os.fdopen(fd, "wb") as raw, gzip.open(raw, "wt") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+    # Responses are kept as JSON text and decoded on every play, which returns a
+    # private copy and costs what decoding the live response would
+    def record(self, key: str, response) -> None:
+        encoded = json.dumps(response, separators=(",", ":"))
+        with self._lock:
+            self._interactions.setdefault(key, []).append(encoded)
+
+    # Responses for a key are replayed in recorded order, the last one repeating
+    def play(self, key: str):
+        return json.loads(self.play_text(key))
+
+    # The recorded response as JSON text, as it came off the wire
+    def play_text(self, key: str) -> str:
+        with self._lock:
+            responses = self._interactions.get(key)
+            if not responses:
+                msg = "Cassette {} has no recorded response for {}".format(
+                    self.path, key
+                )
+                logging.error(msg)
+                raise CassetteMiss(msg)
+            cursor = self._cursors.get(key, 0)
+            self._cursors[key] = cursor + 1
+            return responses[min(cursor, len(responses) - 1)]
+
+
+def _quotes_key(tickers) -> str:
+    return "quotes:" + ",".join(sorted(tickers))
+
+
+class RecordingBroker:
+    def __init__(self, broker: Broker, cassette: Cassette):
+        self._broker = broker
+        self._cassette = cassette
+
+    @property
+    def connections_opened(self) -> int:
+        return self._broker.connections_opened
+
+    def close(self) -> None:
+        self._broker.close()
+
+    def quote(self, ticker: str) -> dict:
+        response = self._broker.quote(ticker)
+        self._cassette.record("quote:" + ticker, response)
+        return response
+
+    def quotes(self, tickers: list) -> dict:
+        response = self._broker.quotes(tickers)
+        self._cassette.record(_quotes_key(tickers), response)
+        return response
+
+    def positions(self, **kwargs) -> list:
+        response = self._broker.positions(**kwargs)
+        self._cassette.record("positions", response)
+        return response
+
+    def open_orders(self, **kwargs) -> list:
+        response = self._broker.open_orders(**kwargs)
+        self._cassette.record("open_orders", response)
+        return response
+
+    def option_chain(self, ticker: str, **kwargs) -> dict:
+        response = self._broker.option_chain(ticker, **kwargs)
+        self._cassette.record(
+            "option_chain:{}:{}".format(ticker, _option_type_name(kwargs)), response
+        )
+        return response
+
+    def place_option_spread_order(self, **kwargs) -> dict:
+        response = self._broker.place_option_spread_order(**kwargs)
+        self._cassette.record("place_option_spread_order", response)
+        return response
+
+    def place_iron_condor_order(self, **kwargs) -> dict:
+        response = self._broker.place_iron_condor_order(**kwargs)
+        self._cassette.record("place_iron_condor_order", response)
+        return response
+
+    def submit_order(self, order_body: dict, **kwargs) -> str:
+        response = self._broker.submit_order(order_body, **kwargs)
+        self._cassette.record("submit_order", response)
+        return response
+
+    def order_status(self, order_id: str, **kwargs) -> dict:
+        response = self._broker.order_status(order_id, **kwargs)
+        self._cassette.record("order_status", response)
+        return response
+
+    def replace_order(self, order_id: str, order_body: dict, **kwargs) -> str:
+        response = self._broker.replace_order(order_id, order_body, **kwargs)
+        self._cassette.record("replace_order", response)
+        return response
+
+    def cancel_order(self, order_id: str, **kwargs) -> None:
+        self._broker.cancel_order(order_id, **kwargs)
+        self._cassette.record("cancel_order", None)
+
+
+class ReplayBroker:
+    def __init__(self, cassette: Cassette, latency: float = 0.0):
+        self._cassette = cassette
+        self.latency = latency
+        self.calls = 0
+
+    @property
+    def connections_opened(self) -> int:
+        return 0
+
+    def close(self) -> None:
+        pass
+
+    def quote(self, ticker: str) -> dict:
+        return self._play("quote:" + ticker)
+
+    def quotes(self, tickers: list) -> dict:
+        return self._play(_quotes_key(tickers))
+
+    def positions(self, account_id: str = None) -> list:
+        return self._play("positions")
+
+    def open_orders(self, account_id: str = None) -> list:
+        return self._play("open_orders")
+
+    def option_chain(
+        self,
+        ticker: str,
+        option_type: OptionType = None,
+        from_date: datetime.date = None,
+        to_date: datetime.date = None,
+        strike_count: int = None,
+    ) -> dict:
+        self._wait()
+        return chain_parser.parse_option_chain(
+            self._cassette.play_text(
+                "option_chain:{}:{}".format(
+                    ticker, _option_type_name({"option_type": option_type})
+                )
+            ),
+            from_date,
+            to_date,
+        )
+
+    def place_option_spread_order(
+        self,
+        order_type: OrderType,
+        price: float,
+        asset_type: AssetType,
+        long_leg: OptionLeg,
+        short_leg: OptionLeg,
+        account_id: str = None,
+    ) -> dict:
+        Broker.option_spread_order_body(
+            order_type, price, asset_type, long_leg, short_leg
+        )
+        return self._play("place_option_spread_order")
+
+    def place_iron_condor_order(
+        self,
+        order_type: OrderType,
+        price: float,
+        asset_type: AssetType,
+        call_spread: VerticalSpread,
+        put_spread: VerticalSpread,
+        account_id: str = None,
+    ) -> dict:
+        Broker.iron_condor_order_body(
+            order_type, price, asset_type, call_spread, put_spread
+        )
+        return self._play("place_iron_condor_order")
+
+    # Order statuses replay in recorded order, so a recorded session walks the
+    # same price steps it did live
+    def submit_order(self, order_body: dict, account_id: str = None) -> str:
+        return self._play("submit_order")
+
+    def order_status(self, order_id: str, account_id: str = None) -> dict:
+        return self._play("order_status")
+
+    def replace_order(
+        self, order_id: str, order_body: dict, account_id: str = None
+    ) -> str:
+        return self._play("replace_order")
+
+    def cancel_order(self, order_id: str, account_id: str = None) -> None:
+        self._play("cancel_order")
+
+    def _play(self, key: str):
+        self._wait()
+        return self._cassette.play(key)
+
+    def _wait(self) -> None:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+
+def _option_type_name(kwargs: dict) -> str:
+    option_type = kwargs.get("option_type")
+    return option_type.value if option_type else "ALL"
+
+
+class RecordingHistoryFetcher:
+    def __init__(self, cassette: Cassette, fetcher=None):
+        self._cassette = cassette
+        self._fetcher = fetcher if fetcher else default_fetcher()
+
+    def __call__(self, ticker: str, start: datetime.date) -> dict:
+        history = self._fetcher(ticker, start)
+        self._cassette.record(
+            "history:" + ticker,
+            {
+                key: [str(value) for value in values]
+                if key == "dates"
+                else [float(value) for value in values]
+                for key, values in history.items()
+            },
+        )
+        return history
+
+
+class ReplayHistoryFetcher:
+    def __init__(self, cassette: Cassette, latency: float = 0.0):
+        self._cassette = cassette
+        self.latency = latency
+
+    def __call__(self, ticker: str, start: datetime.date) -> dict:
+        if self.latency:
+            time.sleep(self.latency)
+        recorded = self._cassette.play("history:" + ticker)
+        return {
+            key: np.array(values, dtype="datetime64[D]")
+            if key == "dates"
+            else np.array(values, dtype=np.float64)
+            for key, values in recorded.items()
+        }
+
+
+# Recording starts from an empty price history so the full lookback is captured
+def recording_session(cassette: Cassette) -> BrokerSession:
+    return BrokerSession(
+        broker_factory=lambda: RecordingBroker(Broker(), cassette),
+        history_store=HistoryStore(
+            directory=tempfile.mkdtemp(prefix="record_history_"),
+            fetcher=RecordingHistoryFetcher(cassette),
+        ),
+    )
+
+
+# Replays never touch the network, the persisted price history or the wall
+# clock, so the same cassette always drives the same decisions
+def replay_session(cassette: Cassette, latency: float = 0.0) -> BrokerSession:
+    clock.freeze(cassette.recorded_at)
+    return BrokerSession(
+        broker_factory=lambda: ReplayBroker(cassette, latency),
+        history_store=HistoryStore(
+            directory=tempfile.mkdtemp(prefix="replay_history_"),
+            fetcher=ReplayHistoryFetcher(cassette, latency),
+        ),
+    )
+
+
+# TDA_CASSETTE names the cassette file, TDA_CASSETTE_MODE is "record" or
+# "replay" and TDA_CASSETTE_LATENCY adds seconds of delay to every replayed call
+def session_from_environment() -> (BrokerSession, Cassette):
+    path = os.environ.get("TDA_CASSETTE")
+    if not path:
+        # Live sessions reuse what earlier invocations in this container built
+        return BrokerSession(warm=True), None
+    mode = os.environ.get("TDA_CASSETTE_MODE", "replay")
+    if mode == "record":
+        cassette = Cassette(path)
+        return recording_session(cassette), cassette
+    if mode == "replay":
+        latency = float(os.environ.get("TDA_CASSETTE_LATENCY", 0))
+        return replay_session(Cassette.load(path), latency), None
+    msg = 'Unknown TDA_CASSETTE_MODE "{}"'.format(mode)
+    logging.error(msg)
+    raise ValueError(msg)
@@ -0,0 +1,95 @@
+import threading
+from typing import Callable
+
+from dto.history_store import HistoryStore
+from dto.market_snapshot import MarketSnapshot
+from factories.chain_cache import ChainCache
+from tda_api.broker import Broker
+from utils import warm_cache
+
+
+class BrokerSession:
+    # A warm session takes its broker, candles and chain snapshots from the
+    # container-wide caches in utils.warm_cache and leaves the broker open for
+    # the next invocation
+    def __init__(
+        self,
+        broker_factory: Callable[[], Broker] = None,
+        history_store: HistoryStore = None,
+        warm: bool = False,
+    ):
+        self._broker_factory = broker_factory if broker_factory else Broker
+        self.warm = warm
+        self.history_store = (
+            history_store
+            if history_store
+            else HistoryStore(memory=warm_cache.HISTORY if warm else None)
+        )
+        self._broker = None
+        self._chain_cache = None
+        self._snapshot = None
+        self._lock = threading.Lock()
+        # Counts cover this session only: a warm broker arrives with the
+        # connections earlier invocations opened already counted
+        self.clients_created = 0
+        self.clients_reused = 0
+        self._connections_at_start = 0
+
+    @property
+    def broker(self) -> Broker:
+        with self._lock:
+            if self._broker is None and self.warm:
+                self._broker = warm_cache.CLIENTS.get("broker")
+                if self._broker is not None:
+                    self.clients_reused += 1
+                    self._connections_at_start = self._broker.connections_opened
+            if self._broker is None:
+                self._broker = self._broker_factory()
+                self.clients_created += 1
+                self._connections_at_start = 0
+                if self.warm:
+                    warm_cache.CLIENTS.put("broker", self._broker)
+            return self._broker
+
+    @property
+    def chain_cache(self) -> ChainCache:
+        broker = self.broker
+        with self._lock:
+            if self._chain_cache is None:
+                self._chain_cache = ChainCache(
+                    broker, shared=warm_cache.CHAINS if self.warm else None
+                )
+            return self._chain_cache
+
+    @property
+    def snapshot(self) -> MarketSnapshot:
+        broker = self.broker
+        with self._lock:
+            if self._snapshot is None:
+                self._snapshot = MarketSnapshot(broker)
+            return self._snapshot
+
+    def stats(self) -> dict:
+        stats = {
+            "clients_created": self.clients_created,
+            "clients_reused": self.clients_reused,
+            "connections_opened": (
+                self._broker.connections_opened - self._connections_at_start
+                if self._broker
+                else 0
+            ),
+        }
+        if self._chain_cache:
+            stats.update(self._chain_cache.stats())
+        if self._snapshot:
+            stats.update(self._snapshot.stats())
+        return stats
+
+    def close(self) -> None:
+        with self._lock:
+            if self._broker is not None:
+                if not self.warm:
+                    self._broker.close()
+                self._broker = None
+                self._chain_cache = None
+                self._snapshot = None
@@ -0,0 +1,115 @@
+import copy
+import json
+import logging
+import os
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Token shipped with the code, read-only in Lambda
+BUNDLED_TOKEN_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "lib", "auth_token.json"
+)
+# Where refreshed tokens are written, and read from first when present
+WRITABLE_TOKEN_PATH = os.environ.get(
+    "TDA_TOKEN_PATH", os.path.join(tempfile.gettempdir(), "tda", "auth_token.json")
+)
+
+
+class TokenManager:
+    # Keeps one TDA token for the whole process. It is read from disk once and
+    # every client is built around it. Refreshes are serialized: a client whose
+    # token expired first takes the token another client may have refreshed
+    # meanwhile and only refreshes itself when that one expired too.
+    def __init__(
+        self,
+        bundled_path: str = BUNDLED_TOKEN_PATH,
+        writable_path: str = WRITABLE_TOKEN_PATH,
+    ):
+        self.bundled_path = bundled_path
+        self.writable_path = writable_path
+        self._token = None
+        # Reentrant because a refresh writes back while holding it
+        self._lock = threading.RLock()
+        self.loads = 0
+        self.writes = 0
+
+    # A private copy of the current token, in the format tda-api stores
+    def read(self) -> dict:
+        with self._lock:
+            if self._token is None:
+                self._token = self._load()
+            return copy.deepcopy(self._token)
+
+    # tda-api's token write function. Refreshes arrive here already wrapped in
+    # their metadata.
+    def write(self, token: dict, *args, **kwargs) -> None:
+        with self._lock:
+            self._token = copy.deepcopy(token)
+            self._save(self._token)
+            self.writes += 1
+
+    def client(self, api_key: str):
+        from tda import auth
+
+        client = auth.client_from_access_functions(api_key, self.read, self.write)
+        session = client.session
+        refresh = session.ensure_active_token
+
+        def ensure_active_token(token=None) -> bool:
+            if not session.token.is_expired(leeway=session.leeway):
+                return True
+            with self._lock:
+                current = self._token.get("token", self._token)
+                if current.get("access_token") != session.token.get("access_token"):
+                    session.token = copy.deepcopy(current)
+                return refresh()
+
+        session.ensure_active_token = ensure_active_token
+        return client
+
+    def stats(self) -> dict:
+        return {"token_loads": self.loads, "token_writes": self.writes}
+
+    def _load(self) -> dict:
+        for path in (self.writable_path, self.bundled_path):
+            try:
+                with open(path) as f:
+                    token = json.load(f)
+            except FileNotFoundError:
+                continue
+            except (OSError, ValueError) as e:
+                logging.warning("Skipping unreadable token {}: {}".format(path, e))
+                continue
+            self.loads += 1
+            return token
+        msg = "No TDA token found at {} or {}".format(
+            self.writable_path, self.bundled_path
+        )
+        logging.error(msg)
+        raise RuntimeError(msg)
+
+    def _save(self, token: dict) -> None:
+        directory = os.path.dirname(os.path.abspath(self.writable_path))
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".json")
+            with os.fdopen(fd, "w") as f:
+                json.dump(token, f)
+            os.replace(tmp_path, self.writable_path)
+        except OSError as e:
+            # The refreshed token still lives in memory for this process
+            logging.warning("Unable to persist refreshed TDA token: {}".format(e))
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def default_manager() -> TokenManager:
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = TokenManager()
+        return _manager
@@ -0,0 +1,186 @@
+import logging
+import os
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Order placement may use every token; reads leave RESERVE tokens for orders
+ORDER = "order"
+READ = "read"
+# Statuses worth retrying: rate limited, or a server or gateway failure
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    # TDA allows 120 requests a minute per application
+    RATE_PER_MINUTE = float(os.environ.get("TDA_REQUESTS_PER_MINUTE", 120))
+    BURST = 20
+    RESERVE = 4
+
+    def __init__(
+        self,
+        rate_per_minute: float = RATE_PER_MINUTE,
+        burst: int = BURST,
+        reserve: int = RESERVE,
+    ):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.reserve = min(reserve, burst - 1)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._condition = threading.Condition()
+        self.waits = 0
+        self.wait_seconds = 0.0
+
+    # Blocks until a request of `priority` may go out and returns how long it
+    # waited
+    def acquire(self, priority: str = READ) -> float:
+        needed = 1 if priority == ORDER else 1 + self.reserve
+        start = time.monotonic()
+        with self._condition:
+            while True:
+                self._refill()
+                if self._tokens >= needed:
+                    self._tokens -= 1
+                    break
+                self._condition.wait((needed - self._tokens) / self.rate)
+            waited = time.monotonic() - start
+            if waited > 0.001:
+                self.waits += 1
+                self.wait_seconds += waited
+            # Orders queued behind a read may now go
+            self._condition.notify_all()
+        return waited
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class Transport:
+    # Every TDA call goes through one of these. Reads retry transient failures
+    # with full jitter backoff; order calls are not idempotent and only retry a
+    # 429, which TDA sends before acting on the request.
+    MAX_RETRIES = 3
+    BASE_DELAY = 0.25
+    MAX_DELAY = 4.0
+
+    def __init__(
+        self,
+        limiter: TokenBucket = None,
+        max_retries: int = MAX_RETRIES,
+        base_delay: float = BASE_DELAY,
+        max_delay: float = MAX_DELAY,
+    ):
+        self.limiter = limiter if limiter else TokenBucket()
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+
+    def read(self, name: str, span, call, *args, **kwargs):
+        return self._send(name, READ, span, call, *args, **kwargs)
+
+    def order(self, name: str, span, call, *args, **kwargs):
+        return self._send(name, ORDER, span, call, *args, **kwargs)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "tda_requests": self.requests,
+                "tda_retries": self.retries,
+                "tda_failures": self.failures,
+                "throttle_waits": self.limiter.waits,
+                "throttle_wait_seconds": round(self.limiter.wait_seconds, 3),
+            }
+
+    def _send(self, name: str, priority: str, span, call, *args, **kwargs):
+        attempt = 0
+        while True:
+            self.limiter.acquire(priority)
+            with self._lock:
+                self.requests += 1
+            error = None
+            try:
+                response = call(*args, **kwargs)
+            except Exception as e:
+                # Connection errors never reached TDA, so a read can repeat
+                if priority == ORDER or not self._is_transport_error(e):
+                    raise
+                response, error = None, e
+            if (
+                not self._should_retry(priority, response)
+                or attempt >= self.max_retries
+            ):
+                break
+            attempt += 1
+            with self._lock:
+                self.retries += 1
+            span.retry()
+            delay = self._delay(attempt, response)
+            logging.warning(
+                "Retrying TDA {} in {:.2f}s after {}".format(
+                    name, delay, error if error else response.status_code
+                )
+            )
+            time.sleep(delay)
+        if error is not None:
+            with self._lock:
+                self.failures += 1
+            raise error
+        self._check(name, response)
+        return response
+
+    def _should_retry(self, priority: str, response) -> bool:
+        if response is None:
+            return True
+        if priority == ORDER:
+            return response.status_code == 429
+        return response.status_code in RETRYABLE_STATUSES
+
+    def _delay(self, attempt: int, response) -> float:
+        retry_after = None
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_delay)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+    def _check(self, name: str, response) -> None:
+        if response.status_code < 400:
+            return
+        with self._lock:
+            self.failures += 1
+        msg = "TDA {} failed with HTTP {}: {}".format(
+            name, response.status_code, response.text[:200]
+        )
+        logging.error(msg)
+        raise RuntimeError(msg)
+
+    @staticmethod
+    def _is_transport_error(error: Exception) -> bool:
+        import httpx
+
+        return isinstance(error, httpx.TransportError)
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+# The process-wide transport, so every broker shares one request budget
+def default_transport() -> Transport:
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = Transport()
+        return _transport
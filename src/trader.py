@@ -1,19 +1,306 @@
-from strategies.strategy import Strategy
+import datetime
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Union
+
+from dto.data_needs import DataNeeds
+from dto.plan_store import PlanStore
+from dto.strategy_config import StrategyConfig
+from dto.trade_plan import plan_key, quantity_options
+from factories.chain_cache import ChainCache
+from strategies import registry
+from strategies.strategy import Strategy, StrategyCancelled
+from tda_api.broker import AccountBroker
+from tda_api.session import BrokerSession
+from utils import clock
+
+logger = logging.getLogger(__name__)
 
 
 class Trader:
-    def __init__(self):
-        self.strategies: list[Strategy] = []
+    DEFAULT_DEADLINE_SECONDS = 50.0
+    # Seconds a strategy past its deadline gets to notice before the Trader
+    # stops waiting for it
+    CANCEL_GRACE_SECONDS = 5.0
+    # Share of the shortest deadline the shared prefetch may take. What it has
+    # not loaded by then each strategy fetches itself, and the time it took
+    # counts against every deadline so the run still ends on time.
+    PREFETCH_SHARE = 0.5
+    _POLL_INTERVAL_SECONDS = 0.05
+
+    def __init__(
+        self,
+        session: BrokerSession = None,
+        max_workers: int = 4,
+        deadline: float = DEFAULT_DEADLINE_SECONDS,
+        plan_store: PlanStore = None,
+        cancel_grace: float = CANCEL_GRACE_SECONDS,
+    ):
+        self.session = session if session else BrokerSession()
+        self.max_workers = max_workers
+        self.deadline = deadline
+        self.cancel_grace = cancel_grace
+        # Where today's trade plans are read from, None decides everything live
+        self.plan_store = plan_store
+        self.strategies: list[Union[Strategy, Callable[[], Strategy]]] = []
+        # Each strategy's own deadline, None for the Trader's
+        self.deadlines: list = []
+        self.configs: list[StrategyConfig] = []
+        self.needs = DataNeeds()
+        self.planned = 0
+        self.prefetch_seconds = 0.0
 
-    def set_strategies(self, *strategies: Strategy) -> None:
+    def set_strategies(
+        self, *strategies: Union[Strategy, Callable[[], Strategy]]
+    ) -> None:
         self.strategies = [strategy for strategy in strategies]
+        self.deadlines = [self._declared_deadline(strategy) for strategy in strategies]
 
-    def trade(self) -> list:
+    # Takes StrategyConfigs or plain dicts in the same shape, merges what market
+    # data they read and queues one strategy per config. Strategies are built
+    # when the trade runs, after prefetch() has loaded the shared data. A config
+    # with a plan for today in plan_store trades from it and only needs its chain.
+    def set_configs(self, *configs: Union[StrategyConfig, dict]) -> None:
+        configs = [
+            (
+                config
+                if isinstance(config, StrategyConfig)
+                else StrategyConfig.from_dict(config)
+            )
+            for config in configs
+        ]
+        plans = self.plan_store.load(clock.today()) if self.plan_store else {}
+        needs = DataNeeds()
+        strategies = []
+        deadlines = []
+        self.planned = 0
+        for config in configs:
+            strategy_class = registry.strategy_class(config.strategy)
+            options = dict(config.options)
+            plan = plans.get(
+                plan_key(
+                    config.strategy,
+                    config.ticker,
+                    config.buying_power,
+                    config.account_id,
+                    quantity_options(config.options),
+                )
+            )
+            if plan is not None:
+                options["plan"] = plan
+                needs.update(strategy_class.planned_data_needs(plan))
+                self.planned += 1
+            else:
+                needs.update(strategy_class.data_needs(config.ticker))
+            broker = self.session.broker
+            if config.account_id is not None:
+                broker = AccountBroker(broker, config.account_id)
+            deadlines.append(
+                config.deadline if config.deadline else strategy_class.deadline
+            )
+            strategies.append(
+                functools.partial(
+                    strategy_class,
+                    ticker=config.ticker,
+                    order_type=config.order_type,
+                    buying_power=config.buying_power,
+                    broker=broker,
+                    chain_cache=self.session.chain_cache,
+                    snapshot=self.session.snapshot,
+                    history_store=self.session.history_store,
+                    **options,
+                )
+            )
+        self.configs = configs
+        self.needs = needs
+        self.set_strategies(*strategies)
+        self.deadlines = deadlines
+
+    # Builds each queued config's plan for trade_date from the price history
+    # and quotes available now, meant to run after the close. Configs whose
+    # strategy cannot plan are left out and trade live as before.
+    def make_plans(self, trade_date: datetime.date) -> list:
+        self.prefetch(chains=False)
+        plans = []
+        for config in self.configs:
+            try:
+                plan = registry.strategy_class(config.strategy).plan(
+                    config,
+                    trade_date,
+                    self.session.snapshot,
+                    self.session.history_store,
+                )
+            except Exception as e:
+                logging.error(
+                    "Planning {} on {} failed: {}".format(
+                        config.strategy, config.ticker, e
+                    ),
+                    exc_info=e,
+                )
+                continue
+            if plan is not None:
+                plans.append(plan)
+        return plans
+
+    # Fetches every quote, price history and option chain the queued configs
+    # need, each exactly once and concurrently, waiting at most `timeout`
+    # seconds. A failed or unfinished fetch is only logged here, the
+    # strategies that need it retry it on their own.
+    def prefetch(self, chains: bool = True, timeout: float = None) -> None:
+        needs = self.needs
+        if not (needs.quotes or needs.history or (chains and needs.chains)):
+            return
+        snapshot = self.session.snapshot
+        snapshot.require(*sorted(needs.quotes))
+        tasks = []
+        if needs.quotes:
+            tasks.append((snapshot.quote, min(needs.quotes)))
+        for ticker, sessions in needs.history.items():
+            tasks.append((self.session.history_store.candles, ticker, sessions))
+        # Expirations of one ticker a few days apart come back in one request
+        for window in ChainCache.windows(needs.chains) if chains else ():
+            tasks.append((self.session.chain_cache.load, *window))
+        executor = ThreadPoolExecutor(
+            max_workers=max(1, min(self.max_workers, len(tasks)))
+        )
+        futures = {executor.submit(*task): task for task in tasks}
+        # A fetch still running at the timeout is left to finish in the
+        # background rather than waited on
+        executor.shutdown(wait=False)
+        done, not_done = wait(futures, timeout=timeout)
+        for future in not_done:
+            logging.warning(
+                "Prefetch of {} did not finish within {}s".format(
+                    futures[future][1:], timeout
+                )
+            )
+        for future in done:
+            if future.exception() is not None:
+                logging.warning(
+                    "Prefetch of {} failed: {}".format(
+                        futures[future][1:], future.exception()
+                    )
+                )
+
+    def trade(self, concurrent: bool = False) -> list:
+        start = time.monotonic()
+        self.prefetch(timeout=self._prefetch_timeout())
+        self.prefetch_seconds = time.monotonic() - start
+        if concurrent:
+            return self._trade_concurrently()
         logs = []
         for strategy in self.strategies:
             try:
-                log = strategy.execute()
+                log = self._run(strategy)
             except Exception as e:
                 log = e
             logs.append(log)
         return logs
+
+    # A strategy past its deadline is told to stop through its cancelled
+    # event, which it checks before placing any order. It is only reported as
+    # timed out once it has stopped, or after cancel_grace if it has not.
+    def _trade_concurrently(self) -> list:
+        logs = [None] * len(self.strategies)
+        started = {}
+        events = [threading.Event() for _ in self.strategies]
+        executor = ThreadPoolExecutor(
+            max_workers=max(1, min(self.max_workers, len(self.strategies)))
+        )
+
+        def run(index: int):
+            started[index] = time.monotonic()
+            return self._run(self.strategies[index], events[index])
+
+        futures = {executor.submit(run, i): i for i in range(len(self.strategies))}
+        pending = set(futures)
+        # Index to the time it was told to stop
+        cancelled_at = {}
+        try:
+            while pending:
+                done, pending = wait(
+                    pending,
+                    timeout=self._POLL_INTERVAL_SECONDS,
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    index = futures[future]
+                    logs[index] = self._outcome(future, index, index in cancelled_at)
+                now = time.monotonic()
+                for future in list(pending):
+                    index = futures[future]
+                    if index in cancelled_at:
+                        if now - cancelled_at[index] > self.cancel_grace:
+                            msg = (
+                                "Strategy {} is still running {}s after its "
+                                "deadline; an order it had in flight may still go out"
+                            ).format(index, self.cancel_grace)
+                            logging.error(msg)
+                            logs[index] = TimeoutError(msg)
+                            pending.discard(future)
+                        continue
+                    deadline = self._deadline_for(index) - self.prefetch_seconds
+                    if index in started and now - started[index] > deadline:
+                        events[index].set()
+                        cancelled_at[index] = now
+                        if future.cancel():
+                            logs[index] = self._timed_out(index)
+                            pending.discard(future)
+        finally:
+            for event in events:
+                event.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+        return logs
+
+    def _outcome(self, future, index: int, cancelled: bool):
+        try:
+            result = future.result()
+        except StrategyCancelled:
+            return self._timed_out(index)
+        except Exception as e:
+            return e
+        if cancelled:
+            # Its order went out before it saw the cancellation
+            logging.warning(
+                "Strategy {} finished after its deadline of {}s".format(
+                    index, self._deadline_for(index)
+                ),
+                extra={"result": result},
+            )
+        return result
+
+    def _timed_out(self, index: int) -> TimeoutError:
+        return TimeoutError(
+            "Strategy {} exceeded its deadline of {}s".format(
+                index, self._deadline_for(index)
+            )
+        )
+
+    def _prefetch_timeout(self) -> float:
+        deadlines = [self._deadline_for(i) for i in range(len(self.strategies))]
+        return self.PREFETCH_SHARE * min(deadlines, default=self.deadline)
+
+    def _deadline_for(self, index: int) -> float:
+        deadline = self.deadlines[index] if index < len(self.deadlines) else None
+        return deadline if deadline else self.deadline
+
+    # The deadline a strategy, or the class a factory for it builds, declares
+    @staticmethod
+    def _declared_deadline(strategy: Union[Strategy, Callable[[], Strategy]]) -> float:
+        if isinstance(strategy, functools.partial):
+            strategy = strategy.func
+        return getattr(strategy, "deadline", None)
+
+    @staticmethod
+    def _run(
+        strategy: Union[Strategy, Callable[[], Strategy]],
+        cancelled: threading.Event = None,
+    ) -> dict:
+        if not isinstance(strategy, Strategy):
+            strategy = strategy()
+        if cancelled is not None:
+            strategy.cancelled = cancelled
+        return strategy.execute()
@@ -0,0 +1,144 @@
+import datetime
+
+import numpy as np
+from pytz import timezone
+
+from utils.common_utils import OptionType
+
+# Every function here takes NumPy arrays (or scalars that broadcast against
+# them), so a whole expiration is priced in one pass without a Python loop.
+
+# Time to expiry is measured in calendar time, as VIX is
+_DAYS_PER_YEAR = 365.0
+_SECONDS_PER_YEAR = _DAYS_PER_YEAR * 24 * 60 * 60
+# Floor on time to expiry, so an expiring option still has a finite d1
+_MIN_YEARS = 60.0 / _SECONDS_PER_YEAR
+# Bounds on volatility, as a fraction
+_MIN_SIGMA = 1e-4
+_MAX_SIGMA = 5.0
+# Below a cent of time value a price says next to nothing about volatility
+_MIN_TIME_VALUE = 0.01
+
+
+def norm_cdf(x: np.ndarray) -> np.ndarray:
+    # Abramowitz & Stegun 7.1.26, accurate to ~1e-7 and free of scipy
+    z = np.abs(x) / np.sqrt(2.0)
+    t = 1.0 / (1.0 + 0.3275911 * z)
+    poly = t * (
+        0.254829592
+        + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429)))
+    )
+    erf = 1.0 - poly * np.exp(-z * z)
+    return 0.5 * (1.0 + np.sign(x) * erf)
+
+
+def norm_pdf(x: np.ndarray) -> np.ndarray:
+    return np.exp(-0.5 * x * x) / np.sqrt(2.0 * np.pi)
+
+
+# VIX quotes annualized volatility in percent
+def sigma_from_vix(vix, multiplier: float = 1.0) -> np.ndarray:
+    return np.maximum(np.asarray(vix, dtype=float) * multiplier / 100.0, _MIN_SIGMA)
+
+
+# Years from `now` until the 4pm Eastern close on expiration_date
+def years_to_expiration(
+    now: datetime.datetime, expiration_date: datetime.date
+) -> float:
+    eastern = timezone("US/Eastern")
+    close = eastern.localize(
+        datetime.datetime.combine(expiration_date, datetime.time(16))
+    )
+    if now.tzinfo is None:
+        now = eastern.localize(now)
+    return max((close - now).total_seconds() / _SECONDS_PER_YEAR, _MIN_YEARS)
+
+
+# Years spanned by `days` calendar days, for callers that only know dates
+def years_from_days(days) -> np.ndarray:
+    return np.maximum(np.asarray(days, dtype=float) / _DAYS_PER_YEAR, _MIN_YEARS)
+
+
+# Theoretical value and delta of every strike, sharing d1 and d2
+def evaluate(
+    option_type: OptionType,
+    underlying,
+    strikes,
+    years,
+    sigma,
+    rate: float = 0.0,
+) -> (np.ndarray, np.ndarray):
+    d1, d2, discount = _d1_d2(underlying, strikes, years, sigma, rate)
+    if option_type == OptionType.CALL:
+        value = underlying * norm_cdf(d1) - strikes * discount * norm_cdf(d2)
+        return value, norm_cdf(d1)
+    value = strikes * discount * norm_cdf(-d2) - underlying * norm_cdf(-d1)
+    return value, norm_cdf(d1) - 1.0
+
+
+def price(
+    option_type: OptionType, underlying, strikes, years, sigma, rate: float = 0.0
+) -> np.ndarray:
+    return evaluate(option_type, underlying, strikes, years, sigma, rate)[0]
+
+
+def vega(underlying, strikes, years, sigma, rate: float = 0.0) -> np.ndarray:
+    d1, _, _ = _d1_d2(underlying, strikes, years, sigma, rate)
+    return underlying * norm_pdf(d1) * np.sqrt(years)
+
+
+# Volatility that reprices each strike at `prices`, by Newton steps kept
+# inside a bisection bracket so deep out-of-the-money strikes with almost no
+# vega still converge. NaN where a price is outside its no-arbitrage bounds
+# or holds less than _MIN_TIME_VALUE over intrinsic value.
+def implied_vol(
+    option_type: OptionType,
+    prices,
+    underlying,
+    strikes,
+    years,
+    rate: float = 0.0,
+    tolerance: float = 1e-6,
+    iterations: int = 50,
+) -> np.ndarray:
+    prices, strikes = np.broadcast_arrays(
+        np.asarray(prices, dtype=float), np.asarray(strikes, dtype=float)
+    )
+    discount = np.exp(-rate * years)
+    if option_type == OptionType.CALL:
+        low_bound = np.maximum(underlying - strikes * discount, 0.0)
+        high_bound = np.broadcast_to(np.asarray(underlying, dtype=float), prices.shape)
+    else:
+        low_bound = np.maximum(strikes * discount - underlying, 0.0)
+        high_bound = strikes * discount
+    with np.errstate(invalid="ignore"):
+        valid = (
+            np.isfinite(prices)
+            & (prices - low_bound >= _MIN_TIME_VALUE)
+            & (prices < high_bound)
+        )
+    low = np.full(prices.shape, _MIN_SIGMA)
+    high = np.full(prices.shape, _MAX_SIGMA)
+    sigma = np.full(prices.shape, 0.2)
+    for _ in range(iterations):
+        error = price(option_type, underlying, strikes, years, sigma, rate) - prices
+        if np.all(np.abs(error[valid]) < tolerance):
+            break
+        too_high = error > 0
+        high = np.where(too_high, sigma, high)
+        low = np.where(too_high, low, sigma)
+        slope = vega(underlying, strikes, years, sigma, rate)
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            step = sigma - error / slope
+        inside = np.isfinite(step) & (step > low) & (step < high)
+        sigma = np.where(inside, step, (low + high) / 2.0)
+    return np.where(valid, sigma, np.nan)
+
+
+def _d1_d2(underlying, strikes, years, sigma, rate: float):
+    sqrt_t = np.sqrt(years)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d1 = (np.log(underlying / strikes) + (rate + 0.5 * sigma**2) * years) / (
+            sigma * sqrt_t
+        )
+    return d1, d1 - sigma * sqrt_t, np.exp(-rate * years)
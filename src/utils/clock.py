@@ -0,0 +1,49 @@
+import datetime
+
+from pytz import timezone
+
+MARKET_OPEN = datetime.time(9, 30)
+MARKET_CLOSE = datetime.time(16)
+
+# When set, every caller sees this moment instead of the wall clock so that
+# recorded sessions can be replayed on another day
+_frozen = None
+
+
+def now(tz: datetime.tzinfo = None) -> datetime.datetime:
+    if _frozen is None:
+        return datetime.datetime.now(tz)
+    return _frozen.astimezone(tz) if tz else _frozen
+
+
+def today() -> datetime.date:
+    return now().date()
+
+
+# The weekday after `day`; market holidays are not skipped
+def next_session(day: datetime.date) -> datetime.date:
+    day += datetime.timedelta(days=1)
+    while day.weekday() >= 5:
+        day += datetime.timedelta(days=1)
+    return day
+
+
+# Whether `moment` falls in the regular session, 9:30 to 16:00 New York
+# time on a weekday; market holidays are not known here
+def market_is_open(moment: datetime.datetime = None) -> bool:
+    moment = (moment if moment else now()).astimezone(timezone("US/Eastern"))
+    if moment.weekday() >= 5:
+        return False
+    return MARKET_OPEN <= moment.time() < MARKET_CLOSE
+
+
+def freeze(moment: datetime.datetime) -> None:
+    global _frozen
+    if moment.tzinfo is None:
+        moment = moment.astimezone()
+    _frozen = moment
+
+
+def unfreeze() -> None:
+    global _frozen
+    _frozen = None
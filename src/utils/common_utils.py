@@ -32,6 +32,15 @@ class OptionType(Enum):
     NO_OP = "NO_OP"
 
 
+class ExitReason(Enum):
+    HOLD = "HOLD"
+    PROFIT_TARGET = "PROFIT_TARGET"
+    STOP_LOSS = "STOP_LOSS"
+    SHORT_STRIKE_THREATENED = "SHORT_STRIKE_THREATENED"
+    # Held because a leg has no usable bid and ask
+    UNQUOTED = "UNQUOTED"
+
+
 def transform_ticker(ticker: str, tp: TradingPlatforms) -> str:
     if tp == TradingPlatforms.YAHOO:
         return ticker if ticker not in std_to_yf.keys() else std_to_yf[ticker]
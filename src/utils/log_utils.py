@@ -0,0 +1,217 @@
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+# Attributes every LogRecord carries, anything else on a record came from extra=
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+# Shipping logs through boto must not produce more logs to ship
+_IGNORED_LOGGERS = ("boto", "botocore", "urllib3", "s3transfer", "watchtower")
+
+_handler = None
+_handler_lock = threading.Lock()
+
+
+class StructuredFormatter(logging.Formatter):
+    # One JSON object per record, so CloudWatch Logs Insights can filter on
+    # strategy, ticker and stage instead of parsing message text
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class BatchingHandler(QueueHandler):
+    # Records go into a bounded in-memory queue and a daemon thread hands them to
+    # the target handler in batches. Logging never blocks the caller: when the
+    # queue is full the record is dropped and counted.
+    DEFAULT_CAPACITY = int(os.environ.get("LOG_QUEUE_CAPACITY", 10000))
+    DEFAULT_BATCH_SIZE = 100
+    DEFAULT_FLUSH_INTERVAL = 1.0
+    DEFAULT_FLUSH_TIMEOUT = 5.0
+
+    def __init__(
+        self,
+        target_factory: Callable[[], logging.Handler],
+        capacity: int = DEFAULT_CAPACITY,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+    ):
+        super().__init__(queue.Queue(maxsize=capacity))
+        self._target_factory = target_factory
+        self._target = None
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.shipped = 0
+        self._counter_lock = threading.Lock()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return not record.name.startswith(_IGNORED_LOGGERS) and super().filter(record)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Render the message and traceback now, while the arguments still hold
+        # the values they had when the record was made
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        self._start_worker()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._counter_lock:
+                self.dropped += 1
+
+    # Blocks until every record queued before the call has been handed to the
+    # target and the target has been flushed. Returns False on timeout.
+    def flush(self, timeout: float = DEFAULT_FLUSH_TIMEOUT) -> bool:
+        if self._worker is None:
+            return True
+        done = threading.Event()
+        try:
+            self.queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def stats(self) -> dict:
+        return {
+            "log_records_shipped": self.shipped,
+            "log_records_dropped": self.dropped,
+        }
+
+    def _start_worker(self) -> None:
+        if self._worker is not None:
+            return
+        with self._worker_lock:
+            if self._worker is None:
+                worker = threading.Thread(
+                    target=self._work, name="log-shipper", daemon=True
+                )
+                worker.start()
+                self._worker = worker
+
+    def _work(self) -> None:
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and not isinstance(
+                batch[-1], threading.Event
+            ):
+                try:
+                    batch.append(
+                        self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    )
+                except queue.Empty:
+                    break
+            self._ship(batch)
+
+    def _ship(self, batch: list) -> None:
+        target = self._get_target()
+        shipped = 0
+        for item in batch:
+            if isinstance(item, threading.Event):
+                continue
+            target.handle(item)
+            shipped += 1
+        try:
+            target.flush()
+        except Exception:
+            self.handleError(batch[-1] if shipped else logging.makeLogRecord({}))
+        with self._counter_lock:
+            self.shipped += shipped
+        for item in batch:
+            if isinstance(item, threading.Event):
+                item.set()
+
+    def _get_target(self) -> logging.Handler:
+        if self._target is None:
+            try:
+                self._target = self._target_factory()
+            except Exception as e:
+                # Lambda also ships stderr to CloudWatch, only without batching
+                self._target = logging.StreamHandler(sys.stderr)
+                self._target.handle(
+                    logging.makeLogRecord(
+                        {
+                            "msg": "Falling back to stderr logging: {}".format(e),
+                            "levelno": logging.WARNING,
+                            "levelname": "WARNING",
+                            "name": __name__,
+                        }
+                    )
+                )
+            self._target.setFormatter(StructuredFormatter())
+        return self._target
+
+
+def cloudwatch_handler() -> logging.Handler:
+    import watchtower
+
+    return watchtower.CloudWatchLogHandler()
+
+
+# Installs the batching handler on the root logger. Only the first call has any
+# effect, so every entry point can call it without stacking handlers.
+def configure(
+    level: int = logging.INFO,
+    target_factory: Callable[[], logging.Handler] = cloudwatch_handler,
+) -> BatchingHandler:
+    global _handler
+    with _handler_lock:
+        if _handler is None:
+            _handler = BatchingHandler(target_factory)
+            root = logging.getLogger()
+            root.addHandler(_handler)
+            root.setLevel(level)
+        return _handler
+
+
+def flush(timeout: float = BatchingHandler.DEFAULT_FLUSH_TIMEOUT) -> bool:
+    return _handler.flush(timeout) if _handler else True
+
+
+def stats() -> dict:
+    return _handler.stats() if _handler else {}
+
+
+# Structured fields for a strategy instance or a zero-argument factory for one
+def strategy_fields(strategy) -> dict:
+    func = getattr(strategy, "func", None)
+    if func is not None:
+        fields = {
+            "strategy": getattr(func, "__name__", str(func)),
+            "ticker": strategy.keywords.get("ticker"),
+        }
+        account_id = getattr(strategy.keywords.get("broker"), "account_id", None)
+        if isinstance(account_id, str):
+            fields["account_id"] = account_id
+        return fields
+    return {
+        "strategy": type(strategy).__name__,
+        "ticker": getattr(strategy, "ticker", None),
+    }
@@ -0,0 +1,149 @@
+import json
+import os
+import sys
+import threading
+import time
+
+# Where spans are written when emit() is called: "stdout" for Lambda, where
+# CloudWatch turns embedded-metric-format lines into metrics, a file path for
+# local runs, or "off" to make span() a no-op
+STDOUT = "stdout"
+OFF = "off"
+NAMESPACE = os.environ.get("METRICS_NAMESPACE", "TradingCwTrigger")
+# Spans kept between emits, so a process that never emits cannot grow forever
+MAX_SPANS = 1000
+
+_sink = os.environ.get("METRICS_SINK", STDOUT)
+_spans = []
+_lock = threading.Lock()
+dropped = 0
+
+
+class Span:
+    __slots__ = (
+        "name",
+        "properties",
+        "timestamp",
+        "latency_ms",
+        "payload_bytes",
+        "retries",
+        "_start",
+    )
+
+    def __init__(self, name: str, properties: dict):
+        self.name = name
+        self.properties = properties
+        self.timestamp = None
+        self.latency_ms = None
+        self.payload_bytes = None
+        self.retries = 0
+        self._start = None
+
+    def add_payload(self, size: int) -> None:
+        self.payload_bytes = (self.payload_bytes or 0) + size
+
+    def retry(self) -> None:
+        self.retries += 1
+
+    # Adds properties only known once the timed work is done
+    def annotate(self, **properties) -> None:
+        self.properties.update(properties)
+
+    def __enter__(self) -> "Span":
+        self.timestamp = int(time.time() * 1000)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> bool:
+        self.latency_ms = (time.perf_counter() - self._start) * 1000
+        if exc_type is not None:
+            self.properties["error"] = exc_type.__name__
+        _add(self)
+        return False
+
+    def to_emf(self) -> dict:
+        metrics = [
+            {"Name": "Latency", "Unit": "Milliseconds"},
+            {"Name": "Retries", "Unit": "Count"},
+        ]
+        document = dict(self.properties)
+        document.update(Span=self.name, Latency=self.latency_ms, Retries=self.retries)
+        if self.payload_bytes is not None:
+            metrics.append({"Name": "PayloadBytes", "Unit": "Bytes"})
+            document["PayloadBytes"] = self.payload_bytes
+        document["_aws"] = {
+            "Timestamp": self.timestamp,
+            "CloudWatchMetrics": [
+                {"Namespace": NAMESPACE, "Dimensions": [["Span"]], "Metrics": metrics}
+            ],
+        }
+        return document
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def add_payload(self, size: int) -> None:
+        pass
+
+    def retry(self) -> None:
+        pass
+
+    def annotate(self, **properties) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> bool:
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+# Times the body of a with block. Keyword arguments are written alongside the
+# metrics as searchable properties, they are not metric dimensions.
+def span(name: str, **properties):
+    if _sink == OFF:
+        return _NOOP_SPAN
+    return Span(name, properties)
+
+
+def _add(finished: Span) -> None:
+    global dropped
+    with _lock:
+        if len(_spans) < MAX_SPANS:
+            _spans.append(finished)
+        else:
+            dropped += 1
+
+
+def configure(sink: str) -> None:
+    global _sink
+    with _lock:
+        _sink = sink
+        _spans.clear()
+
+
+def enabled() -> bool:
+    return _sink != OFF
+
+
+# Writes every span recorded since the last emit, one JSON line each, and
+# returns how many were written
+def emit() -> int:
+    with _lock:
+        spans = list(_spans)
+        _spans.clear()
+        sink = _sink
+    if not spans or sink == OFF:
+        return 0
+    lines = "".join(json.dumps(s.to_emf(), default=str) + "\n" for s in spans)
+    if sink == STDOUT:
+        sys.stdout.write(lines)
+        sys.stdout.flush()
+    else:
+        with open(sink, "a") as f:
+            f.write(lines)
+    return len(spans)
@@ -0,0 +1,138 @@
+import datetime
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from pytz import timezone
+
+from utils import clock
+
+logger = logging.getLogger(__name__)
+
+# Lambda keeps module state while it reuses a container, so what is cached here
+# outlives the invocation that built it. Every entry is tagged with the trading
+# date it was built on and is never served on another one.
+
+
+def trading_date() -> datetime.date:
+    return clock.now(timezone("US/Eastern")).date()
+
+
+class TTLCache:
+    # on_evict is called with every value the cache drops, whether it expired,
+    # rolled over to a new trading date, was pushed out or was replaced, so
+    # values holding connections can release them
+    def __init__(self, name: str, max_entries: int, ttl: float, on_evict=None):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at, day = entry
+                if time.monotonic() < expires_at and day == trading_date():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+        if entry is not None:
+            self._evicted([value])
+        return None
+
+    def put(self, key, value) -> None:
+        dropped = []
+        with self._lock:
+            previous = self._entries.get(key)
+            if previous is not None and previous[0] is not value:
+                dropped.append(previous[0])
+            self._entries[key] = (value, time.monotonic() + self.ttl, trading_date())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                dropped.append(self._entries.popitem(last=False)[1][0])
+                self.evictions += 1
+        self._evicted(dropped)
+
+    # The cached value, or what factory() returns, cached from now on. Two
+    # callers missing at once may both build it; the later one is kept.
+    def get_or_create(self, key, factory):
+        value = self.get(key)
+        if value is None:
+            value = factory()
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            dropped = [value for value, _, _ in self._entries.values()]
+            self._entries.clear()
+        self._evicted(dropped)
+
+    # Outside the lock, so a slow close does not hold up other lookups
+    def _evicted(self, values: list) -> None:
+        if self.on_evict is None:
+            return
+        for value in values:
+            try:
+                self.on_evict(value)
+            except Exception as e:
+                logging.warning(
+                    "Could not release a value dropped from {}: {}".format(self.name, e)
+                )
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            }
+
+
+def _close(value) -> None:
+    value.close()
+
+
+# The authenticated TDA client; tda-api refreshes its token on its own. A
+# broker dropped from the cache closes its connections.
+CLIENTS = TTLCache("clients", max_entries=2, ttl=1800, on_evict=_close)
+# Candles per (ticker, sessions), as long as HistoryStore serves a stored history
+HISTORY = TTLCache("history", max_entries=32, ttl=900)
+# Option chain sides, only long enough for retries and back-to-back triggers
+CHAINS = TTLCache("chains", max_entries=16, ttl=30)
+CACHES = (CLIENTS, HISTORY, CHAINS)
+
+_invocations = 0
+_invocations_lock = threading.Lock()
+
+
+# Call once per handler invocation; the first one in a container is cold
+def start_invocation() -> dict:
+    global _invocations
+    with _invocations_lock:
+        _invocations += 1
+        return {
+            "container": "cold" if _invocations == 1 else "warm",
+            "invocations": _invocations,
+        }
+
+
+def stats() -> dict:
+    return {cache.name: cache.stats() for cache in CACHES}
+
+
+def clear() -> None:
+    for cache in CACHES:
+        cache.clear()
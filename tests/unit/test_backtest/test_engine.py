@@ -0,0 +1,128 @@
+import time
+import unittest
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from backtest.chain_source import BlackScholesChainSource, ChainSource
+from backtest.engine import Dte1Backtest
+from strategies import dte1_rules
+from utils.common_utils import OptionType
+
+
+class _FlatChainSource(ChainSource):
+    # Every strike is worth the same amount away from the money, so the credit
+    # of any spread is known up front
+    def __init__(self, premium: float):
+        self.premium = premium
+
+    def mid_prices(self, option_type, underlying, strikes, vix, years_to_expiry):
+        distance = np.abs(strikes - underlying)
+        return np.where(distance < 20, self.premium, 0.0)
+
+
+def _history(sessions: int, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    close = 4000 + np.cumsum(rng.normal(0, 30, sessions))
+    open = close - rng.normal(0, 15, sessions)
+    high = np.maximum(open, close) + rng.uniform(0, 20, sessions)
+    low = np.minimum(open, close) - rng.uniform(0, 20, sessions)
+    vix = rng.uniform(12, 35, sessions)
+    dates = np.arange(sessions).astype("datetime64[D]")
+    return dates, open, high, low, close, vix
+
+
+class TestDte1Backtest(unittest.TestCase):
+    def test_signals_match_strategy_rules(self):
+        dates, open, high, low, close, vix = _history(40)
+        result = Dte1Backtest().run(dates, open, high, low, close, vix)
+        for t in range(14, 39):
+            green = 0
+            while green <= t and open[t - green] < close[t - green]:
+                green += 1
+            red = 0
+            while red <= t and close[t - red] < open[t - red]:
+                red += 1
+            expected = (
+                OptionType.CALL
+                if green
+                else OptionType.PUT if red else OptionType.NO_OP
+            )
+            self.assertEqual(result.signal[t], expected.value)
+            if expected == OptionType.NO_OP:
+                continue
+            tables = (
+                dte1_rules.DAYS_IN_ROW_TO_DELTA_WHEN_VIX_GREATER_THAN_20
+                if round(vix[t], 2) > dte1_rules.VIX_THRESHOLD
+                else dte1_rules.DAYS_IN_ROW_TO_DELTA_WHEN_VIX_LESS_THAN_20
+            )[expected]
+            count = green if expected == OptionType.CALL else red
+            multiplier = tables.get(count, tables[-1])
+            atr = np.mean(np.round(high[t - 13 : t + 1] - low[t - 13 : t + 1], 2))
+            rough = (
+                close[t] + (1 if expected == OptionType.CALL else -1) * atr * multiplier
+            )
+            outcomes = result.calls if expected == OptionType.CALL else result.puts
+            self.assertAlmostEqual(outcomes.short_strike[t], round(rough / 5) * 5, 6)
+
+    def test_width_credit_cutoff_and_settlement(self):
+        sessions = 20
+        close = np.full(sessions, 4000.0)
+        open = close - 1
+        close[-2] = 4000.0
+        close[-1] = 4100.0
+        high, low = close + 5, close - 5
+        vix = np.full(sessions, 15.0)
+        dates = np.arange(sessions).astype("datetime64[D]")
+        engine = Dte1Backtest(_FlatChainSource(0.0), buying_power=1000)
+        result = engine.run(dates, open, high, low, close, vix)
+        # A zero mid rounds up to a 0.05 credit, under the minimum
+        self.assertFalse(result.calls.traded.any())
+
+        source = _FlatChainSource(1.0)
+        result = Dte1Backtest(source, buying_power=1000).run(
+            dates, open, high, low, close, vix
+        )
+        self.assertTrue(result.calls.traded[13:-1].all())
+        self.assertFalse(result.calls.traded[-1])
+        self.assertTrue(
+            (result.calls.long_strike - result.calls.short_strike == 10).all()
+        )
+        # The last trade settles 100 points higher, a full loss of the width
+        self.assertAlmostEqual(result.calls.pnl[-2], (1.05 - 10) * 100)
+
+    def test_chain_source_is_abstract(self):
+        with self.assertRaises(TypeError):
+            ChainSource()
+
+    def test_weekend_is_priced_in_calendar_days(self):
+        source = MagicMock(wraps=BlackScholesChainSource())
+        source.strike_interval = 5.0
+        # Thursday, Friday and the Monday after
+        dates = np.array(["2022-03-17", "2022-03-18", "2022-03-21"], "datetime64[D]")
+        close, vix = np.full(3, 4000.0), np.full(3, 20.0)
+        Dte1Backtest(source).run(dates, close - 1, close + 5, close - 5, close, vix)
+        years = source.mid_prices.call_args.args[4]
+        np.testing.assert_allclose(years[:2], np.array([1, 3]) / 365.0)
+
+    def test_iron_condor_trades_both_sides(self):
+        dates, open, high, low, close, vix = _history(60)
+        single = Dte1Backtest().run(dates, open, high, low, close, vix)
+        condor = Dte1Backtest(iron_condor=True).run(dates, open, high, low, close, vix)
+        self.assertGreaterEqual(condor.summary()["trades"], single.summary()["trades"])
+        signalled = condor.signal != OptionType.NO_OP.value
+        for outcomes in (condor.calls, condor.puts):
+            self.assertFalse((outcomes.traded & ~signalled).any())
+            self.assertTrue((outcomes.credit[outcomes.traded] >= 0.10).all())
+        self.assertTrue((condor.calls.traded & condor.puts.traded).any())
+
+    def test_ten_year_replay_is_fast(self):
+        history = _history(2520 * 4)
+        start = time.monotonic()
+        result = Dte1Backtest(BlackScholesChainSource(), iron_condor=True).run(*history)
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertEqual(result.summary()["sessions"], 2520 * 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+
+import numpy as np
+
+from dto.candle import Candle
+from dto.candle_series import CandleSeries
+
+
+class TestCandleSeries(unittest.TestCase):
+    def setUp(self):
+        # Oldest first, as returned by the history APIs
+        self.series = CandleSeries.from_oldest_first(
+            open=[10.0, 11.0, 12.0, 13.0, 12.5],
+            high=[11.5, 12.5, 13.5, 13.25, 13.0],
+            low=[9.5, 10.5, 11.5, 12.004, 11.0],
+            close=[11.0, 12.0, 13.0, 12.5, 11.25],
+        )
+
+    def test_newest_first_view(self):
+        self.assertEqual(len(self.series), 5)
+        self.assertEqual(
+            self.series[0], Candle(open=12.5, close=11.25, high=13.0, low=11.0)
+        )
+        self.assertEqual(self.series[1].low, 12.0)
+        self.assertEqual(len(self.series[:2]), 2)
+        self.assertEqual([candle.close for candle in self.series][-1], 11.0)
+
+    def test_atr_matches_candle_ranges(self):
+        expected = sum(candle.daily_range for candle in self.series) / len(self.series)
+        self.assertAlmostEqual(self.series.atr(), expected)
+        self.assertAlmostEqual(self.series.atr(2), (2.0 + 1.25) / 2)
+
+    def test_wilder_atr(self):
+        period = 3
+        true_ranges = self.series.true_ranges[::-1]
+        expected = true_ranges[:period].mean()
+        for true_range in true_ranges[period:]:
+            expected = (expected * (period - 1) + true_range) / period
+        self.assertAlmostEqual(self.series.wilder_atr(period), expected)
+        self.assertEqual(self.series.true_ranges[0], 2.0)
+
+    def test_streaks(self):
+        self.assertEqual(self.series.red_streak(), 2)
+        self.assertEqual(self.series.green_streak(), 0)
+        self.assertEqual(self.series[2:].green_streak(), 3)
+
+    def test_scales_to_long_history(self):
+        rows = 2520
+        close = np.linspace(100, 200, rows)
+        series = CandleSeries.from_oldest_first(close - 1, close + 2, close - 2, close)
+        self.assertEqual(series.green_streak(), rows)
+        self.assertAlmostEqual(series.atr(14), 4.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
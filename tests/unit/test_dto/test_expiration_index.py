@@ -0,0 +1,55 @@
+import datetime
+import unittest
+
+from dto.expiration_index import ExpirationIndex
+
+
+def _exp_map(days: list) -> dict:
+    return {
+        "{}:{}".format(day.isoformat(), i): {
+            "4100.0": [{"symbol": "SPX_{}".format(day.isoformat())}]
+        }
+        for i, day in enumerate(days)
+    }
+
+
+def _day(day: int) -> datetime.date:
+    return datetime.date(2022, 3, day)
+
+
+class TestExpirationIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = ExpirationIndex()
+        # Out of order, with nothing listed on the 19th and 20th (a weekend)
+        self.index.add(_exp_map([_day(21), _day(17), _day(18)]), _day(17), _day(21))
+
+    def test_dates_are_sorted(self):
+        self.assertEqual(self.index.dates, [_day(17), _day(18), _day(21)])
+        self.assertEqual(self.index.get(_day(18)).contract(0).symbol, "SPX_2022-03-18")
+        self.assertIsNone(self.index.get(_day(19)))
+
+    def test_covers(self):
+        self.assertTrue(self.index.covers(_day(19)))
+        self.assertTrue(self.index.covers(_day(17), _day(21)))
+        self.assertFalse(self.index.covers(_day(16)))
+        self.assertFalse(self.index.covers(_day(21), _day(22)))
+
+    def test_on_or_after(self):
+        self.assertEqual(self.index.on_or_after(_day(17)), _day(17))
+        self.assertEqual(self.index.on_or_after(_day(19)), _day(21))
+        # Not fetched, so what is listed before the 17th is unknown
+        self.assertIsNone(self.index.on_or_after(_day(14)))
+        self.assertIsNone(self.index.on_or_after(_day(22)))
+
+    def test_adjacent_windows_merge(self):
+        self.index.add(_exp_map([_day(22)]), _day(22), _day(22))
+        self.index.add(_exp_map([_day(14)]), _day(14), _day(14))
+        self.assertTrue(self.index.covers(_day(17), _day(22)))
+        self.assertFalse(self.index.covers(_day(14), _day(17)))
+        self.assertEqual(self.index.on_or_after(_day(19)), _day(21))
+        self.assertEqual(self.index.on_or_after(_day(14)), _day(14))
+        self.assertIsNone(self.index.on_or_after(_day(15)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import datetime
+import io
+import json
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from dto.history_fetchers import FallbackFetcher, fetch_yahoo_chart
+
+# 2022-03-14 and 2022-03-15 at the 09:30 New York open, plus a row that is
+# still missing its close
+_CHART = {
+    "chart": {
+        "result": [
+            {
+                "meta": {"gmtoffset": -14400},
+                "timestamp": [1647264600, 1647351000, 1647437400],
+                "indicators": {
+                    "quote": [
+                        {
+                            "open": [4200.1, 4188.8, 4190.0],
+                            "high": [4247.6, 4271.0, 4200.0],
+                            "low": [4161.7, 4187.9, 4180.0],
+                            "close": [4173.1, 4262.4, None],
+                            "volume": [1, 2, 3],
+                        }
+                    ]
+                },
+            }
+        ]
+    }
+}
+
+
+class TestHistoryFetchers(unittest.TestCase):
+    @patch("urllib.request.urlopen")
+    def test_fetch_yahoo_chart(self, urlopen):
+        urlopen.return_value = io.BytesIO(json.dumps(_CHART).encode())
+        history = fetch_yahoo_chart("SPX", datetime.date(2022, 3, 1))
+        self.assertIn("%5EGSPC", urlopen.call_args.args[0].full_url)
+        self.assertEqual(
+            list(history["dates"]),
+            list(np.array(["2022-03-14", "2022-03-15"], dtype="datetime64[D]")),
+        )
+        self.assertEqual(list(history["close"]), [4173.1, 4262.4])
+        self.assertEqual(history["open"].dtype, np.float64)
+
+    def test_fallback(self):
+        def broken(ticker, start):
+            raise OSError("offline")
+
+        fetcher = FallbackFetcher(broken, lambda ticker, start: {"dates": ticker})
+        self.assertEqual(fetcher("SPX", None), {"dates": "SPX"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import datetime
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+from dto.history_fetchers import fetch_yahoo_history
+from dto.history_store import HistoryStore
+
+
+def _frame(start: str, sessions: int, offset: float = 0.0) -> pd.DataFrame:
+    index = pd.bdate_range(start=start, periods=sessions, tz="America/New_York")
+    close = np.arange(sessions, dtype=float) + 100 + offset
+    return pd.DataFrame(
+        {"Open": close - 1, "High": close + 1, "Low": close - 2, "Close": close},
+        index=index,
+    )
+
+
+class TestHistoryStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = HistoryStore(
+            directory=self.directory, max_age=60, fetcher=fetch_yahoo_history
+        )
+        patcher = patch("yfinance.Ticker")
+        self.ticker = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.history = self.ticker.return_value.history
+
+    def test_cold_cache_fetches_and_persists(self):
+        self.history.return_value = _frame("2022-01-03", 30)
+        candles = self.store.candles("SPX", 14)
+        self.assertEqual(len(candles), 14)
+        self.assertEqual(candles[0].close, 129.0)
+        self.assertTrue(os.path.exists(os.path.join(self.directory, "SPX.npz")))
+        self.ticker.assert_called_with("^GSPC")
+
+    def test_fresh_cache_skips_network(self):
+        self.history.return_value = _frame("2022-01-03", 30)
+        self.store.candles("SPX", 14)
+        store = HistoryStore(directory=self.directory, max_age=60, fetcher=None)
+        candles = store.candles("SPX", 20)
+        self.assertEqual(self.history.call_count, 1)
+        self.assertEqual(len(candles), 20)
+
+    def test_stale_cache_tops_up_missing_sessions(self):
+        self.history.return_value = _frame("2022-01-03", 30)
+        self.store.candles("SPX", 14)
+        self.store.max_age = -1
+        # The last stored session is refetched with a revised close
+        self.history.return_value = _frame("2022-02-11", 3, offset=-13)
+        candles = self.store.candles("SPX", 14)
+        start = self.history.call_args.kwargs["start"]
+        self.assertEqual(start, datetime.date(2022, 2, 11).isoformat())
+        self.assertEqual(candles[0].close, 89.0)
+        self.assertEqual(candles[2].close, 87.0)
+        self.assertEqual(candles[3].close, 128.0)
+        self.assertEqual(self.store.rows_fetched, 33)
+
+    def test_corrupt_cache_falls_back_to_fetch(self):
+        with open(os.path.join(self.directory, "SPX.npz"), "wb") as f:
+            f.write(b"not a numpy archive")
+        self.history.return_value = _frame("2022-01-03", 14)
+        self.assertEqual(len(self.store.candles("SPX", 14)), 14)
+
+    def test_unknown_ticker(self):
+        self.history.return_value = _frame("2022-01-03", 0)
+        with self.assertRaises(ValueError):
+            self.store.candles("NOPE", 14)
+
+
+if __name__ == "__main__":
+    unittest.main()
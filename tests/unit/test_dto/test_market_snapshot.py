@@ -0,0 +1,44 @@
+import unittest
+from unittest.mock import MagicMock
+
+from dto.market_snapshot import MarketSnapshot
+
+
+def _quotes(symbols: list) -> dict:
+    return {symbol: {"lastPrice": 10.0 + i} for i, symbol in enumerate(symbols)}
+
+
+class TestMarketSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.broker = MagicMock()
+        self.broker.quotes.side_effect = _quotes
+        self.snapshot = MarketSnapshot(self.broker)
+
+    def test_required_symbols_are_batched(self):
+        self.snapshot.require("$SPX.X", "$NDX.X")
+        self.assertEqual(self.snapshot.vix, 12.0)
+        self.assertEqual(self.snapshot.last_price("$SPX.X"), 11.0)
+        self.assertEqual(self.snapshot.vix, 12.0)
+        self.broker.quotes.assert_called_once_with(["$NDX.X", "$SPX.X", "$VIX.X"])
+        self.assertEqual(
+            self.snapshot.stats(), {"quote_requests": 1, "quoted_symbols": 3}
+        )
+
+    def test_quotes_are_frozen(self):
+        with self.assertRaises(TypeError):
+            self.snapshot.quote("$VIX.X")["lastPrice"] = 50.0
+
+    def test_late_symbol_fetches_only_what_is_missing(self):
+        self.snapshot.vix
+        self.snapshot.last_price("$SPX.X")
+        self.assertEqual(self.broker.quotes.call_args_list[-1].args, (["$SPX.X"],))
+        self.assertEqual(self.broker.quotes.call_count, 2)
+
+    def test_missing_quote(self):
+        self.broker.quotes.side_effect = lambda symbols: {}
+        with self.assertRaises(RuntimeError):
+            self.snapshot.vix
+
+
+if __name__ == "__main__":
+    unittest.main()
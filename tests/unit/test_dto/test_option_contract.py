@@ -0,0 +1,36 @@
+import json
+import os
+import unittest
+
+from dto.option_contract import OptionContract
+
+
+def _contract() -> dict:
+    path = os.path.join(os.path.dirname(__file__), "../common/test_put_map.json")
+    with open(path, "r") as f:
+        return json.load(f)["4100.0"][0]
+
+
+class TestOptionContract(unittest.TestCase):
+    def test_from_tda_keeps_used_fields(self):
+        raw = _contract()
+        contract = OptionContract.from_tda(raw)
+        self.assertEqual(contract.symbol, raw["symbol"])
+        self.assertEqual(contract.put_call, "PUT")
+        self.assertEqual(contract.strike, 4100.0)
+        self.assertEqual(contract.delta, raw["delta"])
+        self.assertEqual(contract.mid, (raw["bid"] + raw["ask"]) / 2.0)
+        self.assertFalse(hasattr(contract, "__dict__"))
+
+    def test_strike_falls_back_to_map_key(self):
+        contract = OptionContract.from_tda({"symbol": "X", "bid": 1, "ask": 2}, 95.0)
+        self.assertEqual(contract.strike, 95.0)
+
+    def test_equality(self):
+        self.assertEqual(
+            OptionContract.from_tda(_contract()), OptionContract.from_tda(_contract())
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
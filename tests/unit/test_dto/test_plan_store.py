@@ -0,0 +1,113 @@
+import datetime
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from botocore.exceptions import ClientError
+
+from dto.plan_store import PlanStore, S3PlanStore
+from dto.trade_plan import TradePlan, plan_key
+from utils.common_utils import OptionType
+
+TRADE_DATE = datetime.date(2022, 3, 17)
+
+
+def _plan(trade_date: str = "2022-03-17") -> TradePlan:
+    return TradePlan(
+        strategy="Dte1IC",
+        ticker="SPX",
+        trade_date=trade_date,
+        expiration_date="2022-03-18",
+        option_type=OptionType.CALL,
+        short_strikes={"CALL": 4150.5, "PUT": 4020.0},
+        buying_power=1000,
+        quantity=2,
+        inputs={"vix": 21.3},
+    )
+
+
+class TestPlanStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = PlanStore(self.directory)
+
+    def test_round_trip(self):
+        self.store.save(TRADE_DATE, [_plan()])
+        plans = self.store.load(TRADE_DATE)
+        self.assertEqual(list(plans), ["Dte1IC:SPX:1000:default"])
+        plan = plans["Dte1IC:SPX:1000:default"]
+        self.assertEqual(plan, _plan())
+        self.assertEqual(plan.short_strike(OptionType.PUT), 4020.0)
+
+    def test_accounts_and_quantities_keep_their_own_plans(self):
+        plans = [
+            _plan(),
+            TradePlan.from_dict(dict(_plan().to_dict(), account_id="123")),
+            TradePlan.from_dict(
+                dict(_plan().to_dict(), quantities={"friday_quantity": 3})
+            ),
+        ]
+        self.store.save(TRADE_DATE, plans)
+        loaded = self.store.load(TRADE_DATE)
+        self.assertEqual(len(loaded), 3)
+        self.assertEqual(
+            loaded[plan_key("Dte1IC", "SPX", 1000, "123")].account_id, "123"
+        )
+        self.assertEqual(
+            loaded[
+                plan_key("Dte1IC", "SPX", 1000, quantities={"friday_quantity": 3})
+            ].quantities,
+            {"friday_quantity": 3},
+        )
+
+    def test_missing_day(self):
+        self.assertEqual(self.store.load(TRADE_DATE), {})
+
+    def test_plans_for_another_day_are_ignored(self):
+        self.store.save(TRADE_DATE, [_plan("2022-03-16")])
+        self.assertEqual(self.store.load(TRADE_DATE), {})
+
+    def test_unreadable_file(self):
+        with open(os.path.join(self.directory, "2022-03-17.json"), "w") as f:
+            f.write("{not json")
+        self.assertEqual(self.store.load(TRADE_DATE), {})
+
+
+class TestS3PlanStore(unittest.TestCase):
+    def setUp(self):
+        self.objects = {}
+        self.client = MagicMock()
+        self.client.put_object.side_effect = self._put
+        self.client.get_object.side_effect = self._get
+        self.store = S3PlanStore("plans-bucket", client=self.client)
+
+    def _put(self, Bucket, Key, Body, **kwargs):
+        self.objects[(Bucket, Key)] = Body
+
+    def _get(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise ClientError(
+                {"Error": {"Code": "NoSuchKey", "Message": "missing"}}, "GetObject"
+            )
+        body = MagicMock()
+        body.read.return_value = self.objects[(Bucket, Key)]
+        return {"Body": body}
+
+    def test_round_trip(self):
+        location = self.store.save(TRADE_DATE, [_plan()])
+        self.assertEqual(location, "s3://plans-bucket/trade_plans/2022-03-17.json")
+        self.assertEqual(self.store.load(TRADE_DATE), {_plan().key: _plan()})
+
+    def test_missing_day(self):
+        self.assertEqual(self.store.load(TRADE_DATE), {})
+
+    def test_unreachable_bucket(self):
+        self.client.get_object.side_effect = ClientError(
+            {"Error": {"Code": "AccessDenied", "Message": "denied"}}, "GetObject"
+        )
+        self.assertEqual(self.store.load(TRADE_DATE), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
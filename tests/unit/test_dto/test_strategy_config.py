@@ -0,0 +1,52 @@
+import unittest
+
+from dto.data_needs import DataNeeds
+from dto.strategy_config import StrategyConfig
+from utils.common_utils import OrderType
+
+
+class TestStrategyConfig(unittest.TestCase):
+    def test_from_dict(self):
+        config = StrategyConfig.from_dict(
+            {
+                "strategy": "Dte1IC",
+                "ticker": "NDX",
+                "order_type": "DEBIT",
+                "account_id": "456",
+                "single_order": False,
+            }
+        )
+        self.assertEqual(config.ticker, "NDX")
+        self.assertEqual(config.order_type, OrderType.DEBIT)
+        self.assertEqual(config.buying_power, 500)
+        self.assertEqual(config.account_id, "456")
+        self.assertEqual(config.options, {"single_order": False})
+
+    def test_order_type_by_value(self):
+        config = StrategyConfig.from_dict(
+            {"strategy": "Dte1", "order_type": "NET_CREDIT"}
+        )
+        self.assertEqual(config.order_type, OrderType.CREDIT)
+
+    def test_missing_strategy(self):
+        with self.assertRaises(ValueError):
+            StrategyConfig.from_dict({"ticker": "SPX"})
+
+
+class TestDataNeeds(unittest.TestCase):
+    def test_update_merges(self):
+        needs = DataNeeds(history={"SPX": 14}, quotes={"$VIX.X"})
+        needs.update(
+            DataNeeds(
+                history={"SPX": 30, "NDX": 14},
+                quotes={"$VIX.X", "$NDX.X"},
+                chains={("NDX", "2022-03-17")},
+            )
+        )
+        self.assertEqual(needs.history, {"SPX": 30, "NDX": 14})
+        self.assertEqual(needs.quotes, {"$VIX.X", "$NDX.X"})
+        self.assertEqual(needs.chains, {("NDX", "2022-03-17")})
+
+
+if __name__ == "__main__":
+    unittest.main()
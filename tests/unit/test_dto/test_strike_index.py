@@ -0,0 +1,49 @@
+import unittest
+
+from dto.strike_index import StrikeIndex
+
+
+def _option_map(strikes: list) -> dict:
+    return {str(strike): [{"symbol": "SYM{}".format(strike)}] for strike in strikes}
+
+
+class TestStrikeIndex(unittest.TestCase):
+    def setUp(self):
+        # Crosses a digit boundary, which breaks a lexicographic sort
+        self.index = StrikeIndex.from_option_map(
+            _option_map([1010.0, 990.0, 995.0, 1000.0, 1005.0, 985.0, 1020.0])
+        )
+
+    def test_strikes_are_sorted_numerically(self):
+        self.assertEqual(
+            list(self.index.strikes),
+            [985.0, 990.0, 995.0, 1000.0, 1005.0, 1010.0, 1020.0],
+        )
+        self.assertEqual(self.index.contract(3).symbol, "SYM1000.0")
+
+    def test_nearest(self):
+        self.assertEqual(self.index.strike(self.index.nearest(998.9)), 1000.0)
+        self.assertEqual(self.index.strike(self.index.nearest(997.5)), 995.0)
+        self.assertEqual(self.index.strike(self.index.nearest(0)), 985.0)
+        self.assertEqual(self.index.strike(self.index.nearest(5000)), 1020.0)
+
+    def test_covers(self):
+        self.assertTrue(self.index.covers(985.0, 1020.0))
+        self.assertFalse(self.index.covers(980.0, 1000.0))
+        self.assertFalse(self.index.covers(1000.0, 1025.0))
+        self.assertFalse(StrikeIndex([]).covers(100, 100))
+
+    def test_offset(self):
+        short = self.index.nearest(1000)
+        self.assertEqual(self.index.strike(self.index.offset(short, 10, 1)), 1010.0)
+        self.assertEqual(self.index.strike(self.index.offset(short, 15, 1)), 1010.0)
+        self.assertEqual(self.index.strike(self.index.offset(short, 10, -1)), 990.0)
+        self.assertEqual(self.index.strike(self.index.offset(short, 7, -1)), 995.0)
+        self.assertEqual(self.index.offset(short, 0, 1), short)
+
+    def test_empty(self):
+        self.assertEqual(StrikeIndex([]).nearest(100), -1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,173 @@
+import datetime
+import json
+import os
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+from factories.chain_cache import ChainCache
+from utils.common_utils import OptionType
+from utils.warm_cache import TTLCache
+
+EXPIRATION = "2022-03-14"
+
+
+def _load(name: str) -> dict:
+    with open(os.path.join(os.path.dirname(__file__), "../common", name), "r") as f:
+        return json.load(f)
+
+
+def _get_chain() -> dict:
+    key = EXPIRATION + ":0"
+    return {
+        "status": "SUCCESS",
+        "putExpDateMap": {key: _load("test_put_map.json")},
+        "callExpDateMap": {key: _load("test_call_map.json")},
+    }
+
+
+class TestChainCache(unittest.TestCase):
+    def setUp(self):
+        self.broker = MagicMock()
+        self.broker.option_chain.return_value = _get_chain()
+        self.cache = ChainCache(self.broker, strike_count=20)
+
+    def test_request_is_narrowed(self):
+        put_map, call_map = self.cache.get("SPX", EXPIRATION)
+        self.assertIn(4100.0, put_map.strikes)
+        self.assertEqual(call_map.contract(call_map.nearest(4100)).put_call, "CALL")
+        expiration = datetime.date(2022, 3, 14)
+        self.broker.option_chain.assert_called_once_with(
+            "$SPX.X",
+            option_type=None,
+            from_date=expiration,
+            to_date=expiration,
+            strike_count=20,
+        )
+
+    def test_chain_is_fetched_once(self):
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(
+                executor.map(lambda _: self.cache.get("SPX", EXPIRATION), range(8))
+            )
+        self.assertEqual(self.broker.option_chain.call_count, 1)
+        self.assertTrue(all(result[0] is results[0][0] for result in results))
+        self.assertEqual(self.cache.stats(), {"chain_hits": 7, "chain_misses": 1})
+
+    def test_single_side(self):
+        self.broker.option_chain.return_value = {
+            "callExpDateMap": _get_chain()["callExpDateMap"]
+        }
+        put_map, call_map = self.cache.get("SPX", EXPIRATION, OptionType.CALL)
+        self.assertIsNone(put_map)
+        self.assertIn(4100.0, call_map.strikes)
+        self.assertEqual(
+            self.broker.option_chain.call_args.kwargs["option_type"], OptionType.CALL
+        )
+        self.cache.get("SPX", EXPIRATION, OptionType.CALL)
+        self.assertEqual(self.cache.stats(), {"chain_hits": 1, "chain_misses": 1})
+
+    def test_failed_status(self):
+        self.broker.option_chain.return_value = {"status": "FAILED"}
+        with self.assertRaises(RuntimeError):
+            self.cache.get("SPX", EXPIRATION)
+
+    def test_shared_snapshot_serves_the_next_invocation(self):
+        shared = TTLCache("chains", max_entries=4, ttl=30)
+        put_map, _ = ChainCache(self.broker, shared=shared).get("SPX", EXPIRATION)
+        later = ChainCache(self.broker, shared=shared)
+        self.assertIs(later.get("SPX", EXPIRATION)[0], put_map)
+        self.assertEqual(self.broker.option_chain.call_count, 1)
+        self.assertEqual(later.stats(), {"chain_hits": 1, "chain_misses": 0})
+
+    def test_range_serves_every_expiration_in_it(self):
+        chain = _get_chain()
+        for name in ("putExpDateMap", "callExpDateMap"):
+            strikes = chain[name][EXPIRATION + ":0"]
+            chain[name] = {"2022-03-14:0": strikes, "2022-03-16:2": strikes}
+        self.broker.option_chain.return_value = chain
+        monday, friday = datetime.date(2022, 3, 14), datetime.date(2022, 3, 18)
+        put_index, call_index = self.cache.load("SPX", monday, friday)
+        self.assertEqual(put_index.dates, [monday, datetime.date(2022, 3, 16)])
+        self.assertIn(4100.0, self.cache.get("SPX", "2022-03-16")[1].strikes)
+        # Listed nothing on the 15th, which is known without asking again
+        self.assertEqual(self.cache.get("SPX", "2022-03-15"), (None, None))
+        self.assertEqual(
+            self.cache.nearest_expiration("SPX", datetime.date(2022, 3, 15)),
+            "2022-03-16",
+        )
+        self.assertEqual(self.broker.option_chain.call_count, 1)
+        self.assertEqual(self.broker.option_chain.call_args.kwargs["to_date"], friday)
+
+    def test_nearest_expiration_looks_ahead(self):
+        self.assertEqual(
+            self.cache.nearest_expiration("SPX", datetime.date(2022, 3, 12)),
+            EXPIRATION,
+        )
+        kwargs = self.broker.option_chain.call_args.kwargs
+        self.assertEqual(kwargs["from_date"], datetime.date(2022, 3, 12))
+        self.assertEqual(kwargs["to_date"], datetime.date(2022, 3, 19))
+        self.broker.option_chain.return_value = {"status": "SUCCESS"}
+        self.assertIsNone(
+            self.cache.nearest_expiration("SPX", datetime.date(2022, 3, 20))
+        )
+
+    def test_underlying_price_comes_with_the_chain(self):
+        self.assertIsNone(self.cache.underlying_price("SPX"))
+        self.broker.option_chain.return_value = dict(
+            _get_chain(), underlyingPrice=4105.5
+        )
+        self.cache.get("SPX", EXPIRATION)
+        self.assertEqual(self.cache.underlying_price("SPX"), 4105.5)
+
+    def test_widen_fetches_more_strikes(self):
+        put_map, _ = self.cache.get("SPX", EXPIRATION)
+        # Already reached, nothing to fetch
+        self.assertIs(
+            self.cache.widen("SPX", EXPIRATION, OptionType.PUT, 4000, 4100), put_map
+        )
+        self.assertEqual(self.broker.option_chain.call_count, 1)
+        wider = _get_chain()
+        strikes = wider["putExpDateMap"][EXPIRATION + ":0"]
+        strikes["6000.0"] = [dict(strikes["5600.0"][0], strikePrice=6000.0)]
+        self.broker.option_chain.return_value = wider
+        widened = self.cache.widen("SPX", EXPIRATION, OptionType.PUT, 5900, 6000)
+        self.assertIn(6000.0, widened.strikes)
+        kwargs = self.broker.option_chain.call_args.kwargs
+        self.assertEqual(kwargs["option_type"], OptionType.PUT)
+        self.assertEqual(kwargs["strike_count"], 2 * len(put_map))
+        # Later lookups get the wider strikes
+        self.assertIs(self.cache.get("SPX", EXPIRATION)[0], widened)
+
+    def test_widen_stops_at_the_limit(self):
+        self.cache.get("SPX", EXPIRATION)
+        put_map = self.cache.widen("SPX", EXPIRATION, OptionType.PUT, 5900, 6000)
+        self.assertFalse(put_map.covers(5900, 6000))
+        self.assertEqual(
+            [
+                call.kwargs["strike_count"]
+                for call in self.broker.option_chain.call_args_list
+            ],
+            [20, 346, ChainCache.MAX_STRIKE_COUNT],
+        )
+
+    def test_windows(self):
+        self.assertEqual(
+            ChainCache.windows(
+                {
+                    ("SPX", "2022-03-18"),
+                    ("SPX", "2022-03-14"),
+                    ("SPX", "2022-03-31"),
+                    ("NDX", "2022-03-14"),
+                }
+            ),
+            [
+                ("NDX", datetime.date(2022, 3, 14), datetime.date(2022, 3, 14)),
+                ("SPX", datetime.date(2022, 3, 14), datetime.date(2022, 3, 18)),
+                ("SPX", datetime.date(2022, 3, 31), datetime.date(2022, 3, 31)),
+            ],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,8 +3,15 @@ import unittest
 import datetime
 import json
 from unittest.mock import MagicMock, patch
+
+import numpy as np
+from pytz import timezone
+
+from utils import black_scholes
 from utils.common_utils import OrderType, OptionType, Instruction
+from dto.option_contract import OptionContract
 from dto.options import OptionLeg, VerticalSpread
+from dto.strike_index import StrikeIndex
 from factories.option_factory import OptionFactory
 
 
@@ -38,7 +45,7 @@ def get_leg(strike: str, option_type: OptionType, instruction: Instruction):
         instruction=instruction,
         quantity=1,
         symbol=option_map[strike][0]["symbol"],
-        metadata=option_map[strike][0],
+        metadata=OptionContract.from_tda(option_map[strike][0]),
     )
 
 
@@ -46,12 +53,18 @@ class TestOptionFactory(unittest.TestCase):
     @patch.multiple(
         "factories.option_factory.OptionFactory",
         _get_put_and_call_maps=MagicMock(
-            return_value=(_get_put_map(), _get_call_map())
+            return_value=(
+                StrikeIndex.from_option_map(_get_put_map()),
+                StrikeIndex.from_option_map(_get_call_map()),
+            )
         ),
     )
+    @patch("factories.option_factory.Stock", MagicMock())
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.option_factory = OptionFactory(TICKER, QUANTITY, ORDER_TYPE, EXPIRATION)
+        self.option_factory = OptionFactory(
+            TICKER, QUANTITY, ORDER_TYPE, EXPIRATION, broker=MagicMock()
+        )
 
     def test_get_legs_for_vertical_spread(self):
         rough_strike = 4101.1234
@@ -61,15 +74,15 @@ class TestOptionFactory(unittest.TestCase):
         short_leg, long_leg = self.option_factory._get_legs_for_vertical_spread(
             rough_strike, width, option_type
         )
-        self.assertEqual(short_leg.metadata["symbol"][-4:], "4100")
-        self.assertEqual(long_leg.metadata["symbol"][-4:], str(4100 - width // 100))
+        self.assertEqual(short_leg.metadata.symbol[-4:], "4100")
+        self.assertEqual(long_leg.metadata.symbol[-4:], str(4100 - width // 100))
         # Test Call
         option_type = OptionType.CALL
         short_leg, long_leg = self.option_factory._get_legs_for_vertical_spread(
             rough_strike, width, option_type
         )
-        self.assertEqual(short_leg.metadata["symbol"][-4:], "4100")
-        self.assertEqual(long_leg.metadata["symbol"][-4:], str(4100 + width // 100))
+        self.assertEqual(short_leg.metadata.symbol[-4:], "4100")
+        self.assertEqual(long_leg.metadata.symbol[-4:], str(4100 + width // 100))
 
     def test_calculate_price_for_vertical_spread(self):
         # Calls
@@ -133,3 +146,133 @@ class TestOptionFactory(unittest.TestCase):
             price=1.15,
         )
         self.assertEqual(actual_vertical_spread, expected_vertical_spread)
+
+
+class TestOptionFactoryModel(unittest.TestCase):
+    NOW = timezone("US/Eastern").localize(datetime.datetime(2022, 4, 22, 10))
+    VIX = 20.0
+    UNDERLYING = 4100.0
+
+    def setUp(self):
+        strikes = np.arange(3900.0, 4105.0, 5.0)
+        years = black_scholes.years_to_expiration(self.NOW, EXPIRATION.date())
+        values = black_scholes.price(
+            OptionType.PUT,
+            self.UNDERLYING,
+            strikes,
+            years,
+            black_scholes.sigma_from_vix(self.VIX),
+        )
+        contracts = [
+            OptionContract(
+                "SPX_P{:.0f}".format(strike), "PUT", strike, value - 0.05, value + 0.05
+            )
+            for strike, value in zip(strikes, values)
+        ]
+        # Before the open: no bid and a placeholder ask
+        contracts[-3].bid, contracts[-3].ask = 0.0, 50.0
+        self.values = dict(zip(strikes, values))
+        put_index = StrikeIndex(contracts)
+        patchers = [
+            patch.object(
+                OptionFactory,
+                "_get_put_and_call_maps",
+                MagicMock(return_value=(put_index, put_index)),
+            ),
+            patch("factories.option_factory.clock.now", return_value=self.NOW),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.option_factory = OptionFactory(
+            TICKER,
+            QUANTITY,
+            ORDER_TYPE,
+            EXPIRATION,
+            broker=MagicMock(),
+            vix=self.VIX,
+            underlying_price=self.UNDERLYING,
+        )
+
+    def test_model_values(self):
+        values = self.option_factory.model_values(OptionType.PUT)
+        self.assertEqual(len(values["value"]), 41)
+        self.assertEqual(np.flatnonzero(~values["trusted"]).tolist(), [38])
+        self.assertTrue(np.all((values["delta"] < 0) & (values["delta"] > -1)))
+        # Quotes centred on the model price imply the VIX volatility
+        implied = values["implied_vol"][values["trusted"]]
+        solved = implied[~np.isnan(implied)]
+        self.assertTrue(len(solved) > 10)
+        np.testing.assert_allclose(solved, self.VIX / 100, atol=1e-4)
+        self.assertIs(self.option_factory.model_values(OptionType.PUT), values)
+
+    def test_untrusted_quote_is_priced_from_the_model(self):
+        with self.assertLogs(level="WARNING") as logs:
+            spread = self.option_factory.get_vertical_spread(
+                short_leg_strike=4090, buying_power=500, option_type=OptionType.PUT
+            )
+        self.assertIn("model value", logs.output[0])
+        model_credit = self.values[4090.0] - self.values[4085.0]
+        self.assertAlmostEqual(spread.price, model_credit, delta=0.1)
+
+    def test_model_priced_legs_are_recorded_on_the_span(self):
+        with patch("factories.option_factory.metrics.span") as span:
+            with self.assertLogs(level="WARNING"):
+                self.option_factory.get_vertical_spread(
+                    short_leg_strike=4090, buying_power=500, option_type=OptionType.PUT
+                )
+        span.return_value.__enter__.return_value.annotate.assert_called_once_with(
+            model_priced_legs=["SPX_P4090"]
+        )
+
+    def test_model_is_off_without_inputs(self):
+        self.option_factory.vix = None
+        self.assertIsNone(self.option_factory.model_values(OptionType.PUT))
+        spread = self.option_factory.get_vertical_spread(
+            short_leg_strike=4090, buying_power=500, option_type=OptionType.PUT
+        )
+        # Priced from the raw mid of the 0/50 quote
+        self.assertEqual(
+            spread.price,
+            round(int((25.0 - spread.long_leg.metadata.mid) / 0.05) * 0.05 + 0.05, 2),
+        )
+
+    def test_strikes_outside_the_chain_are_fetched(self):
+        wider = StrikeIndex(
+            [
+                OptionContract("SPX_C{:.0f}".format(strike), "CALL", strike, 1.0, 1.1)
+                for strike in np.arange(4000.0, 4205.0, 5.0)
+            ]
+        )
+        chain_cache = MagicMock()
+        chain_cache.widen.return_value = wider
+        self.option_factory._chain_cache = chain_cache
+        spread = self.option_factory.get_vertical_spread(
+            short_leg_strike=4100, buying_power=1000, option_type=OptionType.CALL
+        )
+        chain_cache.widen.assert_called_once_with(
+            TICKER, "2022-04-25", OptionType.CALL, 4100, 4110.0
+        )
+        self.assertEqual(spread.long_leg.metadata.strike, 4110.0)
+        self.assertIs(self.option_factory.call_map, wider)
+
+    def test_strikes_never_reached_raise(self):
+        chain_cache = MagicMock()
+        chain_cache.widen.return_value = self.option_factory.call_map
+        self.option_factory._chain_cache = chain_cache
+        with self.assertRaises(RuntimeError):
+            self.option_factory.get_vertical_spread(
+                short_leg_strike=4100, buying_power=1000, option_type=OptionType.CALL
+            )
+
+    def test_far_mid_is_logged(self):
+        short_leg = self.option_factory._get_legs_for_vertical_spread(
+            4050, 500, OptionType.PUT
+        )[0]
+        short_leg.metadata.bid += 3.0
+        short_leg.metadata.ask += 3.0
+        with self.assertLogs(level="WARNING") as logs:
+            self.option_factory.get_vertical_spread(
+                short_leg_strike=4050, buying_power=500, option_type=OptionType.PUT
+            )
+        self.assertIn("far from its model price", logs.output[0])
@@ -0,0 +1,232 @@
+import datetime
+import unittest
+from unittest.mock import MagicMock
+
+import numpy as np
+from pytz import timezone
+
+from monitor import PositionMonitor, exit_reasons, pair_spreads, parse_option_symbol
+from utils import clock
+from utils.common_utils import ExitReason, Instruction, OptionType, OrderType
+
+
+def _position(symbol: str, short: int = 0, long: int = 0, price: float = 1.0):
+    return {
+        "shortQuantity": float(short),
+        "longQuantity": float(long),
+        "averagePrice": price,
+        "instrument": {
+            "assetType": "OPTION",
+            "symbol": symbol,
+            "underlyingSymbol": "$SPX.X",
+        },
+    }
+
+
+POSITIONS = [
+    _position("SPXW_031722P4050", short=2, price=3.0),
+    _position("SPXW_031722P4040", long=2, price=1.8),
+    _position("SPXW_031722C4150", short=1, price=2.5),
+    _position("SPXW_031722C4160", long=1, price=1.5),
+    {
+        "shortQuantity": 0.0,
+        "longQuantity": 10.0,
+        "instrument": {"assetType": "EQUITY", "symbol": "SPY"},
+    },
+]
+
+
+def _quote(bid: float = None, ask: float = None, last: float = None) -> dict:
+    return {"bidPrice": bid, "askPrice": ask, "lastPrice": last}
+
+
+class TestPairing(unittest.TestCase):
+    def test_parse_option_symbol(self):
+        self.assertEqual(
+            parse_option_symbol("SPXW_031722P4050"),
+            ("2022-03-17", OptionType.PUT, 4050.0),
+        )
+        self.assertEqual(
+            parse_option_symbol("SPY_031722C412.5")[1:], (OptionType.CALL, 412.5)
+        )
+        with self.assertRaises(ValueError):
+            parse_option_symbol("SPY")
+
+    def test_pairs_shorts_with_protective_longs(self):
+        spreads = {spread.option_type: spread for spread in pair_spreads(POSITIONS)}
+        self.assertEqual(len(spreads), 2)
+        put = spreads[OptionType.PUT]
+        self.assertEqual(put.short_leg.symbol, "SPXW_031722P4050")
+        self.assertEqual(put.long_leg.symbol, "SPXW_031722P4040")
+        self.assertEqual(put.quantity, 2)
+        self.assertEqual(put.credit, 1.2)
+        self.assertEqual(put.width, 10.0)
+        self.assertEqual(spreads[OptionType.CALL].long_leg.symbol, "SPXW_031722C4160")
+
+    def test_unprotected_short_is_not_a_spread(self):
+        self.assertEqual(
+            pair_spreads(
+                [
+                    _position("SPXW_031722P4050", short=1),
+                    _position("SPXW_031722P4060", long=1),
+                ]
+            ),
+            [],
+        )
+
+
+class TestExitReasons(unittest.TestCase):
+    def test_vectorized_rules(self):
+        reasons = exit_reasons(
+            credit=np.array([1.0, 1.0, 1.0, 1.0]),
+            cost_to_close=np.array([0.4, 2.5, 0.8, 0.4]),
+            short_strike=np.array([4050.0, 4050.0, 4050.0, 4150.0]),
+            underlying=np.array([4100.0, 4100.0, 4100.0, 4150.0]),
+            direction=np.array([-1, -1, -1, 1]),
+            profit_target=0.5,
+            stop_loss=2.0,
+            strike_buffer=0.0,
+        )
+        self.assertEqual(
+            reasons.tolist(),
+            [
+                ExitReason.PROFIT_TARGET.value,
+                ExitReason.STOP_LOSS.value,
+                ExitReason.HOLD.value,
+                ExitReason.SHORT_STRIKE_THREATENED.value,
+            ],
+        )
+
+
+# A Wednesday, during regular hours
+OPEN = timezone("US/Eastern").localize(datetime.datetime(2022, 3, 16, 11))
+
+
+class TestPositionMonitor(unittest.TestCase):
+    def setUp(self):
+        clock.freeze(OPEN)
+        self.addCleanup(clock.unfreeze)
+        self.broker = MagicMock()
+        self.broker.positions.return_value = POSITIONS
+        self.broker.quotes.return_value = {
+            "$SPX.X": _quote(last=4100.0),
+            "SPXW_031722P4050": _quote(bid=0.5, ask=0.6),
+            "SPXW_031722P4040": _quote(bid=0.1, ask=0.2),
+            "SPXW_031722C4150": _quote(bid=1.1, ask=1.2),
+            "SPXW_031722C4160": _quote(bid=0.4, ask=0.5),
+        }
+        self.broker.open_orders.return_value = []
+        self.broker.place_option_spread_order.return_value = {"code": "ok"}
+
+    def test_closes_spreads_that_hit_a_rule(self):
+        report = PositionMonitor(self.broker).run(cycles=1)
+        # One batched quote request for every leg and the underlying
+        self.broker.quotes.assert_called_once_with(
+            [
+                "$SPX.X",
+                "SPXW_031722C4150",
+                "SPXW_031722C4160",
+                "SPXW_031722P4040",
+                "SPXW_031722P4050",
+            ]
+        )
+        self.assertEqual(report["open"], 2)
+        self.assertEqual(report["closing"], [])
+        self.broker.open_orders.assert_called_once_with()
+        self.assertEqual(report["requests"], 4)
+        self.assertEqual(
+            report["closed"],
+            [
+                {
+                    "symbol": "SPXW_031722P4050",
+                    "reason": ExitReason.PROFIT_TARGET.value,
+                    "price": 0.5,
+                    "response": {"code": "ok"},
+                }
+            ],
+        )
+        kwargs = self.broker.place_option_spread_order.call_args.kwargs
+        self.assertEqual(kwargs["order_type"], OrderType.DEBIT)
+        self.assertEqual(kwargs["short_leg"].instruction, Instruction.BUY_TO_CLOSE)
+        self.assertEqual(kwargs["long_leg"].instruction, Instruction.SELL_TO_CLOSE)
+        self.assertEqual(kwargs["short_leg"].quantity, 2)
+
+    def test_spread_with_a_working_close_is_not_closed_again(self):
+        self.broker.open_orders.return_value = [
+            {
+                "status": "WORKING",
+                "orderLegCollection": [
+                    {
+                        "instruction": "BUY_TO_CLOSE",
+                        "instrument": {"symbol": "SPXW_031722P4050"},
+                    },
+                    {
+                        "instruction": "SELL_TO_CLOSE",
+                        "instrument": {"symbol": "SPXW_031722P4040"},
+                    },
+                ],
+            }
+        ]
+        report = PositionMonitor(self.broker).run(cycles=2)
+        self.assertEqual(report["closing"], ["SPXW_031722P4050"])
+        self.assertEqual(report["closed"], [])
+        self.broker.place_option_spread_order.assert_not_called()
+        # Only the call spread is still watched
+        self.assertNotIn("SPXW_031722P4050", self.broker.quotes.call_args.args[0])
+
+    def test_opening_orders_do_not_block_a_close(self):
+        self.broker.open_orders.return_value = [
+            {
+                "status": "WORKING",
+                "orderLegCollection": [
+                    {
+                        "instruction": "SELL_TO_OPEN",
+                        "instrument": {"symbol": "SPXW_031722P4050"},
+                    }
+                ],
+            }
+        ]
+        report = PositionMonitor(self.broker).run(cycles=1)
+        self.assertEqual(len(report["closed"]), 1)
+
+    def test_missing_quote_holds(self):
+        del self.broker.quotes.return_value["SPXW_031722P4050"]
+        report = PositionMonitor(self.broker).run(cycles=1)
+        self.assertEqual(report["closed"], [])
+        self.assertEqual(report["unquoted"], ["SPXW_031722P4050"])
+
+    def test_one_sided_quotes_are_not_traded_on(self):
+        # Before the open: no bid on the long leg and a placeholder ask on the
+        # short leg, which would otherwise read as a stop loss
+        quotes = self.broker.quotes.return_value
+        quotes["SPXW_031722P4050"] = _quote(bid=0.0, ask=50.0)
+        quotes["SPXW_031722P4040"] = _quote(ask=0.2)
+        report = PositionMonitor(self.broker).run(cycles=1)
+        self.assertEqual(report["closed"], [])
+        self.assertEqual(report["unquoted"], ["SPXW_031722P4050"])
+        self.broker.place_option_spread_order.assert_not_called()
+
+    def test_cycles_outside_market_hours_are_skipped(self):
+        clock.freeze(OPEN.replace(hour=9))
+        report = PositionMonitor(self.broker).run(cycles=2)
+        self.assertEqual(report["skipped_cycles"], 2)
+        self.assertEqual(report["cycles"], 0)
+        self.broker.quotes.assert_not_called()
+        self.broker.place_option_spread_order.assert_not_called()
+
+    def test_request_budget(self):
+        self.broker.quotes.return_value["SPXW_031722P4050"] = _quote(bid=0.5, ask=0.6)
+        report = PositionMonitor(self.broker, request_budget=2).run(cycles=3)
+        self.assertTrue(report["budget_exhausted"])
+        self.assertEqual(report["requests"], 2)
+        self.broker.place_option_spread_order.assert_not_called()
+
+    def test_stops_when_nothing_is_open(self):
+        self.broker.positions.return_value = []
+        report = PositionMonitor(self.broker).run(cycles=5)
+        self.assertEqual(report["cycles"], 0)
+        self.broker.quotes.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
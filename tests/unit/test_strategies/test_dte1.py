@@ -0,0 +1,74 @@
+import datetime
+import unittest
+from unittest.mock import MagicMock, patch
+
+from dto.strategy_config import StrategyConfig
+from strategies.dte1 import Dte1
+from strategies.dte1_ic import Dte1IC
+from utils.common_utils import OptionType
+
+# Thursday, so the plan is for an order that expires on Friday
+TRADE_DATE = datetime.date(2022, 3, 17)
+
+
+def _stock(green_days: int, red_days: int) -> MagicMock:
+    stock = MagicMock()
+    stock.atr = 50.0
+    stock.candles.green_streak.return_value = green_days
+    stock.candles.red_streak.return_value = red_days
+    stock.candles.__getitem__.return_value.close = 4100.0
+    return stock
+
+
+class TestDte1Plan(unittest.TestCase):
+    def _plan(self, strategy: type, stock: MagicMock, **options):
+        snapshot = MagicMock()
+        snapshot.vix = 25.0
+        config = StrategyConfig(
+            strategy=strategy.__name__,
+            ticker="SPX",
+            buying_power=1000,
+            options=options,
+        )
+        with patch("strategies.dte1.Stock", return_value=stock):
+            return strategy.plan(config, TRADE_DATE, snapshot, MagicMock())
+
+    def test_plan_matches_live_decision(self):
+        plan = self._plan(Dte1, _stock(green_days=2, red_days=0), friday_quantity=3)
+        self.assertEqual(plan.option_type, OptionType.CALL)
+        # Two green days with VIX above 20 move the short call 1.4 ATR out
+        self.assertEqual(plan.short_strikes, {"CALL": 4100.0 + 50.0 * 1.4})
+        self.assertEqual(plan.expiration_date, "2022-03-18")
+        self.assertEqual(plan.quantity, 3)
+        self.assertEqual(plan.buying_power, 1000)
+        self.assertEqual(plan.inputs["vix"], 25.0)
+
+    def test_friday_plan_expires_monday(self):
+        snapshot = MagicMock()
+        snapshot.vix = 15.0
+        config = StrategyConfig(strategy="Dte1", ticker="SPX")
+        with patch("strategies.dte1.Stock", return_value=_stock(0, 1)):
+            plan = Dte1.plan(config, datetime.date(2022, 3, 18), snapshot, None)
+        self.assertEqual(plan.expiration_date, "2022-03-21")
+        self.assertEqual(plan.option_type, OptionType.PUT)
+
+    def test_iron_condor_plans_both_sides(self):
+        plan = self._plan(Dte1IC, _stock(green_days=0, red_days=1))
+        self.assertEqual(plan.option_type, OptionType.PUT)
+        self.assertEqual(
+            plan.short_strikes,
+            {"PUT": 4100.0 - 50.0 * 1.8, "CALL": 4100.0 + 50.0 * 2.0},
+        )
+
+
+
+class TestDte1DataNeeds(unittest.TestCase):
+    def test_only_vix_is_quoted(self):
+        # The underlying's quote would go unread: strikes come from the close
+        needs = Dte1.data_needs("SPX")
+        self.assertEqual(needs.quotes, {"$VIX.X"})
+        self.assertEqual(set(needs.history), {"SPX"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,207 @@
+import datetime
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+import numpy as np
+from pytz import timezone
+
+from dto.history_store import HistoryStore
+from dto.options import OptionLeg, VerticalSpread
+from strategies import dte1_rules
+from strategies.dte1_ic import Dte1IC
+from strategies.strategy import StrategyCancelled
+from tda_api.broker import Broker
+from utils import clock
+from utils.common_utils import AssetType, Instruction, OptionType, OrderType
+
+
+def _spread(option_type: OptionType, short: float, long: float, price: float):
+    def leg(strike: float, instruction: Instruction) -> OptionLeg:
+        symbol = "SPX_031722{}{}".format(option_type.value[0], int(strike))
+        return OptionLeg(symbol, instruction, 1, {"strikePrice": strike})
+
+    return VerticalSpread(
+        order_type=OrderType.CREDIT,
+        quantity=1,
+        expiration_date="2022-03-17",
+        short_leg=leg(short, Instruction.SELL_TO_OPEN),
+        long_leg=leg(long, Instruction.BUY_TO_OPEN),
+        price=price,
+    )
+
+
+# Wednesday morning, so the order expires on Thursday
+NOW = timezone("US/Eastern").localize(datetime.datetime(2022, 3, 16, 10))
+EXPIRATION = "2022-03-17"
+CLOSE = 4100.0
+
+
+def _history(ticker: str, start: datetime.date) -> dict:
+    # Flat closes 40 points inside each day's range, green only on the last
+    # day, so ATR is 40 and the main side is the call
+    sessions = 30
+    close = np.full(sessions, CLOSE)
+    open_ = close.copy()
+    open_[-1] -= 10
+    return {
+        "dates": np.arange(
+            np.datetime64("2022-01-01"), np.datetime64("2022-01-01") + sessions
+        ),
+        "open": open_,
+        "high": close + 20,
+        "low": close - 20,
+        "close": close,
+    }
+
+
+def _option_map(option_type: OptionType) -> dict:
+    option_map = {}
+    for strike in np.arange(3900.0, 4305.0, 5.0):
+        mid = 40 * np.exp(-abs(strike - CLOSE) / 40)
+        option_map["{:.1f}".format(strike)] = [
+            {
+                "putCall": option_type.value,
+                "symbol": "SPXW_031722{}{:.0f}".format(option_type.value[0], strike),
+                "strikePrice": strike,
+                "bid": round(mid - 0.05, 2),
+                "ask": round(mid + 0.05, 2),
+            }
+        ]
+    return option_map
+
+
+def _broker() -> MagicMock:
+    broker = MagicMock()
+    broker.quotes.return_value = {
+        "$VIX.X": {"lastPrice": 22.0},
+        "$SPX.X": {"lastPrice": CLOSE},
+    }
+    broker.option_chain.return_value = {
+        "underlyingPrice": CLOSE,
+        "putExpDateMap": {EXPIRATION + ":1": _option_map(OptionType.PUT)},
+        "callExpDateMap": {EXPIRATION + ":1": _option_map(OptionType.CALL)},
+    }
+    broker.place_iron_condor_order.return_value = {"code": "ok"}
+    broker.place_option_spread_order.return_value = {"code": "ok"}
+    return broker
+
+
+class TestDte1IC(unittest.TestCase):
+    def setUp(self):
+        clock.freeze(NOW)
+        self.addCleanup(clock.unfreeze)
+        self.broker = _broker()
+        self.history_store = HistoryStore(
+            directory=tempfile.mkdtemp(), fetcher=_history
+        )
+
+    def _strategy(self, **kwargs) -> Dte1IC:
+        return Dte1IC(
+            ticker="SPX", broker=self.broker, history_store=self.history_store, **kwargs
+        )
+
+    def _prices(self, strategy: Dte1IC) -> dict:
+        return {option_type: vs.price for option_type, vs in strategy._plan.values()}
+
+    def test_single_four_leg_order(self):
+        strategy = self._strategy()
+        result = strategy.execute()
+        self.broker.place_option_spread_order.assert_not_called()
+        kwargs = self.broker.place_iron_condor_order.call_args.kwargs
+        # The call is 1.8 ATR out after one green day and the put 2 ATR out
+        # after none red, with VIX above 20; 500 of buying power is 5 points
+        self.assertEqual(kwargs["call_spread"].short_leg.symbol, "SPXW_031722C4170")
+        self.assertEqual(kwargs["call_spread"].long_leg.symbol, "SPXW_031722C4175")
+        self.assertEqual(kwargs["put_spread"].short_leg.symbol, "SPXW_031722P4020")
+        self.assertEqual(kwargs["put_spread"].long_leg.symbol, "SPXW_031722P4015")
+        prices = self._prices(strategy)
+        self.assertEqual(
+            kwargs["price"], round(prices[OptionType.CALL] + prices[OptionType.PUT], 2)
+        )
+        self.assertEqual(kwargs["order_type"], OrderType.CREDIT)
+        self.assertEqual(kwargs["asset_type"], AssetType.OPTION)
+        self.assertEqual(result["iron condor"], {"code": "ok"})
+        self.assertEqual(len(result["legs"]), 4)
+        self.assertEqual(result["legging_gap_seconds"], 0.0)
+        # Every leg and both halves were priced from one chain request
+        self.broker.option_chain.assert_called_once()
+
+    def test_verticals_submitted_concurrently(self):
+        result = self._strategy(single_order=False).execute()
+        self.broker.place_iron_condor_order.assert_not_called()
+        self.assertEqual(
+            sorted(
+                call.kwargs["short_leg"].symbol
+                for call in self.broker.place_option_spread_order.call_args_list
+            ),
+            ["SPXW_031722C4170", "SPXW_031722P4020"],
+        )
+        self.assertEqual(result["order 1"], {"code": "ok"})
+        self.assertEqual(result["order 2"], {"code": "ok"})
+        self.assertEqual(len(result["legs"]), 4)
+        self.assertGreaterEqual(result["legging_gap_seconds"], 0.0)
+
+    def test_failed_side_keeps_the_other_response(self):
+        def place(**kwargs) -> dict:
+            if kwargs["short_leg"].symbol == "SPXW_031722P4020":
+                raise RuntimeError("rejected")
+            return {"code": "ok"}
+
+        self.broker.place_option_spread_order.side_effect = place
+        with self.assertLogs(level="ERROR"):
+            result = self._strategy(single_order=False).execute()
+        # Order 1 is the put, the side opposite the one the streak picked
+        self.assertEqual(result["order 1"]["code"], "error")
+        self.assertEqual(result["order 1"]["error"], "RuntimeError: rejected")
+        self.assertEqual(result["order 2"], {"code": "ok"})
+        self.assertEqual(
+            [leg["symbol"] for leg in result["legs"]],
+            ["SPXW_031722C4170", "SPXW_031722C4175"],
+        )
+
+    def test_cancelled_before_either_side_is_placed(self):
+        strategy = self._strategy(single_order=False)
+        strategy.cancelled = threading.Event()
+        strategy.cancelled.set()
+        with self.assertLogs(level="ERROR"):
+            with self.assertRaises(StrategyCancelled):
+                strategy.execute()
+        self.broker.place_option_spread_order.assert_not_called()
+
+    def test_side_under_min_credit_is_skipped(self):
+        # Cheap far puts, so the put vertical is worth less than MIN_CREDIT
+        put_map = self.broker.option_chain.return_value["putExpDateMap"]
+        for (contract,) in put_map[EXPIRATION + ":1"].values():
+            if contract["strikePrice"] < 4050:
+                contract["bid"], contract["ask"] = 0.0, 0.05
+        strategy = self._strategy()
+        self.assertLess(self._prices(strategy)[OptionType.PUT], dte1_rules.MIN_CREDIT)
+        result = strategy.execute()
+        self.broker.place_iron_condor_order.assert_not_called()
+        self.broker.place_option_spread_order.assert_called_once()
+        self.assertEqual(result["order 1"], {"code": "bad", "order_body": "Null"})
+        self.assertEqual(
+            [leg["symbol"] for leg in result["legs"]],
+            ["SPXW_031722C4170", "SPXW_031722C4175"],
+        )
+
+    def test_iron_condor_order_body(self):
+        body = Broker.iron_condor_order_body(
+            OrderType.CREDIT,
+            0.8,
+            AssetType.OPTION,
+            _spread(OptionType.CALL, 4150, 4160, 0.45),
+            _spread(OptionType.PUT, 4050, 4040, 0.35),
+        )
+        self.assertEqual(body["complexOrderStrategyType"], "IRON_CONDOR")
+        self.assertEqual(body["price"], "0.80")
+        self.assertEqual(
+            [leg["instruction"] for leg in body["orderLegCollection"]],
+            ["BUY_TO_OPEN", "SELL_TO_OPEN", "BUY_TO_OPEN", "SELL_TO_OPEN"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
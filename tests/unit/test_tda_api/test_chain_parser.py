@@ -0,0 +1,95 @@
+import datetime
+import json
+import os
+import unittest
+
+from tda_api.chain_parser import narrow, parse_option_chain
+
+
+def _load(name: str) -> dict:
+    with open(os.path.join(os.path.dirname(__file__), "../common", name), "r") as f:
+        return json.load(f)
+
+
+def _chain() -> dict:
+    puts, calls = _load("test_put_map.json"), _load("test_call_map.json")
+    return {
+        "symbol": "$SPX.X",
+        "status": "SUCCESS",
+        "underlying": None,
+        "underlyingPrice": 4100.0,
+        "putExpDateMap": {
+            "2022-03-14:0": puts,
+            "2022-03-16:2": puts,
+            "2022-03-18:4": puts,
+        },
+        "callExpDateMap": {
+            "2022-03-14:0": calls,
+            "2022-03-16:2": calls,
+            "2022-03-18:4": calls,
+        },
+    }
+
+
+class TestChainParser(unittest.TestCase):
+    def setUp(self):
+        self.chain = _chain()
+        self.payload = json.dumps(self.chain).encode("utf-8")
+
+    def test_single_expiration(self):
+        day = datetime.date(2022, 3, 16)
+        parsed = parse_option_chain(self.payload, day, day)
+        self.assertEqual(parsed["status"], "SUCCESS")
+        self.assertEqual(parsed["underlyingPrice"], 4100.0)
+        self.assertEqual(list(parsed["putExpDateMap"]), ["2022-03-16:2"])
+        self.assertEqual(
+            parsed["callExpDateMap"]["2022-03-16:2"],
+            self.chain["callExpDateMap"]["2022-03-16:2"],
+        )
+        self.assertEqual(parsed, narrow(self.chain, day, day))
+
+    def test_range_and_strike_window(self):
+        parsed = parse_option_chain(
+            self.payload,
+            datetime.date(2022, 3, 15),
+            datetime.date(2022, 3, 31),
+            strike_window=(4090, 4110),
+        )
+        self.assertEqual(
+            list(parsed["callExpDateMap"]), ["2022-03-16:2", "2022-03-18:4"]
+        )
+        self.assertEqual(
+            sorted(parsed["putExpDateMap"]["2022-03-18:4"], key=float),
+            ["4090.0", "4095.0", "4100.0", "4105.0", "4110.0"],
+        )
+
+    def test_unbounded_matches_json(self):
+        self.assertEqual(parse_option_chain(self.payload.decode()), self.chain)
+
+    def test_call_map_first(self):
+        reordered = {
+            "status": "SUCCESS",
+            "callExpDateMap": self.chain["callExpDateMap"],
+            "putExpDateMap": self.chain["putExpDateMap"],
+        }
+        day = datetime.date(2022, 3, 18)
+        parsed = parse_option_chain(json.dumps(reordered, indent=2), day, day)
+        self.assertEqual(parsed, narrow(reordered, day, day))
+
+    def test_failed_response(self):
+        self.assertEqual(
+            parse_option_chain(b'{"status": "FAILED"}'), {"status": "FAILED"}
+        )
+
+    def test_unexpected_layout_falls_back(self):
+        payload = json.dumps(
+            {"status": "SUCCESS", "putExpDateMap": None, "callExpDateMap": {}}
+        )
+        with self.assertLogs(level="WARNING"):
+            parsed = parse_option_chain(payload, datetime.date(2022, 3, 14))
+        self.assertEqual(
+            parsed, {"status": "SUCCESS", "putExpDateMap": None, "callExpDateMap": {}}
+        )
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from dto.option_contract import OptionContract
+from dto.options import OptionLeg
+from tda_api.order_worker import OrderWorker
+from utils.common_utils import Instruction, OrderType
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+def _legs() -> list:
+    # Mid credit 1.00, natural credit 0.80
+    return [
+        OptionLeg(
+            "SPX_031722P4050",
+            Instruction.SELL_TO_OPEN,
+            1,
+            OptionContract("SPX_031722P4050", "PUT", 4050.0, 1.9, 2.1),
+        ),
+        OptionLeg(
+            "SPX_031722P4040",
+            Instruction.BUY_TO_OPEN,
+            1,
+            OptionContract("SPX_031722P4040", "PUT", 4040.0, 0.9, 1.1),
+        ),
+    ]
+
+
+def _filled(*executions) -> dict:
+    # executions are (legId, quantity, price) triples
+    return {
+        "status": "FILLED",
+        "price": 1.05,
+        "quantity": 2,
+        "orderLegCollection": [
+            {"legId": 1, "instruction": "SELL_TO_OPEN", "quantity": 2},
+            {"legId": 2, "instruction": "BUY_TO_OPEN", "quantity": 2},
+        ],
+        "orderActivityCollection": [
+            {
+                "activityType": "EXECUTION",
+                "executionLegs": [
+                    {"legId": leg_id, "quantity": quantity, "price": price}
+                    for leg_id, quantity, price in executions
+                ],
+            }
+        ],
+    }
+
+
+class TestOrderWorker(unittest.TestCase):
+    def setUp(self):
+        self.clock = _Clock()
+        patcher = patch.multiple(
+            "tda_api.order_worker.time",
+            monotonic=self.clock.monotonic,
+            sleep=self.clock.sleep,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.broker = MagicMock()
+        self.broker.submit_order.return_value = "1"
+        self.broker.replace_order.side_effect = lambda order_id, body: str(
+            int(order_id) + 1
+        )
+        self.worker = OrderWorker(
+            self.broker,
+            max_concession=0.5,
+            timeout=30.0,
+            step_interval=5.0,
+            initial_delay=1.0,
+            max_delay=2.0,
+        )
+
+    def _work(self, price: float = 1.05) -> dict:
+        return self.worker.work(
+            OrderType.CREDIT, price, _legs(), lambda limit: {"price": limit}
+        )
+
+    def test_mid_and_natural(self):
+        self.assertEqual(
+            OrderWorker.mid_and_natural(OrderType.CREDIT, _legs()), (1.0, 0.8)
+        )
+        self.assertEqual(
+            OrderWorker.mid_and_natural(OrderType.DEBIT, _legs()), (-1.0, -0.8)
+        )
+
+    def test_fills_without_repricing(self):
+        self.broker.order_status.return_value = {"status": "FILLED", "price": 1.05}
+        report = self._work()
+        self.broker.replace_order.assert_not_called()
+        self.assertEqual(report["status"], "FILLED")
+        self.assertEqual(report["fill_price"], 1.05)
+        self.assertEqual(report["slippage"], -0.05)
+        self.assertEqual(report["time_to_fill_seconds"], 1.0)
+        self.assertEqual(report["steps"], 0)
+
+    def test_fill_price_comes_from_the_executions(self):
+        # Filled better than the limit
+        self.broker.order_status.return_value = _filled((1, 2, 2.2), (2, 2, 1.05))
+        report = self._work()
+        self.assertEqual(report["limit_price"], 1.05)
+        self.assertEqual(report["fill_price"], 1.15)
+        self.assertEqual(report["slippage"], -0.15)
+
+    def test_fill_price_weights_partial_fills_by_quantity(self):
+        order = _filled((1, 1, 2.0), (1, 1, 2.3), (2, 2, 1.0))
+        self.assertEqual(OrderWorker.fill_price(OrderType.CREDIT, order), 1.15)
+        order = _filled((1, 1.5, 2.0), (1, 0.5, 2.4), (2, 2, 1.0))
+        self.assertEqual(OrderWorker.fill_price(OrderType.CREDIT, order), 1.1)
+        self.assertEqual(OrderWorker.fill_price(OrderType.DEBIT, order), -1.1)
+
+    def test_fill_price_without_executions(self):
+        self.assertIsNone(
+            OrderWorker.fill_price(OrderType.CREDIT, {"status": "FILLED"})
+        )
+
+    def test_steps_toward_natural_until_filled(self):
+        statuses = [{"status": "WORKING"}] * 6 + [{"status": "FILLED", "price": 0.95}]
+        self.broker.order_status.side_effect = statuses
+        report = self._work()
+        bodies = [call.args[1] for call in self.broker.replace_order.call_args_list]
+        self.assertEqual(bodies, [{"price": 1.0}, {"price": 0.95}])
+        self.assertEqual(report["order_id"], "3")
+        self.assertEqual(report["slippage"], 0.05)
+        self.assertEqual(report["steps"], 2)
+
+    def test_never_concedes_past_natural_and_cancels_on_timeout(self):
+        self.broker.order_status.return_value = {"status": "WORKING"}
+        report = self._work()
+        prices = [
+            call.args[1]["price"] for call in self.broker.replace_order.call_args_list
+        ]
+        self.assertEqual(prices, [1.0, 0.95, 0.9, 0.85, 0.8])
+        self.broker.cancel_order.assert_called_once()
+        self.assertEqual(report["status"], "TIMED_OUT")
+        self.assertIsNone(report["time_to_fill_seconds"])
+        self.assertEqual(report["code"], "bad")
+        self.assertLessEqual(self.clock.now - 100.0, 30.0)
+
+    def test_fill_found_when_the_cancel_fails(self):
+        self.broker.order_status.return_value = {"status": "WORKING"}
+
+        def fill_before_cancel(order_id):
+            self.broker.order_status.return_value = _filled((1, 2, 2.0), (2, 2, 1.1))
+            raise RuntimeError("Order is not cancelable")
+
+        self.broker.cancel_order.side_effect = fill_before_cancel
+        with self.assertLogs(level="WARNING"):
+            report = self._work()
+        self.assertEqual(report["status"], "FILLED")
+        self.assertEqual(report["code"], "ok")
+        # From the executions, not the last limit of 0.80
+        self.assertEqual(report["limit_price"], 0.8)
+        self.assertEqual(report["fill_price"], 0.9)
+        self.assertEqual(report["slippage"], 0.1)
+
+    def test_rejected_order_stops(self):
+        self.broker.order_status.return_value = {"status": "REJECTED"}
+        report = self._work()
+        self.assertEqual(report["status"], "REJECTED")
+        self.broker.cancel_order.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
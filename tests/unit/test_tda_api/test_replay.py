@@ -0,0 +1,120 @@
+import datetime
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock
+
+import numpy as np
+from pytz import timezone
+
+from strategies.dte1_ic import Dte1IC
+from tda_api.replay import (
+    Cassette,
+    CassetteMiss,
+    RecordingBroker,
+    RecordingHistoryFetcher,
+    replay_session,
+)
+from trader import Trader
+from utils import clock
+from utils.common_utils import OrderType
+
+# A Wednesday morning, so the strategy trades the Thursday expiration
+RECORDED_AT = timezone("US/Eastern").localize(datetime.datetime(2022, 3, 16, 9, 45))
+
+
+def _load(name: str) -> dict:
+    with open(os.path.join(os.path.dirname(__file__), "../common", name), "r") as f:
+        return json.load(f)
+
+
+def _record_cassette(path: str) -> Cassette:
+    cassette = Cassette(path, recorded_at=RECORDED_AT)
+    broker = MagicMock()
+    broker.quotes.return_value = {"$VIX.X": {"lastPrice": 25.0}}
+    broker.option_chain.return_value = {
+        "status": "SUCCESS",
+        "putExpDateMap": {"2022-03-17:1": _load("test_put_map.json")},
+        "callExpDateMap": {"2022-03-17:1": _load("test_call_map.json")},
+    }
+    broker.place_option_spread_order.side_effect = [
+        {"code": "ok", "order_body": "first"},
+        {"code": "ok", "order_body": "second"},
+    ]
+    recording = RecordingBroker(broker, cassette)
+    recording.quotes(["$VIX.X"])
+    recording.option_chain("$SPX.X", strike_count=60)
+    recording.place_option_spread_order(price=1.0)
+    recording.place_option_spread_order(price=2.0)
+
+    close = np.linspace(4000, 4100, 20)
+    fetcher = RecordingHistoryFetcher(
+        cassette,
+        lambda ticker, start: {
+            "dates": np.arange(20).astype("datetime64[D]"),
+            "open": close - 5,
+            "high": close + 20,
+            "low": close - 20,
+            "close": close,
+        },
+    )
+    fetcher("SPX", datetime.date(2022, 2, 1))
+    cassette.save()
+    return cassette
+
+
+class TestReplay(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), "session.json.gz")
+        _record_cassette(self.path)
+        self.addCleanup(clock.unfreeze)
+
+    def test_cassette_round_trip(self):
+        cassette = Cassette.load(self.path)
+        self.assertEqual(cassette.recorded_at, RECORDED_AT)
+        self.assertEqual(
+            cassette.play("place_option_spread_order")["order_body"], "first"
+        )
+        self.assertEqual(
+            cassette.play("place_option_spread_order")["order_body"], "second"
+        )
+        self.assertEqual(
+            cassette.play("place_option_spread_order")["order_body"], "second"
+        )
+        with self.assertRaises(CassetteMiss):
+            cassette.play("quote:$NDX.X")
+
+    def test_pipeline_replays_offline(self):
+        session = replay_session(Cassette.load(self.path), latency=0.01)
+        trader = Trader(session=session)
+        trader.set_strategies(
+            lambda: Dte1IC(
+                ticker="SPX",
+                order_type=OrderType.CREDIT,
+                buying_power=1000,
+                broker=session.broker,
+                chain_cache=session.chain_cache,
+                snapshot=session.snapshot,
+                history_store=session.history_store,
+            )
+        )
+        start = time.monotonic()
+        response = trader.trade(concurrent=True)
+        self.assertGreaterEqual(time.monotonic() - start, 0.03)
+        (result,) = response
+        # The put side prices under the minimum credit and is skipped
+        self.assertEqual(result["order 1"], {"code": "bad", "order_body": "Null"})
+        self.assertEqual(result["order 2"], {"code": "ok", "order_body": "first"})
+        self.assertEqual(
+            [leg["instruction"] for leg in result["legs"]],
+            ["SELL_TO_OPEN", "BUY_TO_OPEN"],
+        )
+        self.assertEqual(result["legging_gap_seconds"], 0.0)
+        self.assertEqual(clock.today(), datetime.date(2022, 3, 16))
+        self.assertEqual(session.stats()["chain_misses"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
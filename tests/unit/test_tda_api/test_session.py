@@ -0,0 +1,63 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from tda_api.session import BrokerSession
+from utils import warm_cache
+
+
+class TestBrokerSession(unittest.TestCase):
+    @patch("tda_api.session.Broker")
+    def test_broker_is_created_once(self, broker_cls):
+        broker_cls.return_value = MagicMock(connections_opened=1)
+        session = BrokerSession()
+        self.assertIs(session.broker, session.broker)
+        self.assertEqual(broker_cls.call_count, 1)
+        self.assertEqual(
+            session.stats(),
+            {"clients_created": 1, "clients_reused": 0, "connections_opened": 1},
+        )
+
+    @patch("tda_api.session.Broker")
+    def test_close(self, broker_cls):
+        session = BrokerSession()
+        broker = session.broker
+        session.close()
+        broker.close.assert_called_once()
+        self.assertEqual(session.stats()["connections_opened"], 0)
+
+    @patch("tda_api.session.Broker")
+    def test_warm_sessions_share_one_broker(self, broker_cls):
+        warm_cache.clear()
+        self.addCleanup(warm_cache.clear)
+        first = BrokerSession(warm=True)
+        broker = first.broker
+        first.close()
+        broker.close.assert_not_called()
+        second = BrokerSession(warm=True)
+        self.assertIs(second.broker, broker)
+        self.assertEqual(broker_cls.call_count, 1)
+        self.assertEqual(second.stats()["clients_created"], 0)
+        self.assertEqual(second.stats()["clients_reused"], 1)
+        self.assertIs(second.history_store.memory, warm_cache.HISTORY)
+
+    @patch("tda_api.session.Broker")
+    def test_warm_session_counts_only_its_own_connections(self, broker_cls):
+        warm_cache.clear()
+        self.addCleanup(warm_cache.clear)
+        broker = broker_cls.return_value
+        broker.connections_opened = 0
+        first = BrokerSession(warm=True)
+        first.broker
+        broker.connections_opened = 2
+        self.assertEqual(first.stats()["connections_opened"], 2)
+        first.close()
+        second = BrokerSession(warm=True)
+        second.broker
+        self.assertEqual(second.stats()["connections_opened"], 0)
+        # One connection was dropped and reopened during this invocation
+        broker.connections_opened = 3
+        self.assertEqual(second.stats()["connections_opened"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from authlib.oauth2.rfc6749.wrappers import OAuth2Token
+
+from tda_api.token_manager import TokenManager
+
+
+def _token(access_token: str, expires_in: float) -> dict:
+    return {
+        "creation_timestamp": 1647000000,
+        "token": {
+            "access_token": access_token,
+            "refresh_token": "refresh",
+            "token_type": "Bearer",
+            "expires_at": time.time() + expires_in,
+        },
+    }
+
+
+class _Session:
+    # Stands in for tda-api's OAuth2Client: refreshing writes a new token back
+    # through the manager the way authlib's update_token hook does
+    leeway = 60
+
+    def __init__(self, manager: TokenManager, refreshes: list):
+        self.token = manager.read()["token"]
+        self._manager = manager
+        self._refreshes = refreshes
+
+    @property
+    def token(self) -> OAuth2Token:
+        return self._token
+
+    @token.setter
+    def token(self, token: dict) -> None:
+        self._token = OAuth2Token(token)
+
+    def ensure_active_token(self, token=None) -> bool:
+        if self.token.is_expired(leeway=self.leeway):
+            time.sleep(0.01)
+            self._refreshes.append(1)
+            refreshed = _token("fresh", 1800)
+            self.token = refreshed["token"]
+            self._manager.write(refreshed)
+        return True
+
+
+class TestTokenManager(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.bundled = os.path.join(self.directory, "bundled.json")
+        self.writable = os.path.join(self.directory, "tmp", "auth_token.json")
+        with open(self.bundled, "w") as f:
+            json.dump(_token("bundled", -3600), f)
+        self.manager = TokenManager(self.bundled, self.writable)
+        self.refreshes = []
+        patcher = patch("tda.auth.client_from_access_functions", self._client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _client(self, api_key, read, write):
+        client = MagicMock()
+        client.session = _Session(self.manager, self.refreshes)
+        return client
+
+    def test_token_is_loaded_once(self):
+        self.manager.client("KEY")
+        self.manager.client("KEY")
+        self.assertEqual(self.manager.stats(), {"token_loads": 1, "token_writes": 0})
+
+    def test_writable_copy_wins(self):
+        os.makedirs(os.path.dirname(self.writable))
+        with open(self.writable, "w") as f:
+            json.dump(_token("written", 1800), f)
+        self.assertEqual(self.manager.read()["token"]["access_token"], "written")
+
+    def test_refresh_happens_once_for_all_clients(self):
+        clients = [self.manager.client("KEY") for _ in range(4)]
+        threads = [
+            threading.Thread(target=client.session.ensure_active_token)
+            for client in clients
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.refreshes), 1)
+        self.assertEqual(
+            {client.session.token["access_token"] for client in clients}, {"fresh"}
+        )
+        with open(self.writable) as f:
+            self.assertEqual(json.load(f)["token"]["access_token"], "fresh")
+        # A later manager, as in the next container, starts from the refresh
+        self.assertEqual(
+            TokenManager(self.bundled, self.writable).read()["token"]["access_token"],
+            "fresh",
+        )
+
+    def test_missing_token(self):
+        with self.assertRaises(RuntimeError):
+            TokenManager(self.writable, self.writable).read()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+import httpx
+
+from tda_api.transport import ORDER, READ, TokenBucket, Transport
+
+
+def _response(status_code: int, headers: dict = None) -> MagicMock:
+    response = MagicMock()
+    response.status_code = status_code
+    response.headers = headers if headers else {}
+    response.text = "body"
+    return response
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_burst_goes_out_without_waiting(self):
+        bucket = TokenBucket(rate_per_minute=60, burst=5, reserve=0)
+        for _ in range(5):
+            bucket.acquire(READ)
+        self.assertEqual(bucket.waits, 0)
+
+    def test_empty_bucket_waits_for_refill(self):
+        bucket = TokenBucket(rate_per_minute=6000, burst=1, reserve=0)
+        bucket.acquire(READ)
+        waited = bucket.acquire(READ)
+        self.assertGreater(waited, 0.005)
+        self.assertEqual(bucket.waits, 1)
+
+    def test_reads_leave_the_reserve_to_orders(self):
+        bucket = TokenBucket(rate_per_minute=60, burst=3, reserve=2)
+        bucket.acquire(READ)
+        done = []
+        reader = threading.Thread(target=lambda: done.append(bucket.acquire(READ)))
+        reader.daemon = True
+        reader.start()
+        reader.join(0.05)
+        # The read is held back while the orders go straight out
+        self.assertEqual(done, [])
+        start = time.monotonic()
+        bucket.acquire(ORDER)
+        bucket.acquire(ORDER)
+        self.assertLess(time.monotonic() - start, 0.05)
+
+
+class TestTransport(unittest.TestCase):
+    def setUp(self):
+        self.transport = Transport(TokenBucket(rate_per_minute=60000, burst=100))
+        self.span = MagicMock()
+        patcher = patch("tda_api.transport.time.sleep")
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_read_retries_transient_statuses(self):
+        call = MagicMock(side_effect=[_response(503), _response(429), _response(200)])
+        response = self.transport.read("quote", self.span, call, "SPX")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(call.call_count, 3)
+        call.assert_called_with("SPX")
+        self.assertEqual(self.span.retry.call_count, 2)
+        self.assertEqual(self.transport.stats()["tda_retries"], 2)
+        self.assertEqual(self.transport.stats()["tda_requests"], 3)
+
+    def test_backoff_is_bounded_and_honours_retry_after(self):
+        call = MagicMock(
+            side_effect=[_response(500)] * 3
+            + [_response(429, {"Retry-After": "60"}), _response(200)]
+        )
+        self.transport.max_retries = 4
+        self.transport.read("quote", self.span, call)
+        delays = [c.args[0] for c in self.sleep.call_args_list]
+        for attempt, delay in enumerate(delays[:3], start=1):
+            self.assertLessEqual(delay, self.transport.base_delay * 2**attempt)
+        self.assertEqual(delays[3], self.transport.max_delay)
+
+    def test_read_gives_up_after_max_retries(self):
+        call = MagicMock(return_value=_response(502))
+        with self.assertRaises(RuntimeError):
+            self.transport.read("option_chain", self.span, call)
+        self.assertEqual(call.call_count, self.transport.max_retries + 1)
+        self.assertEqual(self.transport.stats()["tda_failures"], 1)
+
+    def test_read_retries_connection_errors(self):
+        call = MagicMock(side_effect=[httpx.ConnectError("reset"), _response(200)])
+        self.transport.read("quote", self.span, call)
+        self.assertEqual(call.call_count, 2)
+
+    def test_client_errors_are_not_retried(self):
+        call = MagicMock(return_value=_response(400))
+        with self.assertRaises(RuntimeError):
+            self.transport.read("quote", self.span, call)
+        self.assertEqual(call.call_count, 1)
+
+    def test_orders_retry_only_rate_limits(self):
+        call = MagicMock(side_effect=[_response(429), _response(201)])
+        self.transport.order("place_order", self.span, call, "ACCOUNT", {})
+        self.assertEqual(call.call_count, 2)
+
+        call = MagicMock(return_value=_response(500))
+        with self.assertRaises(RuntimeError):
+            self.transport.order("place_order", self.span, call, "ACCOUNT", {})
+        self.assertEqual(call.call_count, 1)
+
+        call = MagicMock(side_effect=httpx.ConnectError("reset"))
+        with self.assertRaises(httpx.ConnectError):
+            self.transport.order("place_order", self.span, call, "ACCOUNT", {})
+        self.assertEqual(call.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
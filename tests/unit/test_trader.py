@@ -0,0 +1,286 @@
+import datetime
+import functools
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from dto.data_needs import DataNeeds
+from dto.trade_plan import TradePlan
+from strategies.strategy import Strategy
+from tda_api.broker import AccountBroker
+from trader import Trader
+from utils.common_utils import OptionType
+
+
+class _SleepyStrategy(Strategy):
+    # Works for `seconds`, then places its order through `broker`
+    def __init__(
+        self,
+        seconds: float,
+        result=None,
+        error: Exception = None,
+        broker=None,
+        checks_cancellation: bool = True,
+    ):
+        self.seconds = seconds
+        self.result = result
+        self.error = error
+        self.broker = broker if broker else MagicMock()
+        self.checks_cancellation = checks_cancellation
+
+    def execute(self) -> dict:
+        if self.checks_cancellation and self.cancelled is not None:
+            # Stops working as soon as it is cancelled
+            self.cancelled.wait(self.seconds)
+        else:
+            time.sleep(self.seconds)
+        if self.error:
+            raise self.error
+        if self.checks_cancellation:
+            self._ensure_not_cancelled()
+        self.broker.place_option_spread_order()
+        return self.result
+
+    def asset_type(self):
+        return None
+
+
+class _SlowStrategy(_SleepyStrategy):
+    deadline = 0.1
+
+    def __init__(self, **kwargs):
+        super().__init__(1, "slow")
+
+
+class _ConfiguredStrategy(Strategy):
+    def __init__(self, ticker, order_type, buying_power, broker, **kwargs):
+        self.ticker = ticker
+        self.broker = broker
+        self.kwargs = kwargs
+
+    @classmethod
+    def data_needs(cls, ticker: str) -> DataNeeds:
+        return DataNeeds(
+            history={ticker: 14},
+            quotes={"$VIX.X", ticker},
+            chains={(ticker, "2022-03-17")},
+        )
+
+    @classmethod
+    def plan(cls, config, trade_date, snapshot, history_store) -> TradePlan:
+        if config.ticker == "NDX":
+            raise RuntimeError("no history")
+        return _plan(config.ticker, trade_date)
+
+    @classmethod
+    def planned_data_needs(cls, plan: TradePlan) -> DataNeeds:
+        return DataNeeds(chains={(plan.ticker, plan.expiration_date)})
+
+    def execute(self) -> dict:
+        return {"ticker": self.ticker, "broker": self.broker, **self.kwargs}
+
+    def asset_type(self):
+        return None
+
+
+def _plan(ticker: str, trade_date: datetime.date) -> TradePlan:
+    return TradePlan(
+        strategy="Fake",
+        ticker=ticker,
+        trade_date=trade_date.isoformat(),
+        expiration_date="2022-03-18",
+        option_type=OptionType.PUT,
+        short_strikes={"PUT": 4050.0},
+        buying_power=500,
+        quantity=1,
+    )
+
+
+class TestTrader(unittest.TestCase):
+    def test_trade_sequential_captures_errors(self):
+        trader = Trader(session=MagicMock())
+        error = RuntimeError("boom")
+        trader.set_strategies(
+            _SleepyStrategy(0, {"code": "ok"}), _SleepyStrategy(0, error=error)
+        )
+        self.assertEqual(trader.trade(), [{"code": "ok"}, error])
+
+    def test_trade_concurrently_runs_in_parallel(self):
+        trader = Trader(session=MagicMock(), max_workers=4)
+        trader.set_strategies(*[_SleepyStrategy(0.2, i) for i in range(4)])
+        start = time.monotonic()
+        self.assertEqual(trader.trade(concurrent=True), [0, 1, 2, 3])
+        self.assertLess(time.monotonic() - start, 0.6)
+
+    def test_trade_concurrently_builds_strategies_in_workers(self):
+        trader = Trader(session=MagicMock())
+        trader.set_strategies(lambda: _SleepyStrategy(0, "built"))
+        self.assertEqual(trader.trade(concurrent=True), ["built"])
+
+    def test_trade_concurrently_deadline_fails_only_slow_strategy(self):
+        trader = Trader(session=MagicMock(), deadline=0.2)
+        error = ValueError("bad ticker")
+        trader.set_strategies(
+            _SleepyStrategy(2, "slow"),
+            _SleepyStrategy(0, "fast"),
+            _SleepyStrategy(0, error=error),
+        )
+        logs = trader.trade(concurrent=True)
+        self.assertIsInstance(logs[0], TimeoutError)
+        self.assertEqual(logs[1:], ["fast", error])
+
+    def test_strategy_deadline_overrides_default(self):
+        trader = Trader(session=MagicMock(), deadline=10)
+        strategy = _SleepyStrategy(2, "slow")
+        strategy.deadline = 0.1
+        start = time.monotonic()
+        trader.set_strategies(strategy)
+        logs = trader.trade(concurrent=True)
+        self.assertIsInstance(logs[0], TimeoutError)
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_strategy_past_its_deadline_places_no_order(self):
+        trader = Trader(session=MagicMock(), deadline=0.2)
+        broker = MagicMock()
+        trader.set_strategies(_SleepyStrategy(0.5, "slow", broker=broker))
+        logs = trader.trade(concurrent=True)
+        self.assertIsInstance(logs[0], TimeoutError)
+        time.sleep(0.5)
+        broker.place_option_spread_order.assert_not_called()
+
+    def test_order_placed_after_the_deadline_is_reported(self):
+        trader = Trader(session=MagicMock(), deadline=0.1, cancel_grace=2)
+        broker = MagicMock()
+        trader.set_strategies(
+            _SleepyStrategy(0.3, "late", broker=broker, checks_cancellation=False)
+        )
+        with self.assertLogs(level="WARNING"):
+            logs = trader.trade(concurrent=True)
+        self.assertEqual(logs, ["late"])
+        broker.place_option_spread_order.assert_called_once()
+
+    def test_strategy_ignoring_cancellation_times_out_after_grace(self):
+        trader = Trader(session=MagicMock(), deadline=0.1, cancel_grace=0.1)
+        trader.set_strategies(_SleepyStrategy(1, "stuck", checks_cancellation=False))
+        start = time.monotonic()
+        with self.assertLogs(level="ERROR"):
+            logs = trader.trade(concurrent=True)
+        self.assertIsInstance(logs[0], TimeoutError)
+        self.assertLess(time.monotonic() - start, 0.6)
+
+    def test_slow_prefetch_does_not_hold_strategies_past_their_deadline(self):
+        session = MagicMock()
+        session.history_store.candles.side_effect = lambda *args: time.sleep(3)
+        trader = Trader(session=session)
+        trader.needs = DataNeeds(history={"SPX": 14})
+        strategy = _SleepyStrategy(0, "fast")
+        strategy.deadline = 0.5
+        trader.set_strategies(strategy)
+        start = time.monotonic()
+        with self.assertLogs(level="WARNING"):
+            logs = trader.trade(concurrent=True)
+        self.assertEqual(logs, ["fast"])
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_prefetch_time_counts_against_deadlines(self):
+        session = MagicMock()
+        session.history_store.candles.side_effect = lambda *args: time.sleep(1)
+        trader = Trader(session=session, deadline=0.6)
+        trader.needs = DataNeeds(history={"SPX": 14})
+        trader.set_strategies(_SleepyStrategy(0.5, "slow"))
+        start = time.monotonic()
+        with self.assertLogs(level="WARNING"):
+            logs = trader.trade(concurrent=True)
+        # 0.3s of prefetch leaves the strategy 0.3s of its 0.6s
+        self.assertIsInstance(logs[0], TimeoutError)
+        self.assertLess(time.monotonic() - start, 0.7)
+
+    @patch.dict("strategies.registry.STRATEGIES", {"Slow": _SlowStrategy})
+    def test_configured_strategies_keep_their_deadline(self):
+        trader = Trader(session=MagicMock(), deadline=10)
+        trader.set_configs({"strategy": "Slow"}, {"strategy": "Slow", "deadline": 5})
+        self.assertEqual(trader.deadlines, [0.1, 5])
+        trader.set_strategies(functools.partial(_SlowStrategy))
+        self.assertEqual(trader.deadlines, [0.1])
+        start = time.monotonic()
+        logs = trader.trade(concurrent=True)
+        self.assertIsInstance(logs[0], TimeoutError)
+        self.assertLess(time.monotonic() - start, 1)
+
+    @patch.dict("strategies.registry.STRATEGIES", {"Fake": _ConfiguredStrategy})
+    def test_configs_fetch_shared_data_once(self):
+        session = MagicMock()
+        trader = Trader(session=session)
+        trader.set_configs(
+            {"strategy": "Fake", "ticker": "SPX"},
+            {"strategy": "Fake", "ticker": "SPX", "account_id": "456"},
+            {"strategy": "Fake", "ticker": "NDX", "monday_quantity": 2},
+        )
+        logs = trader.trade(concurrent=True)
+        session.snapshot.require.assert_called_once_with("$VIX.X", "NDX", "SPX")
+        session.snapshot.quote.assert_called_once()
+        self.assertCountEqual(
+            session.history_store.candles.call_args_list,
+            [(("SPX", 14),), (("NDX", 14),)],
+        )
+        expiration = datetime.date(2022, 3, 17)
+        self.assertCountEqual(
+            session.chain_cache.load.call_args_list,
+            [
+                (("SPX", expiration, expiration),),
+                (("NDX", expiration, expiration),),
+            ],
+        )
+        self.assertEqual([log["ticker"] for log in logs], ["SPX", "SPX", "NDX"])
+        self.assertIs(logs[0]["broker"], session.broker)
+        self.assertIsInstance(logs[1]["broker"], AccountBroker)
+        self.assertEqual(logs[1]["broker"].account_id, "456")
+
+    @patch.dict("strategies.registry.STRATEGIES", {"Fake": _ConfiguredStrategy})
+    def test_configs_with_a_plan_only_fetch_the_chain(self):
+        session = MagicMock()
+        plan = _plan("SPX", datetime.date(2022, 3, 17))
+        plan_store = MagicMock()
+        plan_store.load.return_value = {plan.key: plan}
+        trader = Trader(session=session, plan_store=plan_store)
+        trader.set_configs(
+            {"strategy": "Fake", "ticker": "SPX"},
+            {"strategy": "Fake", "ticker": "SPX", "buying_power": 1000},
+            # Another account or other quantities need a plan of their own
+            {"strategy": "Fake", "ticker": "SPX", "account_id": "456"},
+            {"strategy": "Fake", "ticker": "SPX", "friday_quantity": 2},
+        )
+        self.assertEqual(trader.planned, 1)
+        self.assertEqual(
+            trader.needs.chains, {("SPX", "2022-03-18"), ("SPX", "2022-03-17")}
+        )
+        logs = trader.trade()
+        # Both expirations come back in one request
+        session.chain_cache.load.assert_called_once_with(
+            "SPX", datetime.date(2022, 3, 17), datetime.date(2022, 3, 18)
+        )
+        self.assertIs(logs[0]["plan"], plan)
+        for log in logs[1:]:
+            self.assertNotIn("plan", log)
+
+    @patch.dict("strategies.registry.STRATEGIES", {"Fake": _ConfiguredStrategy})
+    def test_make_plans_skips_failures_and_chains(self):
+        session = MagicMock()
+        trader = Trader(session=session)
+        trader.set_configs(
+            {"strategy": "Fake", "ticker": "SPX"},
+            {"strategy": "Fake", "ticker": "NDX"},
+        )
+        plans = trader.make_plans(datetime.date(2022, 3, 18))
+        self.assertEqual([plan.ticker for plan in plans], ["SPX"])
+        self.assertEqual(plans[0].trade_date, "2022-03-18")
+        session.chain_cache.load.assert_not_called()
+        session.history_store.candles.assert_called()
+
+    def test_unknown_strategy_config(self):
+        with self.assertRaises(ValueError):
+            Trader(session=MagicMock()).set_configs({"strategy": "Nope"})
+
+
+if __name__ == "__main__":
+    unittest.main()
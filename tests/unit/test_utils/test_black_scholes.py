@@ -0,0 +1,86 @@
+import datetime
+import unittest
+
+import numpy as np
+from pytz import timezone
+
+from utils import black_scholes
+from utils.common_utils import OptionType
+
+UNDERLYING = 4100.0
+STRIKES = np.linspace(3000.0, 5000.0, 4001)
+YEARS = 3 / 365.0
+
+
+class TestBlackScholes(unittest.TestCase):
+    def test_known_value(self):
+        # Hull's example 15.6: S=42, K=40, r=10%, sigma=20%, six months
+        call = black_scholes.price(OptionType.CALL, 42.0, 40.0, 0.5, 0.2, 0.1)
+        put = black_scholes.price(OptionType.PUT, 42.0, 40.0, 0.5, 0.2, 0.1)
+        self.assertAlmostEqual(float(call), 4.76, places=2)
+        self.assertAlmostEqual(float(put), 0.81, places=2)
+
+    def test_put_call_parity_and_delta(self):
+        sigma = black_scholes.sigma_from_vix(20.0)
+        call, call_delta = black_scholes.evaluate(
+            OptionType.CALL, UNDERLYING, STRIKES, YEARS, sigma
+        )
+        put, put_delta = black_scholes.evaluate(
+            OptionType.PUT, UNDERLYING, STRIKES, YEARS, sigma
+        )
+        np.testing.assert_allclose(call - put, UNDERLYING - STRIKES, atol=1e-8)
+        np.testing.assert_allclose(call_delta - put_delta, 1.0)
+        self.assertTrue(np.all(np.diff(put_delta) < 0) or np.all(put_delta <= 0))
+        self.assertTrue(np.all((put_delta >= -1) & (put_delta <= 0)))
+
+    def test_implied_vol_recovers_sigma(self):
+        for option_type in (OptionType.PUT, OptionType.CALL):
+            for sigma in (0.08, 0.35, 1.2):
+                prices = black_scholes.price(
+                    option_type, UNDERLYING, STRIKES, YEARS, sigma
+                )
+                implied = black_scholes.implied_vol(
+                    option_type, prices, UNDERLYING, STRIKES, YEARS
+                )
+                solved = ~np.isnan(implied)
+                self.assertTrue(solved.any())
+                np.testing.assert_allclose(implied[solved], sigma, atol=1e-6)
+
+    def test_implied_vol_is_nan_outside_bounds(self):
+        implied = black_scholes.implied_vol(
+            OptionType.PUT,
+            [-1.0, 0.0, 4200.0, np.nan],
+            UNDERLYING,
+            [4000.0, 4000.0, 4100.0, 4000.0],
+            YEARS,
+        )
+        self.assertTrue(np.all(np.isnan(implied)))
+
+    def test_years_to_expiration(self):
+        eastern = timezone("US/Eastern")
+        now = eastern.localize(datetime.datetime(2022, 3, 17, 10))
+        self.assertAlmostEqual(
+            black_scholes.years_to_expiration(now, datetime.date(2022, 3, 18)),
+            30 / (365.0 * 24),
+        )
+        # Never zero, even after the close
+        self.assertGreater(
+            black_scholes.years_to_expiration(now, datetime.date(2022, 3, 16)), 0
+        )
+
+    def test_years_from_days_matches_years_to_expiration(self):
+        eastern = timezone("US/Eastern")
+        close = eastern.localize(datetime.datetime(2022, 3, 18, 16))
+        np.testing.assert_allclose(
+            black_scholes.years_from_days([1, 3]),
+            [
+                black_scholes.years_to_expiration(
+                    close - datetime.timedelta(days=days), datetime.date(2022, 3, 18)
+                )
+                for days in (1, 3)
+            ],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
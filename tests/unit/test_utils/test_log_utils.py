@@ -0,0 +1,103 @@
+import json
+import logging
+import sys
+import threading
+import unittest
+from functools import partial
+from unittest.mock import MagicMock
+
+from utils import log_utils
+from utils.log_utils import BatchingHandler, StructuredFormatter
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+        self.flushes = 0
+
+    def emit(self, record):
+        self.lines.append(self.format(record))
+
+    def flush(self):
+        self.flushes += 1
+
+
+class TestBatchingHandler(unittest.TestCase):
+    def setUp(self):
+        self.target = ListHandler()
+        self.handler = BatchingHandler(lambda: self.target, batch_size=10)
+        self.logger = logging.getLogger("test_log_utils")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        self.logger.addHandler(self.handler)
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+
+    def test_flush_ships_structured_records(self):
+        self.logger.info(
+            "Placed %s", "order", extra={"strategy": "Dte1", "ticker": "SPX"}
+        )
+        self.assertTrue(self.handler.flush(timeout=2))
+        self.assertEqual(len(self.target.lines), 1)
+        entry = json.loads(self.target.lines[0])
+        self.assertEqual(entry["message"], "Placed order")
+        self.assertEqual(entry["strategy"], "Dte1")
+        self.assertEqual(entry["ticker"], "SPX")
+        self.assertEqual(entry["level"], "INFO")
+        self.assertGreaterEqual(self.target.flushes, 1)
+        self.assertEqual(self.handler.stats()["log_records_shipped"], 1)
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        release = threading.Event()
+        target = ListHandler()
+        target.emit = lambda record: release.wait(2)
+        handler = BatchingHandler(lambda: target, capacity=2, batch_size=1)
+        records = [logging.makeLogRecord({"name": "x", "msg": str(i)}) for i in range(10)]
+        for record in records:
+            handler.handle(record)
+        self.assertGreater(handler.dropped, 0)
+        release.set()
+        self.assertTrue(handler.flush(timeout=2))
+        self.assertEqual(handler.shipped + handler.dropped, len(records))
+
+    def test_ignores_boto_records(self):
+        self.handler.handle(logging.makeLogRecord({"name": "botocore.endpoint"}))
+        self.assertTrue(self.handler.flush(timeout=2))
+        self.assertEqual(self.target.lines, [])
+
+    def test_falls_back_to_stderr_when_target_fails(self):
+        handler = BatchingHandler(MagicMock(side_effect=RuntimeError("no region")))
+        handler._get_target()
+        self.assertIsInstance(handler._target, logging.StreamHandler)
+
+    def test_flush_without_records(self):
+        self.assertTrue(self.handler.flush(timeout=0.1))
+
+
+class TestStructuredFormatter(unittest.TestCase):
+    def test_includes_exception(self):
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            record = logging.getLogger("x").makeRecord(
+                "x", logging.ERROR, __file__, 1, "failed", None, sys.exc_info()
+            )
+        entry = json.loads(StructuredFormatter().format(record))
+        self.assertIn("ValueError: boom", entry["exception"])
+
+
+class TestStrategyFields(unittest.TestCase):
+    def test_partial(self):
+        def Dte1IC(ticker):
+            pass
+
+        self.assertEqual(
+            log_utils.strategy_fields(partial(Dte1IC, ticker="SPX")),
+            {"strategy": "Dte1IC", "ticker": "SPX"},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import json
+import os
+import tempfile
+import unittest
+
+from utils import metrics
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "metrics.jsonl")
+        metrics.configure(self.path)
+
+    def tearDown(self):
+        metrics.configure(metrics.OFF)
+
+    def _lines(self) -> list:
+        with open(self.path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_emit_writes_embedded_metric_format(self):
+        with metrics.span("broker.quote", ticker="SPX") as span:
+            span.add_payload(120)
+            span.retry()
+        self.assertEqual(metrics.emit(), 1)
+        (line,) = self._lines()
+        self.assertEqual(line["Span"], "broker.quote")
+        self.assertEqual(line["ticker"], "SPX")
+        self.assertEqual(line["PayloadBytes"], 120)
+        self.assertEqual(line["Retries"], 1)
+        self.assertGreaterEqual(line["Latency"], 0)
+        directive = line["_aws"]["CloudWatchMetrics"][0]
+        self.assertEqual(directive["Dimensions"], [["Span"]])
+        self.assertEqual(
+            [metric["Name"] for metric in directive["Metrics"]],
+            ["Latency", "Retries", "PayloadBytes"],
+        )
+
+    def test_emit_clears_recorded_spans(self):
+        with metrics.span("stock.candles"):
+            pass
+        metrics.emit()
+        self.assertEqual(metrics.emit(), 0)
+        self.assertEqual(len(self._lines()), 1)
+
+    def test_span_records_error_and_reraises(self):
+        with self.assertRaises(RuntimeError):
+            with metrics.span("option_factory.chain"):
+                raise RuntimeError("no chain")
+        metrics.emit()
+        (line,) = self._lines()
+        self.assertEqual(line["error"], "RuntimeError")
+        self.assertNotIn("PayloadBytes", line)
+
+    def test_off_is_a_no_op(self):
+        metrics.configure(metrics.OFF)
+        self.assertFalse(metrics.enabled())
+        with metrics.span("broker.quote") as span:
+            span.add_payload(1)
+        self.assertEqual(metrics.emit(), 0)
+        self.assertFalse(os.path.exists(self.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
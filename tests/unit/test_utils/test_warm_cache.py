@@ -0,0 +1,88 @@
+import datetime
+import unittest
+from unittest.mock import MagicMock, patch
+
+from utils import clock, warm_cache
+from utils.warm_cache import TTLCache
+
+
+class TestTTLCache(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = patch("utils.warm_cache.time.monotonic", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        clock.freeze(datetime.datetime(2022, 3, 16, 10, 0))
+        self.addCleanup(clock.unfreeze)
+        self.cache = TTLCache("test", max_entries=2, ttl=60)
+
+    def test_hit_and_expiry(self):
+        self.cache.put("a", 1)
+        self.assertEqual(self.cache.get("a"), 1)
+        self.now += 61
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(
+            self.cache.stats(),
+            {"entries": 0, "hits": 1, "misses": 1, "evictions": 0, "hit_rate": 0.5},
+        )
+
+    def test_never_serves_a_previous_trading_date(self):
+        self.cache.put("a", 1)
+        clock.freeze(datetime.datetime(2022, 3, 17, 9, 0))
+        self.assertIsNone(self.cache.get("a"))
+
+    def test_least_recently_used_is_evicted(self):
+        self.cache.put("a", 1)
+        self.cache.put("b", 2)
+        self.cache.get("a")
+        self.cache.put("c", 3)
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.get("a"), 1)
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+    def test_get_or_create(self):
+        calls = []
+        factory = lambda: calls.append(1) or "value"  # noqa: E731
+        self.assertEqual(self.cache.get_or_create("a", factory), "value")
+        self.assertEqual(self.cache.get_or_create("a", factory), "value")
+        self.assertEqual(len(calls), 1)
+
+    def test_dropped_values_are_released(self):
+        released = []
+        cache = TTLCache("test", max_entries=2, ttl=60, on_evict=released.append)
+        cache.put("a", 1)
+        cache.put("a", 1)
+        # Replaced
+        cache.put("a", 2)
+        cache.put("b", 3)
+        # Pushed out
+        cache.put("c", 4)
+        self.assertEqual(released, [1, 2])
+        # Expired
+        self.now += 61
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(released, [1, 2, 3])
+        cache.clear()
+        self.assertEqual(released, [1, 2, 3, 4])
+
+    def test_brokers_dropped_from_clients_are_closed(self):
+        broker = MagicMock()
+        broker.close.side_effect = RuntimeError("already closed")
+        warm_cache.CLIENTS.put("broker", broker)
+        self.addCleanup(warm_cache.CLIENTS.clear)
+        clock.freeze(datetime.datetime(2022, 3, 17, 9, 0))
+        with self.assertLogs(level="WARNING"):
+            self.assertIsNone(warm_cache.CLIENTS.get("broker"))
+        broker.close.assert_called_once_with()
+
+    def test_start_invocation(self):
+        with patch("utils.warm_cache._invocations", 0):
+            self.assertEqual(warm_cache.start_invocation()["container"], "cold")
+            self.assertEqual(
+                warm_cache.start_invocation(),
+                {"container": "warm", "invocations": 2},
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()